@@ -9,6 +9,10 @@ class DatabricksConnection(DatabaseConnection):
     """
         Initializes the Databricks connection with the given parameters.
     """
+    # Each Delta statement commits atomically on its own; multi-statement transactions are not supported
+    supports_transactions: bool = False
+    # Native parameters of the SQL connector
+    parameter_marker: str = '?'
 
     def __init__(self, server_hostname: str, http_path: str, access_token: str, catalog: str):
         super().__init__()
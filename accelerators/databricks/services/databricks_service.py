@@ -1,13 +1,36 @@
 import pandas as pd
+import pyarrow as pa
 from pandas import DataFrame
-from pyarrow import ExtensionArray
 
 from accelerators.databricks.connections.databricks_connection import DatabricksConnection
 from common.services.database_service import DatabaseService
-from common.utilities import log_message, update_table_name_that_starts_with_digit
+from common.services.schema_catalog import SchemaCatalog
+from common.task_scheduler import ScheduledTask
+from common.utilities import PARQUET_COLUMN_TYPES, log_message, update_table_name_that_starts_with_digit
+
+# The Delta column type for each Parquet type of the Direct Data metadata types. Number fields can have decimals,
+# which the conversion to Parquet writes as doubles, so they are stored as decimals.
+DELTA_PARQUET_TYPES: dict[pa.DataType, str] = {
+    pa.int64(): 'DECIMAL(38,9)',
+    pa.date32(): 'DATE',
+    pa.timestamp('ms', tz='UTC'): 'TIMESTAMP',
+    pa.bool_(): 'BOOLEAN',
+}
+# Delta collects data skipping statistics on these columns only, when the table has them
+STATISTICS_COLUMNS: list[str] = ['id', 'modified_date__v']
+# The layout of tables without an entry in the table_layouts parameter. Tables are clustered on their primary keys.
+DEFAULT_TABLE_LAYOUT: dict = {'optimize_write': True, 'auto_compact': True}
+# The table property counting the incremental loads applied to a table since it was last optimized
+INCREMENTALS_SINCE_OPTIMIZE_PROPERTY: str = 'vault.incrementalsSinceOptimize'
 
 
 class DatabricksService(DatabaseService):
+    # Delta tables are created without primary key constraints
+    picklist_primary_key_constraint: str | None = None
+    supports_combined_changes: bool = True
+    supports_values_merge: bool = True
+    quoted_identifier_format: str = '`{}`'
+
     def __init__(self, parameters: dict):
         super().__init__(parameters)
         self.catalog = parameters['catalog']
@@ -15,6 +38,10 @@ class DatabricksService(DatabaseService):
         self.http_path = parameters['http_path']
         self.access_token = parameters['access_token']
         self.infer_schema = parameters['infer_schema']
+        self.typed_columns: bool = parameters.get('typed_columns', False)
+        self.manage_table_layout: bool = parameters.get('manage_table_layout', False)
+        self.table_layouts: dict[str, dict] = parameters.get('table_layouts', {})
+        self.optimize_after_incrementals: int = int(parameters.get('optimize_after_incrementals', 0))
         self.db_connection = self.get_connection()
 
     def get_connection(self) -> DatabricksConnection:
@@ -27,8 +54,25 @@ class DatabricksService(DatabaseService):
         conn.execute_query(f"""USE {self.catalog}.{self.schema}""")
         return conn
 
-    @staticmethod
-    def create_sql_str_column_definitions(table_df: DataFrame, is_picklist: bool = False, is_modify: bool = False, is_add: bool = False) -> str:
+    def create_column_definitions(self, table_df: DataFrame) -> pd.Series:
+        """
+        Maps every metadata row to its Databricks column definition in a single vectorised pass. With typed_columns,
+        the types follow the Parquet types of the metadata types, and every other column is a string.
+
+        :param table_df: A DataFrame containing column details (column_name, type, length).
+        :return: The column definitions, with the same index as table_df.
+        """
+        column_names: pd.Series = table_df['column_name'].str.lower()
+        if not self.typed_columns:
+            return column_names + " STRING"
+
+        column_types: pd.Series = table_df['type'].map(
+            lambda data_type: DELTA_PARQUET_TYPES.get(PARQUET_COLUMN_TYPES.get(data_type, pa.string()), 'STRING'))
+        column_types = column_types.mask((column_names == 'id') & (column_types != 'STRING'), 'BIGINT')
+        return column_names + " " + column_types
+
+    def create_sql_str_column_definitions(self, table_df: DataFrame, is_picklist: bool = False,
+                                          is_modify: bool = False, is_add: bool = False) -> str:
         """
         Generates a SQL string for creating or modifying table columns in Databricks.
 
@@ -38,12 +82,7 @@ class DatabricksService(DatabaseService):
         :param is_picklist: A boolean indicating if the table is the picklist table.
         :return: A partial SQL string defining the table columns.
         """
-        column_definitions = []
-
-        for _, row in table_df.iterrows():
-            column_name = row['column_name'].lower()
-            column_def = f"{column_name} STRING"
-            column_definitions.append(column_def)
+        column_definitions: list = self.create_column_definitions(table_df=table_df).tolist()
         return ", ".join(column_definitions)
 
     def check_if_schema_exists(self):
@@ -73,56 +112,147 @@ class DatabricksService(DatabaseService):
                         exception=e)
             raise e
 
-    def retrieve_column_info(self, table_name: str) -> dict:
+    def load_schema_catalog(self) -> dict[str, dict[str, dict]]:
+        schema_columns_query: str = f"""
+        SELECT table_name, column_name, data_type, full_data_type 
+        FROM {self.catalog}.information_schema.columns 
+        WHERE table_schema = '{self.schema.lower()}'
+        ORDER BY table_name, ordinal_position;
+        """
+        sql_result: list = self.db_connection.execute_query(schema_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result, info_keys=['data_type', 'full_data_type'])
+
+    def query_column_info(self, table_name: str) -> dict:
         existing_columns_query = f"""
-        SELECT column_name, data_type 
+        SELECT table_name, column_name, data_type, full_data_type 
         FROM {self.catalog}.information_schema.columns 
-        WHERE table_name = '{table_name.lower()}';
+        WHERE table_schema = '{self.schema.lower()}'
+        AND table_name = '{table_name.lower()}'
+        ORDER BY ordinal_position;
+        """
+        sql_result: list = self.db_connection.execute_query(existing_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['data_type', 'full_data_type']).get(table_name.lower(), {})
+
+    def qualified_table_name(self, table_name: str) -> str:
+        return f"{self.catalog}.{self.schema}.{table_name}"
+
+    def create_table_statement(self, table_name: str, column_definitions: str) -> str:
+        table_columns: list[str] = [definition.split(' ')[0] for definition in column_definitions.split(', ')]
+        clustering: str = ''
+        cluster_by: list[str] = self.get_cluster_by_columns(table_name=table_name, table_columns=table_columns)
+        if cluster_by:
+            clustering = f"CLUSTER BY ({', '.join(cluster_by)})"
+
+        table_properties: str = ''
+        properties: dict[str, str] = self.get_table_properties(table_name=table_name, table_columns=table_columns)
+        if properties:
+            table_properties = f"TBLPROPERTIES ({self.create_sql_str_table_properties(properties)})"
+        return f"""
+                    CREATE TABLE IF NOT EXISTS {self.catalog}.{self.schema}.{table_name}({column_definitions})
+                    {clustering}
+                    {table_properties}
+                """
+
+    def get_table_layout(self, table_name: str) -> dict:
+        """
+        Returns the layout of a table with manage_table_layout. Tables are clustered on their primary keys, the
+        columns that incremental merges and deletes match on, and use optimized writes and auto compaction so that
+        frequent merges do not leave many small files. The table_layouts parameter overrides this per table, e.g.
+        {"picklist__sys": {"cluster_by": [], "auto_compact": false}}.
+
+        :param table_name: The table name
+        :return: The cluster_by columns, optimize_write and auto_compact settings of the table
+        """
+        return {**DEFAULT_TABLE_LAYOUT,
+                'cluster_by': self.get_primary_keys(table_name=table_name),
+                **self.table_layouts.get(table_name, {})}
+
+    def get_cluster_by_columns(self, table_name: str, table_columns: list[str]) -> list[str]:
+        if not self.manage_table_layout:
+            return []
+        cluster_by: list[str] = [column.lower() for column in self.get_table_layout(table_name)['cluster_by'] or []]
+        return [column for column in cluster_by if column in table_columns]
+
+    def get_table_properties(self, table_name: str, table_columns: list[str]) -> dict[str, str]:
+        """
+        Returns the Delta table properties of a table, from typed_columns and manage_table_layout.
+
+        :param table_name: The table name
+        :param table_columns: The columns of the table
         """
-        sql_result = self.db_connection.execute_query(existing_columns_query)
-        columns = ['column_name', 'data_type']
-        existing_columns_df = pd.DataFrame(sql_result, columns=columns)
-
-        # Convert to dictionary for quick lookup
-        return {
-            row['column_name'].lower(): {
-                "data_type": row["data_type"].lower()
-            }
-            for _, row in existing_columns_df.iterrows()
-        }
-
-    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
-
-        unique_extract_values: ExtensionArray = metadata_table["extract"].unique()
-
-        for extract in unique_extract_values:
-            filtered_metadata = metadata_table[metadata_table["extract"] == extract]
-            # Vault allows 255 characters for description__sys, but the extract metadata defines a length of 128.
-            if extract == "Object.security_policy__sys":
-                filtered_metadata.loc[
-                    (filtered_metadata['column_name'] == 'description__sys'),
-                    ['type', 'length']
-                ] = ['String', 255]
-
-            new_table_name = update_table_name_that_starts_with_digit(extract.split(".")[1])
-            self.create_single_table(table_name=new_table_name, filtered_metadata=filtered_metadata)
-
-        # Create metadata table
-        column_definitions: dict = {col: ["STRING"] for col in metadata_table.columns}
-        new_metadata_df = pd.DataFrame.from_dict(column_definitions).astype(str)
-        new_metadata_df.loc["length"] = 1000
-        new_metadata_df = new_metadata_df.T.reset_index()
-        new_metadata_df.columns = ["column_name", "type", "length"]
-
-        self.create_single_table(table_name="metadata", filtered_metadata=new_metadata_df)
+        properties: dict[str, str] = {}
+        if self.typed_columns:
+            # Liquid clustering needs statistics on the clustering columns, so they are collected as well
+            statistics_columns: list[str] = [column for column in STATISTICS_COLUMNS if column in table_columns]
+            statistics_columns += [column for column in self.get_cluster_by_columns(table_name=table_name,
+                                                                                    table_columns=table_columns)
+                                   if column not in statistics_columns]
+            if statistics_columns:
+                properties['delta.dataSkippingStatsColumns'] = ','.join(statistics_columns)
+        if self.manage_table_layout:
+            table_layout: dict = self.get_table_layout(table_name=table_name)
+            properties['delta.autoOptimize.optimizeWrite'] = str(bool(table_layout['optimize_write'])).lower()
+            properties['delta.autoOptimize.autoCompact'] = str(bool(table_layout['auto_compact'])).lower()
+        return properties
+
+    @staticmethod
+    def create_sql_str_table_properties(properties: dict[str, str]) -> str:
+        return ", ".join(f"'{key}' = '{value}'" for key, value in properties.items())
+
+    def create_sql_str_select_columns(self, table_name: str, headers: list = None) -> str:
+        """
+        Generates the select list that casts the columns of an extract file to the types of the target table. CSV
+        values are read as strings and Parquet values with the types of the conversion, so values are cast where
+        they are loaded rather than on every read. Values that cannot be cast are loaded as NULL.
+
+        :param table_name: The target table
+        :param headers: The columns of the file. Defaults to the columns of the target table.
+        """
+        table_columns: dict = self.retrieve_column_info(table_name)
+        columns: list[str] = [header.lower() for header in headers] if headers else list(table_columns.keys())
+        select_columns: list[str] = []
+        for column in columns:
+            column_info: dict = table_columns.get(column, {})
+            column_type: str = column_info.get('full_data_type') or column_info.get('data_type') or 'string'
+            quoted_column: str = self.quoted_identifier_format.format(column)
+            select_columns.append(f"TRY_CAST({quoted_column} AS {column_type}) AS {quoted_column}")
+        return ", ".join(select_columns)
+
+    def create_sql_str_copy_into(self, table_name: str, object_path: str, headers: list = None,
+                                 infer_schema: bool | str = 'false') -> str:
+        """
+        Generates the COPY INTO of an extract file into a table. With typed_columns, the file's columns are cast to
+        the table's types during the COPY.
+
+        :param table_name: The target table
+        :param object_path: The full object path of the file
+        :param headers: The columns of the file
+        :param infer_schema: The inferSchema option of the COPY
+        """
+        file_format_name: str = "PARQUET" if self.convert_to_parquet else "CSV"
+        source: str = f"'{object_path}'"
+        if self.typed_columns:
+            source = (f"(SELECT {self.create_sql_str_select_columns(table_name=table_name, headers=headers)} "
+                      f"FROM '{object_path}')")
+        return f"""
+                        COPY INTO {self.schema}.{table_name}
+                        FROM {source}
+                        FILEFORMAT = {file_format_name}
+                        FORMAT_OPTIONS ('inferSchema' ='{infer_schema}',
+                                        'delimiter' = ',',
+                                        'header' = 'true')
+                        COPY_OPTIONS ('inferSchema' ='{infer_schema}');
+                    """
 
     def create_single_table(self, table_name: str, filtered_metadata: pd.DataFrame):
         column_definitions: str = self.create_sql_str_column_definitions(
             table_df=filtered_metadata)
 
-        self.db_connection.execute_query(f"""
-                    CREATE TABLE IF NOT EXISTS {self.catalog}.{self.schema}.{table_name}({column_definitions})
-                """)
+        self.db_connection.execute_query(self.create_table_statement(table_name=table_name,
+                                                                     column_definitions=column_definitions))
+
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def add_columns_to_table(self, columns_to_add: pd.DataFrame, table_name: str):
         column_definitions: str = self.create_sql_str_column_definitions(
@@ -134,10 +264,14 @@ class DatabricksService(DatabaseService):
                     """
         self.db_connection.execute_query(alter_query)
 
+        # The database chooses the exact types of the new columns, so re-read this table only
+        self.schema_catalog.refresh_table(database_service=self, table_name=table_name)
+
     def drop_tables_in_schema(self, tables: list | tuple):
         for (table_name,) in tables:
             drop_query: str = f'DROP TABLE {table_name};'
             self.db_connection.execute_query(drop_query)
+            self.schema_catalog.invalidate_table(table_name=table_name)
 
         log_message(log_level='Info',
                     message=f"Tables dropped successfully")
@@ -145,6 +279,7 @@ class DatabricksService(DatabaseService):
     def drop_table(self, table_name: str):
         drop_query: str = f'DROP TABLE IF EXISTS {self.schema}.{table_name};'
         self.db_connection.execute_query(drop_query)
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def drop_columns_from_table(self, table_name: str, columns: list):
         enable_column_mapping_mode_query = f"""
@@ -160,19 +295,26 @@ class DatabricksService(DatabaseService):
 
         self.db_connection.execute_query(drop_column_query)
 
+        self.schema_catalog.drop_columns(table_name=table_name, columns=columns)
+
     def delete_data_from_table(self, starting_directory: str,
                                manifest_table: pd.DataFrame):
 
         deletes_filter: DataFrame = manifest_table[(manifest_table["type"] == "deletes") & (manifest_table["records"] > 0)]
 
-        for index, row in deletes_filter.iterrows():
-            self.process_delete(row=row,
-                                starting_directory=starting_directory)
+        # Deletes for different tables are independent, so they run on the load workers with the largest first
+        self.run_manifest_tasks(
+            manifest_rows=deletes_filter,
+            task_function=lambda worker_service, row: worker_service.process_delete(row=row,
+                                                                                  starting_directory=starting_directory),
+            description='Table delete')
 
     def create_staging_table(self, staging_table_name: str, **kwargs):
         file_format_name: str = "PARQUET" if self.convert_to_parquet else "CSV"
+        # With typed_columns, the staging table is a view that casts the file's columns to the target's types
+        file_table_name: str = f"{staging_table_name}_file" if self.typed_columns else staging_table_name
         create_staging_table_query: str = f"""
-                            CREATE TEMP TABLE {staging_table_name}
+                            CREATE TEMP TABLE {file_table_name}
                             USING {file_format_name}
                             OPTIONS (
                                 path '{kwargs['object_path']}',
@@ -183,18 +325,18 @@ class DatabricksService(DatabaseService):
 
         self.db_connection.execute_query(query=create_staging_table_query)
 
+        if self.typed_columns:
+            select_columns: str = self.create_sql_str_select_columns(table_name=kwargs['table_name'],
+                                                                     headers=kwargs.get('csv_headers'))
+            self.db_connection.execute_query(query=f"""
+                            CREATE OR REPLACE TEMP VIEW {staging_table_name} AS
+                            SELECT {select_columns} FROM {file_table_name};
+                        """)
+
     def insert_into_target_table(self, table_name: str, **kwargs):
-        file_format_name: str = "PARQUET" if self.convert_to_parquet else "CSV"
-        copy_into_query: str = f"""
-                        COPY INTO {self.schema}.{table_name}
-                        FROM '{kwargs['object_path']}'
-                        FILEFORMAT = {file_format_name}
-                        FORMAT_OPTIONS ('inferSchema' ='false',
-                                        'delimiter' = ',',
-                                        'header' = 'true')
-                        COPY_OPTIONS ('inferSchema' ='false');
-                    """
-        self.db_connection.execute_query(query=copy_into_query)
+        self.db_connection.execute_query(query=self.create_sql_str_copy_into(table_name=table_name,
+                                                                             object_path=kwargs['object_path'],
+                                                                             headers=kwargs.get('headers')))
 
         merge_into_query: str = f"""
                                 MERGE INTO {table_name} AS target
@@ -208,55 +350,76 @@ class DatabricksService(DatabaseService):
 
         self.db_connection.execute_query(merge_into_query)
 
-    def process_delete(self, row: pd.Series, starting_directory: str):
-        raw_table = row["extract"].split(".")[1]
-        related_file = row["file"]
-        if self.convert_to_parquet:
-            related_file = related_file.replace(".csv", ".parquet")
-            file_format = "PARQUET"
-        else:
-            file_format = "CSV"
-        s3_file_uri = f"{self.object_storage_root}/{starting_directory}/{related_file}"
-        table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
-        if raw_table != "metadata_deletes":
-            if table_name == 'picklist__sys':
-                column_names = 'object, object_field, picklist_value_name'
-            elif table_name == 'metadata':
-                column_names = 'extract, column_name'
-            else:
-                column_names = 'id'
-
-            # Split column names into a list
-            column_names_list = column_names.split(', ')
-
-            # Build the ON condition by dynamically inserting AND between column comparisons
-            on_condition = ' AND '.join([f"target.{col} = source.{col}" for col in column_names_list])
+    def stage_deletes(self, table_name: str, object_path: str) -> str:
+        """
+        Creates a temporary view over the deletes file of a table.
 
-            create_query = f"""
-                    CREATE OR REPLACE TEMPORARY VIEW temp_{table_name}_deletes
-                    USING {file_format}
-                    OPTIONS (
-                        path '{s3_file_uri}',
-                        header 'true',
-                        inferSchema 'true'
-                    );
-                """
+        :param table_name: The target table
+        :param object_path: The full object path of the deletes file
+        :return: The name of the temporary view
+        """
+        file_format = "PARQUET" if self.convert_to_parquet else "CSV"
+        temp_view_name: str = f"temp_{table_name}_deletes"
+        create_query = f"""
+                CREATE OR REPLACE TEMPORARY VIEW {temp_view_name}
+                USING {file_format}
+                OPTIONS (
+                    path '{object_path}',
+                    header 'true',
+                    inferSchema 'true'
+                );
+            """
+
+        # Load the data from the deletes file into the temporary view
+        self.db_connection.execute_query(create_query)
+        return temp_view_name
 
-            # Load the data from the CSV file into the temporary view
-            self.db_connection.execute_query(create_query)
+    def process_delete(self, row: pd.Series, starting_directory: str):
+        # Apply the deletes for the table as one unit of work
+        with self.db_connection.transaction():
+            raw_table = row["extract"].split(".")[1]
+            related_file = row["file"]
+            if self.convert_to_parquet:
+                related_file = related_file.replace(".csv", ".parquet")
+            s3_file_uri = f"{self.object_storage_root}/{starting_directory}/{related_file}"
+            table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
+            if raw_table != "metadata_deletes":
+                column_names_list: list[str] = self.get_primary_keys(table_name=table_name)
+
+                # Build the ON condition by dynamically inserting AND between column comparisons
+                on_condition = ' AND '.join([f"target.{col} = source.{col}" for col in column_names_list])
+
+                temp_view_name: str = self.stage_deletes(table_name=table_name, object_path=s3_file_uri)
+
+                # Delete the matching rows from the target table
+                delete_query = f"""
+                        MERGE INTO {self.catalog}.{self.schema}.{table_name} AS target
+                        USING {temp_view_name} AS source
+                        ON {on_condition}
+                        WHEN MATCHED THEN DELETE;
+                    """
 
-            # Delete the matching rows from the target table
-            delete_query = f"""
-                    MERGE INTO {self.catalog}.{self.schema}.{table_name} AS target
-                    USING temp_{table_name}_deletes AS source
-                    ON {on_condition}
-                    WHEN MATCHED THEN DELETE;
-                """
+                self.db_connection.execute_query(delete_query)
 
-            self.db_connection.execute_query(delete_query)
+    def apply_table_changes(self, table_name: str, updates_object_path: str, deletes_object_path: str,
+                            headers: list[str] = None, **kwargs):
+        # Apply the table's updates and deletes with a single MERGE into the target table
+        staging_table_name: str = f"{table_name}_staging"
+        self.create_staging_table(staging_table_name=staging_table_name,
+                                  table_name=table_name,
+                                  object_path=updates_object_path,
+                                  csv_headers=headers)
+        temp_view_name: str = self.stage_deletes(table_name=table_name, object_path=deletes_object_path)
+
+        table_columns: list = list(self.retrieve_column_info(table_name).keys())
+        self.db_connection.execute_query(self.create_sql_str_change_merge(
+            target_table_name=f"{self.catalog}.{self.schema}.{table_name}",
+            updates_table_name=staging_table_name,
+            deletes_table_name=temp_view_name,
+            table_columns=table_columns,
+            primary_keys=self.get_primary_keys(table_name=table_name)))
 
     def load_full_or_log_data(self, table_name: str, object_path: str, headers: list = None):
-        file_format_name: str = "PARQUET" if self.convert_to_parquet else "CSV"
         if self.convert_to_parquet:
             self.db_connection.execute_query(f"""
                     CREATE TABLE IF NOT EXISTS {self.schema}.{table_name}
@@ -265,33 +428,111 @@ class DatabricksService(DatabaseService):
                     LIMIT 0;
                 """)
 
-        self.db_connection.execute_query(f"""
-                        COPY INTO {self.schema}.{table_name}
-                        FROM '{object_path}'
-                        FILEFORMAT = {file_format_name}
-                        FORMAT_OPTIONS ('inferSchema' ='{self.infer_schema}',
-                                        'delimiter' = ',',
-                                        'header' = 'true')
-                        COPY_OPTIONS ('inferSchema' ='{self.infer_schema}');
-                    """)
+        self.db_connection.execute_query(self.create_sql_str_copy_into(table_name=table_name,
+                                                                       object_path=object_path,
+                                                                       headers=headers,
+                                                                       infer_schema=self.infer_schema))
 
     def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
-        if table_name == 'picklist__sys':
-            column_names = 'object, object_field, picklist_value_name'
-        elif table_name == 'metadata':
-            column_names = 'extract, column_name'
-        else:
-            column_names = 'id'
-
-        column_names_list = column_names.split(', ')
-        staging_table_name: str = f"{table_name}_staging"
+        # Apply the table's whole change set as one unit of work
+        with self.db_connection.transaction():
+            column_names_list: list[str] = self.get_primary_keys(table_name=table_name)
+            staging_table_name: str = f"{table_name}_staging"
+
+            on_condition = ' AND '.join([f"target.{col} = source.{col}" for col in column_names_list])
 
-        on_condition = ' AND '.join([f"target.{col} = source.{col}" for col in column_names_list])
+            self.create_staging_table(staging_table_name=staging_table_name,
+                                      table_name=table_name,
+                                      object_path=object_path,
+                                      csv_headers=headers)
+            self.insert_into_target_table(
+                table_name=table_name,
+                object_path=object_path,
+                headers=headers,
+                staging_table_name=staging_table_name,
+                on_condition=on_condition
+            )
+
+    def maintain_changed_tables(self, table_names: list[str]):
+        """
+        Applies the table layout and runs the scheduled OPTIMIZE of the tables changed by an incremental extract, on
+        load_workers connections.
 
-        self.create_staging_table(staging_table_name=staging_table_name, object_path=object_path)
-        self.insert_into_target_table(
-            table_name=table_name,
-            object_path=object_path,
-            staging_table_name=staging_table_name,
-            on_condition=on_condition
-        )
+        :param table_names: The tables with updates or deletes in the extract
+        """
+        if not self.manage_table_layout and self.optimize_after_incrementals <= 0:
+            return
+
+        tasks: list[ScheduledTask] = [
+            ScheduledTask(name=table_name,
+                          function=lambda worker_context, table_name: worker_context.maintain_table(table_name),
+                          table_name=table_name)
+            for table_name in table_names
+        ]
+        self.run_worker_tasks(tasks=tasks, description='Table maintenance')
+        failed_tables: list[str] = [task.name for task in tasks if not task.succeeded]
+        if failed_tables:
+            log_message(log_level='Error',
+                        message=f'Table maintenance failed for: {", ".join(failed_tables)}')
+
+    def maintain_table(self, table_name: str):
+        """
+        Applies the layout of a table that may have been created before manage_table_layout was enabled, and counts
+        the incremental load in a table property. After optimize_after_incrementals incremental loads, the table is
+        optimized, which compacts small files and clusters them on the clustering columns, so that merge latency
+        stays flat as the table grows.
+
+        :param table_name: The table name
+        """
+        qualified_table_name: str = self.qualified_table_name(table_name=table_name)
+        table_columns: list[str] = list(self.retrieve_column_info(table_name).keys())
+        if not table_columns:
+            return
+
+        properties: dict[str, str] = self.get_table_properties(table_name=table_name, table_columns=table_columns)
+        optimize_table: bool = False
+        if self.optimize_after_incrementals > 0:
+            incrementals: int = self.get_incrementals_since_optimize(qualified_table_name=qualified_table_name) + 1
+            optimize_table = incrementals >= self.optimize_after_incrementals
+            properties[INCREMENTALS_SINCE_OPTIMIZE_PROPERTY] = '0' if optimize_table else str(incrementals)
+
+        # The statistics columns are set before the clustering, which needs statistics on its columns
+        if properties:
+            self.db_connection.execute_query(f"""
+                    ALTER TABLE {qualified_table_name}
+                    SET TBLPROPERTIES ({self.create_sql_str_table_properties(properties)})
+                """)
+
+        cluster_by: list[str] = self.get_cluster_by_columns(table_name=table_name, table_columns=table_columns)
+        if cluster_by and cluster_by != self.get_table_clustering_columns(qualified_table_name=qualified_table_name):
+            self.db_connection.execute_query(f"ALTER TABLE {qualified_table_name} CLUSTER BY ({', '.join(cluster_by)})")
+
+        if optimize_table:
+            log_message(log_level='Info',
+                        message=f'Optimizing {qualified_table_name} after {incrementals} incremental loads')
+            self.db_connection.execute_query(f"OPTIMIZE {qualified_table_name}")
+
+    def get_table_clustering_columns(self, qualified_table_name: str) -> list[str]:
+        """
+        Returns the columns a table is currently clustered on, from DESCRIBE DETAIL, so that the clustering is only
+        changed when it differs from the table layout.
+
+        :param qualified_table_name: The qualified table name
+        """
+        rows: list = self.db_connection.execute_query(f"DESCRIBE DETAIL {qualified_table_name}")
+        try:
+            clustering_columns: list = rows[0].asDict().get('clusteringColumns') or []
+        except (IndexError, AttributeError):
+            return []
+        # Nested columns are listed as the parts of their name
+        return ['.'.join(column).lower() if isinstance(column, (list, tuple)) else str(column).lower()
+                for column in clustering_columns]
+
+    def get_incrementals_since_optimize(self, qualified_table_name: str) -> int:
+        rows: list = self.db_connection.execute_query(
+            f"SHOW TBLPROPERTIES {qualified_table_name} ('{INCREMENTALS_SINCE_OPTIMIZE_PROPERTY}')")
+        try:
+            # A table without the property returns a message instead of a number
+            return int(rows[0][1])
+        except (IndexError, TypeError, ValueError):
+            return 0
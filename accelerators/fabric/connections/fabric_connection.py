@@ -1,3 +1,7 @@
+import threading
+import time
+
+from azure.core.credentials import AccessToken
 from azure.identity import DefaultAzureCredential
 import pyodbc, struct
 from pyodbc import Connection, Error, Cursor
@@ -6,20 +10,58 @@ from itertools import chain, repeat
 from common.connections.database_connection import DatabaseConnection
 from common.utilities import log_message
 
+DATABASE_TOKEN_SCOPE: str = "https://database.windows.net//.default"
+# Tokens are refreshed ahead of expiry, so that a connection is never opened with a token that is about to expire
+TOKEN_REFRESH_MARGIN_SECONDS: int = 5 * 60
+
+
+class AccessTokenCache:
+    """
+    Caches the access token used to connect to Fabric Warehouse. A token is requested from the credential on first use
+    and again TOKEN_REFRESH_MARGIN_SECONDS before it expires. The cache is shared by the connections of a
+    FabricService, including the pooled connections of its workers, so opening or re-establishing a connection does
+    not probe the credential chain again.
+    """
+
+    def __init__(self, credential: DefaultAzureCredential = None, scope: str = DATABASE_TOKEN_SCOPE):
+        self.credential: DefaultAzureCredential | None = credential
+        self.scope: str = scope
+        self.access_token: AccessToken | None = None
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_token(self) -> str:
+        """
+        Returns the cached token, requesting a new one if there is none or it expires within the refresh margin.
+        """
+        with self.lock:
+            if self.access_token is None \
+                    or time.time() >= self.access_token.expires_on - TOKEN_REFRESH_MARGIN_SECONDS:
+                if self.credential is None:
+                    self.credential = DefaultAzureCredential()
+                self.access_token = self.credential.get_token(self.scope)
+                log_message(log_level='Debug',
+                            message=f'Retrieved access token expiring at {time.ctime(self.access_token.expires_on)}')
+            return self.access_token.token
+
 
 class FabricConnection(DatabaseConnection):
     """
     TODO: Add docstring
     """
+    # Fabric Warehouse does not support savepoints, so nested units of work join the outer transaction
+    savepoint_statement: str | None = None
+    supports_statement_batches: bool = True
+    parameter_marker: str = '?'
 
     def __init__(self, connection_string: str, database: str, server_name: str,
-                 credential: DefaultAzureCredential = None):
+                 credential: DefaultAzureCredential = None, token_cache: AccessTokenCache = None):
         """
         This initializes the Fabric Warehouse Connector class with the given parameters that allow the class to connect to an
-        active Fabric Warehouse.
+        active Fabric Warehouse. Connections that share a token_cache share its access token.
         """
         super().__init__()
         self.credential: DefaultAzureCredential = credential
+        self.token_cache: AccessTokenCache = token_cache or AccessTokenCache(credential=credential)
         self.server_name: str = server_name
         self.database: str = database
         self.connection_string: str = connection_string
@@ -35,9 +77,7 @@ class FabricConnection(DatabaseConnection):
             if self.connected:
                 return self.con
 
-            credential = DefaultAzureCredential()
-            token_object  = credential.get_token("https://database.windows.net//.default")
-            token_as_bytes = bytes(token_object.token, "UTF-8") # Convert the token to a UTF-8 byte string
+            token_as_bytes = bytes(self.token_cache.get_token(), "UTF-8") # Convert the token to a UTF-8 byte string
             encoded_bytes = bytes(chain.from_iterable(zip(token_as_bytes, repeat(0)))) # Encode the bytes to a Windows byte string
             token_bytes = struct.pack("<i", len(encoded_bytes)) + encoded_bytes # Package the token into a bytes object
             attrs_before = {1256: token_bytes}  # Attribute pointing to SQL_COPT_SS_ACCESS_TOKEN to pass access token to the driver
@@ -74,13 +114,16 @@ class FabricConnection(DatabaseConnection):
                 else:
                     return []
             else:
-                self.con.commit()
+                if not self.in_transaction:
+                    self.con.commit()
                 return None
         except Exception as e:
             log_message(
                 log_level='Exception',
                 message=f"Executing query: {query}",
                 exception=e)
+            if self.in_transaction:
+                raise e
             return []
 
     def activate_cursor(self):
@@ -90,3 +133,15 @@ class FabricConnection(DatabaseConnection):
 
     def close_cursor(self):
         self.cursor.close()
+
+    def consume_batch_results(self):
+        # pyodbc only raises an error in a later statement of a batch once its result set is reached
+        while self.cursor.nextset():
+            pass
+
+    def begin_transaction(self):
+        # The connection runs in autocommit mode outside of a unit of work
+        self.con.autocommit = False
+
+    def end_transaction(self):
+        self.con.autocommit = True
@@ -1,20 +1,27 @@
+import numpy as np
 import pandas as pd
 from azure.identity import DefaultAzureCredential
 from pandas import DataFrame
-from pyarrow import ExtensionArray
 
-from accelerators.fabric.connections.fabric_connection import FabricConnection
+from accelerators.fabric.connections.fabric_connection import AccessTokenCache, FabricConnection
 from common.services.database_service import DatabaseService
+from common.services.schema_catalog import SchemaCatalog
 from common.utilities import log_message, update_table_name_that_starts_with_digit
 
 
 class FabricService(DatabaseService):
+    supports_combined_changes: bool = True
+    quoted_identifier_format: str = '[{}]'
+
     def __init__(self, parameters: dict):
         super().__init__(parameters)
         self.server_name: str = parameters['server_name']
         self.database: str = parameters['database']
         self.schema: str = parameters['schema']
         self.credential = DefaultAzureCredential()
+        # Shared by every connection of the service and its workers
+        self.token_cache: AccessTokenCache = AccessTokenCache(credential=self.credential)
+        self.direct_load: bool = parameters.get('direct_load', True)
         self.connection_string: str = (parameters['connection_string']
                                        .replace('{server_name}', self.server_name)
                                        .replace('{database}', self.database))
@@ -25,9 +32,37 @@ class FabricService(DatabaseService):
             server_name=self.server_name,
             database=self.database,
             connection_string=self.connection_string,
-            credential=self.credential
+            credential=self.credential,
+            token_cache=self.token_cache
         )
 
+    @staticmethod
+    def create_column_definitions(table_df: DataFrame) -> pd.Series:
+        """
+        Maps every metadata row to its Fabric Warehouse column definition in a single vectorised pass.
+
+        :param table_df: A DataFrame containing column details (column_name, type, length).
+        :return: The column definitions, with the same index as table_df.
+        """
+        column_names: pd.Series = table_df['column_name'].str.lower()
+        data_types: pd.Series = table_df['type'].str.lower()
+        bracketed_names: pd.Series = '[' + column_names + '] '
+
+        return pd.Series(np.select(
+            [
+                (data_types == "id") | ((column_names == 'id') & (data_types == 'string')),
+                data_types.isin(["datetime", "timestamp with time zone"]),
+                data_types == "boolean",
+                data_types.isin(["number", "numeric"]),
+            ],
+            [
+                bracketed_names + 'VARCHAR(MAX)',
+                bracketed_names + 'DATETIME2(3)',
+                bracketed_names + 'BIT',
+                bracketed_names + 'NUMERIC',
+            ],
+            default='"' + column_names + '" VARCHAR(MAX)'), index=table_df.index)
+
     @staticmethod
     def create_sql_str_column_definitions(table_df: DataFrame, is_picklist: bool = False, is_modify: bool = False,
                                           is_add: bool = False) -> str:
@@ -40,24 +75,7 @@ class FabricService(DatabaseService):
         :param is_picklist: A boolean indicating if the table is the picklist table.
         :return: A partial SQL string defining the table columns.
         """
-        column_definitions = []
-
-        for _, row in table_df.iterrows():
-            column_name = row['column_name'].lower()
-            data_type = row['type'].lower()
-
-            if data_type == "id" or (column_name == 'id' and data_type == 'string'):
-                column_def = f'[{column_name}] VARCHAR(MAX)'
-            elif data_type in ["datetime", "timestamp with time zone"]:
-                column_def = f'[{column_name}] DATETIME2(3)'
-            elif data_type == "boolean":
-                column_def = f'[{column_name}] BIT'
-            elif data_type in ["number", "numeric"]:
-                column_def = f'[{column_name}] NUMERIC'
-            else:
-                column_def = f'"{column_name}" VARCHAR(MAX)'
-
-            column_definitions.append(column_def)
+        column_definitions: list = FabricService.create_column_definitions(table_df=table_df).tolist()
 
         if is_modify and not is_add:
             return "ALTER COLUMN " + ", ALTER COLUMN ".join(column_definitions)
@@ -133,9 +151,21 @@ class FabricService(DatabaseService):
                         exception=e)
             raise e
 
-    def retrieve_column_info(self, table_name: str) -> dict:
+    def load_schema_catalog(self) -> dict[str, dict[str, dict]]:
+        schema_columns_query: str = f"""
+            SELECT table_name, column_name, data_type, character_maximum_length
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE
+            table_catalog = '{self.database}' 
+            AND table_schema = '{self.schema}';
+        """
+        sql_result: list = self.db_connection.execute_query(schema_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH'])
+
+    def query_column_info(self, table_name: str) -> dict:
         existing_columns_query = f"""
-            SELECT column_name, data_type, character_maximum_length
+            SELECT table_name, column_name, data_type, character_maximum_length
             FROM INFORMATION_SCHEMA.COLUMNS
             WHERE
             table_catalog = '{self.database}' 
@@ -143,45 +173,15 @@ class FabricService(DatabaseService):
             AND table_name = '{table_name}';
         """
         sql_result: list = self.db_connection.execute_query(existing_columns_query)
-        # Convert pyodbc.Row items to a list of tuples
-        sql_result_tuples = [tuple(row) for row in sql_result]
-
-        columns: list = ['COLUMN_NAME', 'DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
-        existing_columns_df = pd.DataFrame(sql_result_tuples, columns=columns)
-
-        # Convert to dictionary for quick lookup
-        return {
-            row['COLUMN_NAME'].lower(): {
-                "DATA_TYPE": row["DATA_TYPE"].lower(),
-                "CHARACTER_MAXIMUM_LENGTH": row["CHARACTER_MAXIMUM_LENGTH"]
-            }
-            for _, row in existing_columns_df.iterrows()
-        }
-
-    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
-
-        unique_extract_values: ExtensionArray = metadata_table["extract"].unique()
-
-        for extract in unique_extract_values:
-            filtered_metadata: DataFrame = metadata_table[metadata_table["extract"] == extract]
-            # Vault allows 255 characters for description__sys, but the extract metadata defines a length of 128.
-            if extract == "Object.security_policy__sys":
-                filtered_metadata.loc[
-                    (filtered_metadata['column_name'] == 'description__sys'),
-                    ['type', 'length']
-                ] = ['String', 255]
-
-            new_table_name: str = update_table_name_that_starts_with_digit(extract.split(".")[1])
-            self.create_single_table(table_name=new_table_name, filtered_metadata=filtered_metadata)
-
-        # Create metadata table
-        column_definitions: dict = {col: ["STRING"] for col in metadata_table.columns}
-        new_metadata_df = pd.DataFrame.from_dict(column_definitions).astype(str)
-        new_metadata_df.loc["length"] = 1000
-        new_metadata_df = new_metadata_df.T.reset_index()
-        new_metadata_df.columns = ["column_name", "type", "length"]
-
-        self.create_single_table(table_name="metadata", filtered_metadata=new_metadata_df)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
+                                               ).get(table_name.lower(), {})
+
+    def create_table_statement(self, table_name: str, column_definitions: str) -> str:
+        return f"""
+                IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = '{table_name}' AND schema_id = SCHEMA_ID('{self.schema}'))
+                CREATE TABLE {self.schema}.{table_name} ({column_definitions});
+            """
 
     def create_single_table(self, table_name: str, filtered_metadata: pd.DataFrame):
         is_picklist = False
@@ -191,10 +191,10 @@ class FabricService(DatabaseService):
         sql_string: str = self.create_sql_str_column_definitions(filtered_metadata, is_picklist=is_picklist,
                                                                  is_modify=False, is_add=False)
 
-        self.db_connection.execute_query(f"""
-                IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = '{table_name}' AND schema_id = SCHEMA_ID('{self.schema}'))
-                CREATE TABLE {self.schema}.{table_name} ({sql_string});
-            """)
+        self.db_connection.execute_query(self.create_table_statement(table_name=table_name,
+                                                                     column_definitions=sql_string))
+
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def add_columns_to_table(self, columns_to_add: pd.DataFrame, table_name: str):
         column_definitions: str = self.create_sql_str_column_definitions(
@@ -206,6 +206,9 @@ class FabricService(DatabaseService):
                         """
             self.db_connection.execute_query(alter_query)
 
+        # The database chooses the exact types of the new columns, so re-read this table only
+        self.schema_catalog.refresh_table(database_service=self, table_name=table_name)
+
     def drop_tables_in_schema(self, tables: list | tuple):
         for (table_name,) in tables:
             drop_query: str = f'DROP TABLE {self.schema}."{table_name}";'
@@ -213,6 +216,7 @@ class FabricService(DatabaseService):
                         message=f"Executing: {drop_query}",
                         context=None)
             self.db_connection.execute_query(drop_query)
+            self.schema_catalog.invalidate_table(table_name=table_name)
 
         log_message(log_level='Info',
                     message=f"Tables dropped successfully")
@@ -220,6 +224,7 @@ class FabricService(DatabaseService):
     def drop_table(self, table_name: str):
         drop_query: str = f'DROP TABLE IF EXISTS {self.schema}.{table_name};'
         self.db_connection.execute_query(drop_query)
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def drop_columns_from_table(self, table_name: str, columns: list):
         for column_name in columns:
@@ -229,15 +234,20 @@ class FabricService(DatabaseService):
             """
             self.db_connection.execute_query(drop_column_query)
 
+        self.schema_catalog.drop_columns(table_name=table_name, columns=columns)
+
     def delete_data_from_table(self, starting_directory: str,
                                manifest_table: pd.DataFrame):
 
         deletes_filter: DataFrame = manifest_table[
             (manifest_table["type"] == "deletes") & (manifest_table["records"] > 0)]
 
-        for index, row in deletes_filter.iterrows():
-            self.process_delete(row=row,
-                                starting_directory=starting_directory)
+        # Deletes for different tables are independent, so they run on the load workers with the largest first
+        self.run_manifest_tasks(
+            manifest_rows=deletes_filter,
+            task_function=lambda worker_service, row: worker_service.process_delete(row=row,
+                                                                                  starting_directory=starting_directory),
+            description='Table delete')
 
     def create_raw_data_table(self, raw_data_table_name: str, headers: list[str] = None):
         column_definitions_list = [f"[{col_name}] VARCHAR(MAX)" for col_name in headers]
@@ -246,6 +256,8 @@ class FabricService(DatabaseService):
         create_raw_data_table_query: str = f"""
                         CREATE TABLE {self.schema}.{raw_data_table_name} ({column_definitions_sql_str});
                         """
+        # A load that failed outside a transaction, e.g. in committed delete batches, may have left the table behind
+        self.drop_table(table_name=raw_data_table_name)
         self.db_connection.execute_query(query=create_raw_data_table_query)
 
     def copy_into_raw_data_table(self, raw_data_table_name: str, object_path: str):
@@ -275,6 +287,7 @@ class FabricService(DatabaseService):
                         FROM {self.schema}.{kwargs['table_name']};
                     """
 
+        self.drop_table(table_name=staging_table_name)
         self.db_connection.execute_query(create_staging_table_query)
 
     def get_staging_table_schema_rows(self, staging_table_name: str) -> list:
@@ -324,79 +337,168 @@ class FabricService(DatabaseService):
 
         self.db_connection.execute_query(query=insert_query)
 
-    def process_delete(self, row: pd.Series, starting_directory: str):
-        raw_table = row["extract"].split(".")[1]
-        related_file = row["file"]
-        if self.convert_to_parquet:
-            related_file = related_file.replace(".csv", ".parquet")
-        object_path = f"{self.object_storage_root}/{starting_directory}/{related_file}"
-        table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
-
-        if raw_table != "metadata_deletes":
-            columns_def = ''
-            column_names_concat = ''
-            column_names = ''
-            if table_name == 'picklist__sys':
-                column_names_concat += 'object + object_field + picklist_value_name'
-                columns_def += 'object VARCHAR(255), object_field VARCHAR(255), picklist_value_name VARCHAR(255)'
-                column_names += 'object, object_field, picklist_value_name'
-            elif table_name == 'metadata':
-                column_names_concat += 'extract + column_name'
-                columns_def += 'extract VARCHAR(255), column_name VARCHAR(255)'
-                column_names += 'extract, column_name'
-            else:
-                column_names_concat += 'id'
-                columns_def += 'id VARCHAR(255)'
-                column_names += 'id'
-
-            raw_data_table_name: str = f"{table_name}_deletes_raw"
-            staging_table_name: str = f"{table_name}_deletes_staging"
-
-            create_raw_data_table_query: str = f"CREATE TABLE {self.schema}.{raw_data_table_name} ({columns_def}, deleted_date VARCHAR(255))"
-            self.db_connection.execute_query(create_raw_data_table_query)
-
-            file_type = 'PARQUET' if self.convert_to_parquet else 'CSV'
-            with_statement: str = \
-                f"""WITH (
-                        FILE_TYPE = '{file_type}'
-                    );
-                """ if self.convert_to_parquet else f"""
-                WITH (
-                    FILE_TYPE = '{file_type}',
-                    FIRSTROW = 2
-                );
-            """
+    def stage_deletes(self, table_name: str, object_path: str) -> tuple[str, str]:
+        """
+        Loads the deletes file of a table into a staging table, via a raw data table holding the file as strings.
 
-            copy_into_raw_data_table_query: str = f"""
-            COPY INTO {self.schema}.{raw_data_table_name}
-            FROM '{object_path}'
-            {with_statement}
-            """
-            self.db_connection.execute_query(copy_into_raw_data_table_query)
+        :param table_name: The target table
+        :param object_path: The full object path of the deletes file
+        :return: The names of the staging table and the raw data table, to be dropped once applied
+        """
+        primary_keys: list[str] = self.get_primary_keys(table_name=table_name)
+        columns_def: str = ', '.join(f'{col} VARCHAR(255)' for col in primary_keys)
+        column_names: str = ', '.join(primary_keys)
 
-            create_staging_table_query: str = f"CREATE TABLE {self.schema}.{staging_table_name} ({columns_def}, deleted_date DATETIME2(3))"
-            self.db_connection.execute_query(create_staging_table_query)
+        raw_data_table_name: str = f"{table_name}_deletes_raw"
+        staging_table_name: str = f"{table_name}_deletes_staging"
 
-            insert_staging_table_query: str = f"""
-            INSERT INTO {self.schema}.{staging_table_name} ({column_names}, deleted_date)
-            SELECT {column_names}, TRY_CAST(NULLIF(TRIM(raw.[deleted_date]), '') AS DATETIME2)      AS [deleted_date]
-            FROM {self.schema}.{raw_data_table_name} AS raw;
-            """
-            self.db_connection.execute_query(insert_staging_table_query)
+        create_raw_data_table_query: str = f"CREATE TABLE {self.schema}.{raw_data_table_name} ({columns_def}, deleted_date VARCHAR(255))"
+        self.drop_table(table_name=raw_data_table_name)
+        self.db_connection.execute_query(create_raw_data_table_query)
+
+        file_type = 'PARQUET' if self.convert_to_parquet else 'CSV'
+        with_statement: str = \
+            f"""WITH (
+                    FILE_TYPE = '{file_type}'
+                );
+            """ if self.convert_to_parquet else f"""
+            WITH (
+                FILE_TYPE = '{file_type}',
+                FIRSTROW = 2
+            );
+        """
 
-            delete_query: str = f"""DELETE FROM {self.schema}.{table_name}
-                            WHERE {column_names_concat} IN (SELECT {column_names_concat} FROM {self.schema}.{staging_table_name});
-                            """
-            self.db_connection.execute_query(delete_query)
+        copy_into_raw_data_table_query: str = f"""
+        COPY INTO {self.schema}.{raw_data_table_name}
+        FROM '{object_path}'
+        {with_statement}
+        """
+        self.db_connection.execute_query(copy_into_raw_data_table_query)
 
-            drop_raw_data_table_query: str = f"DROP TABLE IF EXISTS {self.schema}.{raw_data_table_name};"
-            self.db_connection.execute_query(drop_raw_data_table_query)
+        create_staging_table_query: str = f"CREATE TABLE {self.schema}.{staging_table_name} ({columns_def}, deleted_date DATETIME2(3))"
+        self.drop_table(table_name=staging_table_name)
+        self.db_connection.execute_query(create_staging_table_query)
 
-            # Drop the staging table after processing
-            drop_staging_table_query: str = f"DROP TABLE IF EXISTS {self.schema}.{staging_table_name};"
-            self.db_connection.execute_query(drop_staging_table_query)
+        insert_staging_table_query: str = f"""
+        INSERT INTO {self.schema}.{staging_table_name} ({column_names}, deleted_date)
+        SELECT {column_names}, TRY_CAST(NULLIF(TRIM(raw.[deleted_date]), '') AS DATETIME2)      AS [deleted_date]
+        FROM {self.schema}.{raw_data_table_name} AS raw;
+        """
+        self.db_connection.execute_query(insert_staging_table_query)
+        return staging_table_name, raw_data_table_name
+
+    def process_delete(self, row: pd.Series, starting_directory: str):
+        # Apply the deletes for the table as one unit of work, or in committed batches if there are many
+        with self.delete_unit_of_work(records=int(row["records"])):
+            raw_table = row["extract"].split(".")[1]
+            related_file = row["file"]
+            if self.convert_to_parquet:
+                related_file = related_file.replace(".csv", ".parquet")
+            object_path = f"{self.object_storage_root}/{starting_directory}/{related_file}"
+            table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
+
+            if raw_table != "metadata_deletes":
+                staging_table_name, raw_data_table_name = self.stage_deletes(table_name=table_name,
+                                                                             object_path=object_path)
+
+                self.apply_key_delete(target_table_name=f"{self.schema}.{table_name}",
+                                      deletes_table_name=f"{self.schema}.{staging_table_name}",
+                                      primary_keys=self.get_primary_keys(table_name=table_name),
+                                      records=int(row["records"]))
+
+                drop_raw_data_table_query: str = f"DROP TABLE IF EXISTS {self.schema}.{raw_data_table_name};"
+                self.db_connection.execute_query(drop_raw_data_table_query)
+
+                # Drop the staging table after processing
+                drop_staging_table_query: str = f"DROP TABLE IF EXISTS {self.schema}.{staging_table_name};"
+                self.db_connection.execute_query(drop_staging_table_query)
 
     def load_full_or_log_data(self, table_name: str, object_path: str, headers: list = None):
+        if self.direct_load:
+            try:
+                # A failed direct load is rolled back, so that the table can be loaded through staging tables instead
+                with self.db_connection.transaction():
+                    if self.convert_to_parquet:
+                        self.copy_into_target_table(table_name=table_name, object_path=object_path, headers=headers)
+                    else:
+                        self.insert_from_openrowset(table_name=table_name, object_path=object_path, headers=headers)
+                return
+            except Exception as e:
+                log_message(log_level='Warning',
+                            message=f'Direct load of {table_name} failed. Loading through raw data and staging tables',
+                            exception=e)
+
+        self.load_through_staging_tables(table_name=table_name, object_path=object_path, headers=headers)
+
+    def get_target_columns_info(self, table_name: str, headers: list = None) -> list[dict]:
+        """
+        Returns the name and full type of the target table's columns that are in the extract file, from the schema
+        catalog, in the form used by create_sql_str_select_statement.
+
+        :param table_name: The target table
+        :param headers: The columns of the file. Defaults to all columns of the target table.
+        """
+        file_columns: list[str] | None = [header.lower() for header in headers] if headers else None
+        target_columns_info: list[dict] = []
+        for column_name, column_info in self.retrieve_column_info(table_name).items():
+            if file_columns is not None and column_name not in file_columns:
+                continue
+            system_type_name: str = column_info['DATA_TYPE']
+            if 'char' in system_type_name:
+                length = column_info.get('CHARACTER_MAXIMUM_LENGTH')
+                system_type_name = f"{system_type_name}({'max' if length in (None, -1) else int(length)})"
+            target_columns_info.append({"name": column_name, "system_type_name": system_type_name})
+        return target_columns_info
+
+    def copy_into_target_table(self, table_name: str, object_path: str, headers: list = None):
+        """
+        Loads a Parquet file into the target table with a single COPY INTO. The conversion to Parquet has already
+        typed the datetimes, so no cleaning is needed. Columns are matched by name.
+
+        :param table_name: The target table
+        :param object_path: The full object path of the Parquet file
+        :param headers: The columns of the file
+        """
+        column_list: str = ''
+        if headers:
+            column_list = f"({', '.join(f'[{header.lower()}]' for header in headers)})"
+        self.db_connection.execute_query(f"""
+            COPY INTO {self.schema}.{table_name} {column_list}
+            FROM '{object_path}'
+            WITH (
+                FILE_TYPE = 'PARQUET'
+            );
+            """)
+
+    def insert_from_openrowset(self, table_name: str, object_path: str, headers: list = None):
+        """
+        Loads a CSV file into the target table with a single INSERT ... SELECT from OPENROWSET, which reads the file
+        as strings and cleans and casts each column as the staging table load does, without writing the data to
+        intermediate tables.
+
+        :param table_name: The target table
+        :param object_path: The full object path of the CSV file
+        :param headers: The columns of the file
+        """
+        target_columns_info: list[dict] = self.get_target_columns_info(table_name=table_name, headers=headers)
+        if not target_columns_info:
+            raise ValueError(f'No columns of {table_name} found in the schema catalog')
+
+        select_expressions_sql_str: str = self.create_sql_str_select_statement(target_columns_info=target_columns_info)
+        insert_columns_sql_str: str = ", ".join(f"[{info['name']}]" for info in target_columns_info)
+        file_columns_sql_str: str = ", ".join(f"[{header.lower()}] VARCHAR(MAX)"
+                                              for header in headers or [info['name'] for info in target_columns_info])
+        self.db_connection.execute_query(f"""
+            INSERT INTO {self.schema}.{table_name} ({insert_columns_sql_str})
+            SELECT {select_expressions_sql_str}
+            FROM OPENROWSET(
+                BULK '{object_path}',
+                FORMAT = 'CSV',
+                HEADER_ROW = TRUE
+            ) WITH ({file_columns_sql_str}) AS raw;
+            """)
+
+    def load_through_staging_tables(self, table_name: str, object_path: str, headers: list = None):
         # Raw data Table -> Staging Table -> Target Table is used because the 'Z' in dateTime fields from
         # Vault are not recognized by SQL Server. They need to be staged and cleaned first.
         raw_data_table_name: str = f"{table_name}_raw"
@@ -439,18 +541,18 @@ class FabricService(DatabaseService):
         self.drop_table(table_name=staging_table_name)
         self.drop_table(table_name=raw_data_table_name)
 
-    def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
-        if table_name == 'metadata':
-            primary_keys = ["extract", "column_name"]
-        elif table_name == 'picklist__sys':
-            primary_keys = ["object", "object_field", "picklist_value_name"]
-        else:
-            primary_keys = ["id"]
+    def stage_updates(self, table_name: str, object_path: str, headers: list[str]) -> tuple[str, str, list[str]]:
+        """
+        Loads the updates file of a table into a staging table with the target table's column types, via a raw data
+        table holding the file as strings.
 
+        :param table_name: The target table
+        :param object_path: The full object path of the updates file
+        :param headers: The headers of the updates file
+        :return: The names of the staging table and the raw data table, and the columns of the staging table
+        """
         raw_data_table_name: str = f"{table_name}_csv"
         staging_table_name: str = f"{table_name}_staging"
-        pk_condition: str = " AND ".join(
-            [f"{self.schema}.{table_name}.{col} = {staging_table_name}.{col}" for col in primary_keys])
 
         # Create raw data table and load all data as Strings
         self.create_raw_data_table(raw_data_table_name=raw_data_table_name, headers=headers)
@@ -484,13 +586,45 @@ class FabricService(DatabaseService):
                                        select_expressions_sql_str=select_expressions_sql_str,
                                        insert_columns_sql_str=insert_columns_sql_str)
 
-        self.delete_duplicate_rows_from_table(table_name=table_name,
-                                              staging_table_name=staging_table_name,
-                                              pk_condition=pk_condition)
-
-        self.insert_into_target_table(table_name=table_name,
-                                      staging_table_name=staging_table_name)
-
-        self.drop_table(table_name=staging_table_name)
-        self.drop_table(table_name=raw_data_table_name)
+        return staging_table_name, raw_data_table_name, [info['name'] for info in target_columns_info]
 
+    def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
+        # Apply the table's whole change set as one unit of work
+        with self.db_connection.transaction():
+            primary_keys: list[str] = self.get_primary_keys(table_name=table_name)
+
+            staging_table_name, raw_data_table_name, _ = self.stage_updates(table_name=table_name,
+                                                                            object_path=object_path,
+                                                                            headers=headers)
+            pk_condition: str = " AND ".join(
+                [f"{self.schema}.{table_name}.{col} = {staging_table_name}.{col}" for col in primary_keys])
+
+            self.delete_duplicate_rows_from_table(table_name=table_name,
+                                                  staging_table_name=staging_table_name,
+                                                  pk_condition=pk_condition)
+
+            self.insert_into_target_table(table_name=table_name,
+                                          staging_table_name=staging_table_name)
+
+            self.drop_table(table_name=staging_table_name)
+            self.drop_table(table_name=raw_data_table_name)
+
+    def apply_table_changes(self, table_name: str, updates_object_path: str, deletes_object_path: str,
+                            headers: list[str] = None, **kwargs):
+        # Apply the table's updates and deletes as one unit of work, with a single MERGE into the target table
+        with self.db_connection.transaction():
+            staging_table_name, raw_data_table_name, table_columns = self.stage_updates(
+                table_name=table_name, object_path=updates_object_path, headers=headers)
+            deletes_staging_table_name, deletes_raw_data_table_name = self.stage_deletes(
+                table_name=table_name, object_path=deletes_object_path)
+
+            self.db_connection.execute_query(self.create_sql_str_change_merge(
+                target_table_name=f"{self.schema}.{table_name}",
+                updates_table_name=f"{self.schema}.{staging_table_name}",
+                deletes_table_name=f"{self.schema}.{deletes_staging_table_name}",
+                table_columns=table_columns,
+                primary_keys=self.get_primary_keys(table_name=table_name)))
+
+            for staging_table in (staging_table_name, raw_data_table_name,
+                                  deletes_staging_table_name, deletes_raw_data_table_name):
+                self.drop_table(table_name=staging_table)
@@ -25,8 +25,11 @@ def main():
     object_storage_root: str = f's3://{s3_params["bucket_name"]}'
 
     s3_params['convert_to_parquet'] = config_params['convert_to_parquet']
+    # Parquet COPY needs every file of a table to have the column's type, so Number columns are always written as doubles
+    s3_params['parquet_number_type'] = 'double'
     redshift_params['convert_to_parquet'] = config_params['convert_to_parquet']
     redshift_params['object_storage_root'] = object_storage_root
+    redshift_params['use_copy_manifest'] = int(s3_params.get('shard_size_mb', 0)) > 0
 
     s3_service: AwsS3Service = AwsS3Service(s3_params)
     redshift_service: RedshiftService = RedshiftService(redshift_params)
@@ -0,0 +1,52 @@
+import sys
+
+from accelerators.redshift.services.redshift_service import RedshiftService
+
+sys.path.append('.')
+from common.scripts import download_and_unzip_direct_data_files
+from common.services.aws_s3_service import AwsS3Service
+from common.utilities import log_message, read_json_file
+
+
+def main():
+    """
+    Compares CSV and Parquet COPY times for the tables listed in the copy_benchmark section of connector_config.json,
+    e.g. {"tables": {"product__v": "Object/product__v"}}, mapping each table to its extract file without extension.
+    The archive of the last accelerator run is unzipped once as CSV and once as Parquet, so that both formats of each
+    file are in S3, and each file is copied into temporary tables, leaving the loaded tables unchanged.
+    """
+    config_filepath: str = "path/to/connector_config.json"
+
+    config_params: dict = read_json_file(config_filepath)
+    s3_params: dict = config_params['s3']
+    redshift_params: dict = config_params['redshift']
+    benchmark_tables: dict[str, str] = config_params['copy_benchmark']['tables']
+
+    s3_params['parquet_number_type'] = 'double'
+    redshift_params['convert_to_parquet'] = True
+    redshift_params['object_storage_root'] = f's3://{s3_params["bucket_name"]}'
+    redshift_params['use_copy_manifest'] = int(s3_params.get('shard_size_mb', 0)) > 0
+
+    for convert_to_parquet in (False, True):
+        s3_params['convert_to_parquet'] = convert_to_parquet
+        download_and_unzip_direct_data_files.run(object_storage_service=AwsS3Service(s3_params))
+
+    s3_service: AwsS3Service = AwsS3Service(s3_params)
+    redshift_service: RedshiftService = RedshiftService(redshift_params)
+    redshift_service.db_connection.activate_cursor()
+
+    durations: dict[str, dict] = {}
+    for table_name, file_stem in benchmark_tables.items():
+        durations[table_name] = redshift_service.benchmark_copy_formats(
+            table_name=table_name,
+            csv_object_path=s3_service.get_full_object_path(filename=f'{file_stem}.csv'),
+            parquet_object_path=s3_service.get_full_object_path(filename=f'{file_stem}.parquet'))
+
+    csv_seconds: float = sum(table_durations['CSV'] for table_durations in durations.values())
+    parquet_seconds: float = sum(table_durations['Parquet'] for table_durations in durations.values())
+    log_message(log_level='Info',
+                message=f'COPY of {len(durations)} tables: CSV {csv_seconds:.2f}s, Parquet {parquet_seconds:.2f}s')
+
+
+if __name__ == "__main__":
+    main()
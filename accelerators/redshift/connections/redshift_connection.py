@@ -9,6 +9,9 @@ class RedshiftConnection(DatabaseConnection):
     """
     TODO: Add docstring
     """
+    # Redshift does not support savepoints, so nested units of work join the outer transaction
+    savepoint_statement: str | None = None
+    supports_statement_batches: bool = True
 
     def __init__(self, database: str, hostname: str, port_number: int, username: str, user_password: str):
         """
@@ -71,11 +74,38 @@ class RedshiftConnection(DatabaseConnection):
                 else:
                     return []
             else:
-                self.con.commit()
+                if not self.in_transaction:
+                    self.con.commit()
                 return None
         except Exception as e:
             log_message(
                 log_level='Exception',
                 message=f"Executing query: {query}",
                 exception=e)
+            if self.in_transaction:
+                raise e
             return []
+
+    def execute_outside_transaction(self, query: str):
+        """
+        Executes a statement that Redshift does not allow in a transaction block, such as ALTER TABLE APPEND, in
+        autocommit mode. Any transaction implicitly opened by earlier statements is committed first. Unlike
+        execute_query, errors are raised.
+
+        :param query: The statement to execute
+        """
+        if self.in_transaction:
+            raise RuntimeError('The statement cannot run inside a unit of work')
+        if not self.connected:
+            self.open()
+            self.cursor = self.con.cursor()
+
+        log_message(
+            log_level='Info',
+            message=f"Executing query outside of a transaction: {query}")
+        self.con.commit()
+        self.con.autocommit = True
+        try:
+            self.cursor.execute(query)
+        finally:
+            self.con.autocommit = False
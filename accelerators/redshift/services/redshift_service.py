@@ -1,13 +1,53 @@
+import copy
+import os
+import re
+import time
+
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from pyarrow import ExtensionArray
 
 from accelerators.redshift.connections.redshift_connection import RedshiftConnection
 from common.services.database_service import DatabaseService
+from common.services.schema_catalog import SchemaCatalog
 from common.utilities import log_message, update_table_name_that_starts_with_digit
 
+VARCHAR_LENGTH: int = 64000
+# VARCHAR lengths are in bytes, while metadata lengths are in characters of up to 4 bytes in UTF-8
+MAX_VARCHAR_LENGTH: int = 65535
+BYTES_PER_CHARACTER: int = 4
+# The distribution and sort keys of tables without an entry in the table_keys parameter
+DEFAULT_TABLE_KEYS: dict = {'distkey': 'id', 'sortkey': 'id'}
+# Column encodings by Redshift type. Other types use ZSTD, except picklist columns, which have few distinct values
+# and use BYTEDICT.
+COLUMN_ENCODINGS: dict[str, str] = {
+    'BIGINT': 'AZ64',
+    'NUMERIC': 'AZ64',
+    'TIMESTAMP': 'AZ64',
+    'DATE': 'AZ64',
+    'BOOLEAN': 'RAW',
+}
+# The Redshift column type of each Vault metadata type when the files are converted to Parquet. COPY ... FORMAT AS
+# PARQUET requires column types that match the file's types. The Redshift accelerator converts Number columns with
+# parquet_number_type 'double', so they are created as DOUBLE PRECISION. Integer is not a Vault type; it is used for
+# the int64 columns of the converted metadata file.
+REDSHIFT_PARQUET_TYPES: dict[str, str] = {
+    'Number': 'DOUBLE PRECISION',
+    'Integer': 'BIGINT',
+    'Date': 'DATE',
+    'DateTime': 'TIMESTAMP',
+    'Boolean': 'BOOLEAN',
+}
+# The typed columns of the metadata file, as written by get_metadata_schema. All other columns are strings.
+PARQUET_METADATA_COLUMN_TYPES: dict[str, str] = {
+    'modified_date__v': 'DateTime',
+    'length': 'Integer',
+}
+
 
 class RedshiftService(DatabaseService):
+    supports_delete_using: bool = True
+
     def __init__(self, parameters: dict):
         super().__init__(parameters)
         self.host = parameters['host']
@@ -17,6 +57,11 @@ class RedshiftService(DatabaseService):
         self.password = parameters['password']
         self.port = parameters['port']
         self.iam_role = parameters['iam_redshift_s3_read']
+        self.use_copy_manifest: bool = parameters.get('use_copy_manifest', False)
+        self.merge_incremental_changes: bool = parameters.get('merge_incremental_changes', False)
+        self.append_full_loads: bool = parameters.get('append_full_loads', False)
+        self.varchar_length_from_metadata: bool = parameters.get('varchar_length_from_metadata', False)
+        self.table_keys: dict[str, dict] = parameters.get('table_keys', {})
         self.db_connection: RedshiftConnection = self.get_connection()
 
     def get_connection(self) -> RedshiftConnection:
@@ -28,9 +73,50 @@ class RedshiftService(DatabaseService):
             user_password=self.password
         )
 
-    @staticmethod
-    def create_sql_str_column_definitions(table_df: DataFrame, is_picklist: bool = False, is_modify: bool = False,
-                                          is_add: bool = False) -> str:
+    def create_column_definitions(self, table_df: DataFrame, include_encodings: bool = True) -> pd.Series:
+        """
+        Maps every metadata row to its Redshift column definition in a single vectorised pass. When the extract files
+        are converted to Parquet, the column types match the Parquet types of the converted files. With
+        varchar_length_from_metadata, VARCHAR columns are sized from the metadata length instead of VARCHAR_LENGTH.
+
+        :param table_df: A DataFrame containing column details (column_name, type, length).
+        :param include_encodings: If True, each definition includes a column encoding chosen from its type.
+        :return: The column definitions, with the same index as table_df.
+        """
+        column_names: pd.Series = table_df['column_name'].str.lower()
+        varchar_type: pd.Series = pd.Series(f'VARCHAR({VARCHAR_LENGTH})', index=table_df.index)
+        if self.varchar_length_from_metadata and 'length' in table_df:
+            varchar_lengths: pd.Series = (pd.to_numeric(table_df['length'], errors='coerce') * BYTES_PER_CHARACTER
+                                          ).clip(lower=1, upper=MAX_VARCHAR_LENGTH)
+            varchar_type = ('VARCHAR(' + varchar_lengths.fillna(VARCHAR_LENGTH).astype(int).astype(str) + ')')
+
+        if self.convert_to_parquet:
+            column_types: pd.Series = table_df['type'].map(REDSHIFT_PARQUET_TYPES)
+            column_types = column_types.fillna(varchar_type)
+        else:
+            data_types: pd.Series = table_df['type'].str.lower()
+            column_types = pd.Series(np.select(
+                [
+                    (column_names == 'id') & (data_types == 'number'),
+                    data_types.isin(["datetime", "timestamp with time zone"]),
+                    data_types == "date",
+                    data_types == "boolean",
+                    data_types.isin(["number", "numeric"]),
+                ],
+                ['BIGINT', 'TIMESTAMP', 'DATE', 'BOOLEAN', 'NUMERIC'],
+                default=''), index=table_df.index)
+            column_types = column_types.where(column_types != '', varchar_type)
+
+        column_definitions: pd.Series = '"' + column_names + '" ' + column_types
+        if not include_encodings:
+            return column_definitions
+
+        encodings: pd.Series = column_types.map(COLUMN_ENCODINGS).fillna('ZSTD')
+        encodings = encodings.mask(table_df['type'] == 'Picklist', 'BYTEDICT')
+        return column_definitions + ' ENCODE ' + encodings
+
+    def create_sql_str_column_definitions(self, table_df: DataFrame, is_picklist: bool = False,
+                                          is_modify: bool = False, is_add: bool = False) -> str:
         """
         Generates a SQL string for creating table columns in Redshift.
 
@@ -40,29 +126,9 @@ class RedshiftService(DatabaseService):
         :param is_picklist: A boolean indicating if the table is the picklist table.
         :return: A partial SQL string defining the table columns.
         """
-        column_definitions = []
-
-        for _, row in table_df.iterrows():
-            column_name = row['column_name'].lower()
-            data_type = row['type'].lower()
-            length = 64000
-
-            if (column_name == 'id' and data_type == 'string'):
-                column_def = f'"{column_name}" VARCHAR({length})'
-            elif (column_name == 'id' and data_type == 'number'):
-                column_def = f'"{column_name}" BIGINT'
-            elif data_type in ["datetime", "timestamp with time zone"]:
-                column_def = f'"{column_name}" TIMESTAMP'
-            elif data_type == "date":
-                column_def = f'"{column_name}" DATE'
-            elif data_type == "boolean":
-                column_def = f'"{column_name}" BOOLEAN'
-            elif data_type in ["number", "numeric"]:
-                column_def = f'"{column_name}" NUMERIC'
-            else:
-                column_def = f'"{column_name}" VARCHAR({length})'
-
-            column_definitions.append(column_def)
+        # ALTER COLUMN only changes the type, so it cannot include an encoding
+        column_definitions: list = self.create_column_definitions(table_df=table_df,
+                                                                  include_encodings=not is_modify).tolist()
 
         if is_modify and not is_add:
             return "ALTER COLUMN " + ", ALTER COLUMN ".join(column_definitions)
@@ -77,6 +143,16 @@ class RedshiftService(DatabaseService):
                 )
         return ", ".join(column_definitions)
 
+    def create_metadata_column_definitions(self, metadata_table: pd.DataFrame) -> str:
+        if not self.convert_to_parquet:
+            return super().create_metadata_column_definitions(metadata_table=metadata_table)
+
+        # The converted metadata file has typed columns, which COPY ... FORMAT AS PARQUET cannot load into strings
+        metadata_columns: DataFrame = pd.DataFrame({"column_name": metadata_table.columns})
+        metadata_columns["type"] = metadata_columns["column_name"].map(PARQUET_METADATA_COLUMN_TYPES).fillna("String")
+        metadata_columns["length"] = 1000
+        return ", ".join(self.create_column_definitions(table_df=metadata_columns))
+
     def check_if_schema_exists(self):
 
         query = f"""
@@ -106,52 +182,78 @@ class RedshiftService(DatabaseService):
                         exception=e)
             raise e
 
-    def retrieve_column_info(self, table_name: str) -> dict:
+    def load_schema_catalog(self) -> dict[str, dict[str, dict]]:
+        schema_columns_query: str = f"""
+            SELECT table_name, column_name, data_type, character_maximum_length
+            FROM information_schema.columns
+            WHERE
+            table_catalog = '{self.database}' 
+            AND table_schema = '{self.schema}'
+            ORDER BY table_name, ordinal_position
+        """
+        sql_result: list = self.db_connection.execute_query(schema_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH'])
+
+    def query_column_info(self, table_name: str) -> dict:
         existing_columns_query = f"""
-            SELECT column_name, data_type, character_maximum_length
+            SELECT table_name, column_name, data_type, character_maximum_length
             FROM information_schema.columns
             WHERE
             table_catalog = '{self.database}' 
             AND table_schema = '{self.schema}'
             AND table_name = '{table_name}'
+            ORDER BY ordinal_position
+        """
+        sql_result: list = self.db_connection.execute_query(existing_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
+                                               ).get(table_name.lower(), {})
+
+    def create_table_statement(self, table_name: str, column_definitions: str) -> str:
+        distkey, sortkey_columns = self.get_table_keys(table_name=table_name, column_definitions=column_definitions)
+
+        table_attributes: list[str] = []
+        if distkey and distkey.upper() in ('ALL', 'EVEN', 'AUTO'):
+            table_attributes.append(f'DISTSTYLE {distkey.upper()}')
+        elif distkey:
+            table_attributes.append(f'DISTKEY ({self.set_quoted_identifier(distkey)})')
+        if sortkey_columns:
+            table_attributes.append(
+                f"SORTKEY ({', '.join(self.set_quoted_identifier(column) for column in sortkey_columns)})")
+            # Compressing the sort key columns makes range-restricted scans read more blocks
+            for column_name in sortkey_columns:
+                column_definitions = re.sub(rf'((?:^|, )"{re.escape(column_name)}" [^,]*? ENCODE )\w+', r'\1RAW',
+                                            column_definitions)
+
+        return f"""
+                CREATE TABLE IF NOT EXISTS {self.schema}.{table_name} ({column_definitions})
+                {' '.join(table_attributes)}
+            """
+
+    def get_table_keys(self, table_name: str, column_definitions: str) -> tuple[str | None, list[str]]:
+        """
+        Returns the distribution and sort keys of a table. Tables are distributed and sorted on id, so that deletes
+        and merges on id are co-located and scan only the matching blocks. The table_keys parameter overrides this per
+        table, e.g. {"picklist": {"distkey": "ALL", "sortkey": ["object", "object_field"]}}. A distkey of ALL, EVEN or
+        AUTO sets the distribution style instead, and null leaves the choice to Redshift. Keys on columns the table
+        does not have are skipped.
+
+        :param table_name: The table name
+        :param column_definitions: The column definitions of the table
+        :return: The distribution key or style, and the sort key columns
         """
-        sql_result = self.db_connection.execute_query(existing_columns_query)
-        columns = ['COLUMN_NAME', 'DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
-        existing_columns_df = pd.DataFrame(sql_result, columns=columns)
-
-        # Convert to dictionary for quick lookup
-        return {
-            row['COLUMN_NAME'].lower(): {
-                "DATA_TYPE": row["DATA_TYPE"].lower(),
-                "CHARACTER_MAXIMUM_LENGTH": row["CHARACTER_MAXIMUM_LENGTH"]
-            }
-            for _, row in existing_columns_df.iterrows()
-        }
-
-    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
-
-        unique_extract_values: ExtensionArray = metadata_table["extract"].unique()
-
-        for extract in unique_extract_values:
-            filtered_metadata = metadata_table[metadata_table["extract"] == extract]
-            # Vault allows 255 characters for description__sys, but the extract metadata defines a length of 128.
-            if extract == "Object.security_policy__sys":
-                filtered_metadata.loc[
-                    (filtered_metadata['column_name'] == 'description__sys'),
-                    ['type', 'length']
-                ] = ['String', 255]
-
-            new_table_name = update_table_name_that_starts_with_digit(extract.split(".")[1])
-            self.create_single_table(table_name=new_table_name, filtered_metadata=filtered_metadata)
-
-        # Create metadata table
-        column_definitions: dict = {col: ["STRING"] for col in metadata_table.columns}
-        new_metadata_df = pd.DataFrame.from_dict(column_definitions).astype(str)
-        new_metadata_df.loc["length"] = 1000
-        new_metadata_df = new_metadata_df.T.reset_index()
-        new_metadata_df.columns = ["column_name", "type", "length"]
-
-        self.create_single_table(table_name="metadata", filtered_metadata=new_metadata_df)
+        table_keys: dict = {**DEFAULT_TABLE_KEYS, **self.table_keys.get(table_name, {})}
+        distkey: str | None = table_keys.get('distkey')
+        sortkey: str | list | None = table_keys.get('sortkey')
+        sortkey_columns: list[str] = [sortkey] if isinstance(sortkey, str) else list(sortkey or [])
+
+        def has_column(column_name: str) -> bool:
+            return re.search(rf'(^|, )"{re.escape(column_name)}" ', column_definitions) is not None
+
+        if distkey and distkey.upper() not in ('ALL', 'EVEN', 'AUTO'):
+            distkey = distkey.lower() if has_column(distkey.lower()) else None
+        return distkey, [column.lower() for column in sortkey_columns if has_column(column.lower())]
 
     def create_single_table(self, table_name: str, filtered_metadata: pd.DataFrame):
         is_picklist = False
@@ -161,9 +263,10 @@ class RedshiftService(DatabaseService):
         sql_string = self.create_sql_str_column_definitions(filtered_metadata, is_picklist=is_picklist, is_modify=False,
                                                             is_add=False)
 
-        self.db_connection.execute_query(f"""
-                CREATE TABLE IF NOT EXISTS {self.schema}.{table_name} ({sql_string})
-            """)
+        self.db_connection.execute_query(self.create_table_statement(table_name=table_name,
+                                                                     column_definitions=sql_string))
+
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def add_columns_to_table(self, columns_to_add: pd.DataFrame, table_name: str):
         column_definitions: str = self.create_sql_str_column_definitions(
@@ -175,12 +278,16 @@ class RedshiftService(DatabaseService):
                         """
             self.db_connection.execute_query(alter_query)
 
+        # The database chooses the exact types of the new columns, so re-read this table only
+        self.schema_catalog.refresh_table(database_service=self, table_name=table_name)
+
     def drop_tables_in_schema(self, tables: list | tuple):
         for (table_name,) in tables:
             drop_query: str = f'DROP TABLE {self.schema}."{table_name}";'
             log_message(log_level='Info',
                         message=f"Executing: {drop_query}")
             self.db_connection.execute_query(drop_query)
+            self.schema_catalog.invalidate_table(table_name=table_name)
 
         log_message(log_level='Info',
                     message=f"Tables dropped successfully", )
@@ -188,6 +295,7 @@ class RedshiftService(DatabaseService):
     def drop_table(self, table_name: str):
         drop_query: str = f'DROP TABLE IF EXISTS {self.schema}.{table_name};'
         self.db_connection.execute_query(drop_query)
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def drop_columns_from_table(self, table_name: str, columns: list):
         for column_name in columns:
@@ -197,43 +305,157 @@ class RedshiftService(DatabaseService):
             """
             self.db_connection.execute_query(drop_column_query)
 
+        self.schema_catalog.drop_columns(table_name=table_name, columns=columns)
+
     def delete_data_from_table(self, starting_directory: str,
                                manifest_table: pd.DataFrame):
 
         deletes_filter: DataFrame = manifest_table[
             (manifest_table["type"] == "deletes") & (manifest_table["records"] > 0)]
 
-        for index, row in deletes_filter.iterrows():
-            self.process_delete(row=row,
-                                starting_directory=starting_directory)
+        # Deletes for different tables are independent, so they run on the load workers with the largest first
+        self.run_manifest_tasks(
+            manifest_rows=deletes_filter,
+            task_function=lambda worker_service, row: worker_service.process_delete(row=row,
+                                                                                  starting_directory=starting_directory),
+            description='Table delete')
+
+    def drop_temp_table(self, temp_table_name: str):
+        """
+        Drops a session temporary table. Pooled connections keep their session across tables, so temporary tables are
+        dropped before they are created, in case an earlier failed load left one behind, and once they are used.
+
+        :param temp_table_name: The temporary table
+        """
+        self.db_connection.execute_query(f"DROP TABLE IF EXISTS {temp_table_name};")
 
     def create_staging_table(self, staging_table_name: str, **kwargs):
-        headers: list = kwargs.get('csv_headers', [])
+        self.drop_temp_table(temp_table_name=staging_table_name)
+        self.db_connection.execute_query(f"""
+                        CREATE TEMP TABLE {staging_table_name} (LIKE {self.schema}.{kwargs['table_name']});
+                    """)
+        self.copy_file_into_table(target_table_name=staging_table_name,
+                                  table_name=kwargs['table_name'],
+                                  object_path=kwargs['object_path'],
+                                  headers=kwargs.get('csv_headers', []),
+                                  staging=True)
+
+    def create_sql_str_copy(self, target_table_name: str, object_path: str, headers: list = None,
+                            staging: bool = False) -> str:
+        """
+        Generates the COPY of an extract file in the format of the extract files. Parquet files are mapped to the
+        table's columns by position, CSV files by the header columns. With use_copy_manifest, the COPY reads the
+        manifest written next to the file by the unzip step, so that Redshift loads the file's shards in parallel
+        across its slices.
+
+        :param target_table_name: The table to load, qualified as needed
+        :param object_path: The full object path of the file
+        :param headers: The columns of the file
+        :param staging: If True, the target is a temporary table, so compression analysis and statistics are skipped
+        """
+        source: str = f"FROM '{object_path}'"
+        if self.use_copy_manifest:
+            source = f"FROM '{os.path.splitext(object_path)[0]}.manifest'\n                MANIFEST"
+        if staging:
+            source += "\n                COMPUPDATE OFF\n                STATUPDATE OFF"
+
+        if self.convert_to_parquet:
+            return f"""
+                COPY {target_table_name}
+                {source}
+                IAM_ROLE '{self.iam_role}'
+                FORMAT AS PARQUET;
+            """
+
         final_headers_for_query: str = ''
         if headers:
-            # Use a list comprehension to conditionally apply your quoting method.
-            processed_headers = [
-                self.set_quoted_identifier(header)  # Do this if the condition is true
-                for header in headers
-            ]
+            final_headers_for_query = f"({', '.join(self.set_quoted_identifier(header) for header in headers)})"
+        return f"""
+                COPY {target_table_name} {final_headers_for_query}
+                {source}
+                IAM_ROLE '{self.iam_role}'
+                FORMAT AS CSV
+                QUOTE '\"'
+                IGNOREHEADER 1
+                TIMEFORMAT 'auto'
+                ACCEPTINVCHARS
+                FILLRECORD
+                TRUNCATECOLUMNS;
+            """
+
+    def copy_file_into_table(self, target_table_name: str, table_name: str, object_path: str, headers: list = None,
+                             staging: bool = False):
+        """
+        Loads an extract file into a table with the columns of a target table. A Parquet file whose columns are not
+        in the order of the table's columns is first copied into a temporary table with the file's column order.
+        The duration of each COPY is logged with its format, to compare CSV and Parquet loads.
+
+        :param target_table_name: The table to load, qualified as needed
+        :param table_name: The target table whose columns the loaded table has
+        :param object_path: The full object path of the file
+        :param headers: The columns of the file
+        :param staging: If True, the target is a temporary table
+        """
+        file_format: str = 'Parquet' if self.convert_to_parquet else 'CSV'
+        start_time: float = time.perf_counter()
+
+        file_columns: list[str] = [header.lower() for header in headers or []]
+        if not self.convert_to_parquet or not file_columns \
+                or file_columns == list(self.retrieve_column_info(table_name).keys()):
+            self.db_connection.execute_query(self.create_sql_str_copy(target_table_name=target_table_name,
+                                                                      object_path=object_path,
+                                                                      headers=headers,
+                                                                      staging=staging))
+        else:
+            parquet_table_name: str = f"{table_name}_parquet"
+            quoted_columns: str = ', '.join(self.set_quoted_identifier(column) for column in file_columns)
+            self.drop_temp_table(temp_table_name=parquet_table_name)
+            self.db_connection.execute_query(f"""
+                CREATE TEMP TABLE {parquet_table_name} AS
+                SELECT {quoted_columns} FROM {self.schema}.{table_name} WHERE 1 = 0;
+            """)
+            self.db_connection.execute_query(self.create_sql_str_copy(target_table_name=parquet_table_name,
+                                                                      object_path=object_path,
+                                                                      staging=True))
+            self.db_connection.execute_query(f"""
+                INSERT INTO {target_table_name} ({quoted_columns})
+                SELECT {quoted_columns} FROM {parquet_table_name};
+            """)
+            self.drop_temp_table(temp_table_name=parquet_table_name)
 
-            # 3. Join the processed list back into a comma-separated string for the SQL query.
-            final_headers_for_query = ', '.join(processed_headers)
+        log_message(log_level='Info',
+                    message=f'Copied {file_format} file into {target_table_name} in '
+                            f'{time.perf_counter() - start_time:.2f}s')
 
-        create_staging_table_query: str = f"""
-                        CREATE TEMP TABLE {staging_table_name} (LIKE {self.schema}.{kwargs['table_name']});
-                        COPY {staging_table_name} ({final_headers_for_query}) 
-                        FROM '{kwargs['object_path']}'
-                        IAM_ROLE '{self.iam_role}'
-                        FORMAT AS CSV
-                        QUOTE '\"'
-                        IGNOREHEADER 1
-                        TIMEFORMAT 'auto'
-                        ACCEPTINVCHARS
-                        FILLRECORD
-                        TRUNCATECOLUMNS;
-                    """
-        self.db_connection.execute_query(create_staging_table_query)
+    def benchmark_copy_formats(self, table_name: str, csv_object_path: str, parquet_object_path: str) -> dict:
+        """
+        Times a COPY of the same extract file as CSV and as Parquet, each into an empty temporary table like the
+        target table, so the load formats can be compared on the cluster. The target table is not changed. Its
+        column types must accept both files, as they do when it was created with convert_to_parquet.
+
+        :param table_name: The target table
+        :param csv_object_path: The full object path of the CSV file
+        :param parquet_object_path: The full object path of the same file converted to Parquet
+        :return: The COPY duration in seconds by format
+        """
+        durations: dict[str, float] = {}
+        for file_format, object_path in (('CSV', csv_object_path), ('Parquet', parquet_object_path)):
+            format_service: RedshiftService = copy.copy(self)
+            format_service.convert_to_parquet = file_format == 'Parquet'
+            benchmark_table_name: str = f"{table_name}_{file_format.lower()}_benchmark"
+            self.drop_temp_table(temp_table_name=benchmark_table_name)
+            self.db_connection.execute_query(
+                f"CREATE TEMP TABLE {benchmark_table_name} (LIKE {self.schema}.{table_name});")
+            start_time: float = time.perf_counter()
+            self.db_connection.execute_query(format_service.create_sql_str_copy(target_table_name=benchmark_table_name,
+                                                                                object_path=object_path,
+                                                                                staging=True))
+            durations[file_format] = time.perf_counter() - start_time
+            self.drop_temp_table(temp_table_name=benchmark_table_name)
+
+        log_message(log_level='Info',
+                    message=f'COPY of {table_name}: CSV {durations["CSV"]:.2f}s, Parquet {durations["Parquet"]:.2f}s')
+        return durations
 
     def delete_duplicate_rows_from_table(self, table_name: str, staging_table_name: str, pk_condition: str):
         delete_duplicates_query = f"""
@@ -250,95 +472,115 @@ class RedshiftService(DatabaseService):
                     """
         self.db_connection.execute_query(insert_into_query)
 
-    def process_delete(self, row: pd.Series, starting_directory: str):
-        raw_table = row["extract"].split(".")[1]
-        related_file = row["file"]
-        s3_file_uri = f"{self.object_storage_root}/{starting_directory}/{related_file}"
-        table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
-        if raw_table != "metadata_deletes":
-            columns = ''
-            column_names = ''
-            if table_name == 'picklist__sys':
-                column_names += 'object || object_field || picklist_value_name'
-                columns += 'object VARCHAR(255), object_field VARCHAR(255), picklist_value_name VARCHAR(255)'
-            elif table_name == 'metadata':
-                column_names += 'extract || column_name'
-                columns += 'extract VARCHAR(255), column_name VARCHAR(255)'
-            else:
-                column_names += 'id'
-                columns += 'id VARCHAR(255)'
-
-            create_query = f"CREATE TEMPORARY TABLE temp_{table_name}_deletes ({columns}, deleted_date TIMESTAMPTZ)"
-
-            # Load the data from the CSV file into the temporary view
-            self.db_connection.execute_query(create_query)
-
-            copy_query = f"""
-                    COPY temp_{table_name}_deletes FROM '{s3_file_uri}'
-                    IAM_ROLE '{self.iam_role}'
-                    FORMAT AS CSV 
-                    QUOTE '\"'
-                    IGNOREHEADER 1
-                    TIMEFORMAT 'auto';
+    def merge_into_target_table(self, table_name: str, staging_table_name: str, primary_keys: list[str]):
+        """
+        Replaces the changed rows and inserts the new rows in one statement, which leaves fewer deleted rows to vacuum
+        than a DELETE and INSERT. Redshift rejects a MERGE in which a target row matches more than one source row, so
+        duplicate staging rows are first removed with SELECT DISTINCT, as the INSERT of the DELETE and INSERT path
+        does. A key that still has more than one distinct row fails the MERGE, which rolls back the table's changes.
+        """
+        distinct_table_name: str = f"{staging_table_name}_distinct"
+        self.drop_temp_table(temp_table_name=distinct_table_name)
+        self.db_connection.execute_query(f"""
+                        CREATE TEMP TABLE {distinct_table_name} AS
+                        SELECT DISTINCT * FROM {staging_table_name};
+                    """)
+        pk_condition: str = " AND ".join(
+            [f"{self.schema}.{table_name}.{col} = {distinct_table_name}.{col}" for col in primary_keys])
+        merge_query: str = f"""
+                        MERGE INTO {self.schema}.{table_name}
+                        USING {distinct_table_name}
+                        ON {pk_condition}
+                        REMOVE DUPLICATES;
                     """
+        self.db_connection.execute_query(merge_query)
+        self.drop_temp_table(temp_table_name=distinct_table_name)
 
-            self.db_connection.execute_query(copy_query)
-
-            # Delete the matching rows from the target table
-            delete_query = (f"DELETE FROM {self.database}.{self.schema}.{table_name} "
-                            f"WHERE {column_names} IN (SELECT {column_names} FROM temp_{table_name}_deletes);")
-
-            self.db_connection.execute_query(delete_query)
+    def process_delete(self, row: pd.Series, starting_directory: str):
+        # Apply the deletes for the table as one unit of work, or in committed batches if there are many
+        with self.delete_unit_of_work(records=int(row["records"])):
+            raw_table = row["extract"].split(".")[1]
+            related_file = row["file"]
+            if self.convert_to_parquet:
+                related_file = related_file.replace(".csv", ".parquet")
+            s3_file_uri = f"{self.object_storage_root}/{starting_directory}/{related_file}"
+            table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
+            if raw_table != "metadata_deletes":
+                primary_keys: list[str] = self.get_primary_keys(table_name=table_name)
+                columns: str = ', '.join(f'{col} VARCHAR(255)' for col in primary_keys)
+                # deleted_date is not in the metadata, so the conversion to Parquet writes it as a string
+                deleted_date_type: str = 'VARCHAR(64)' if self.convert_to_parquet else 'TIMESTAMPTZ'
+
+                create_query = (f"CREATE TEMPORARY TABLE temp_{table_name}_deletes "
+                                f"({columns}, deleted_date {deleted_date_type})")
+
+                # Load the data from the deletes file into the temporary table
+                self.drop_temp_table(temp_table_name=f"temp_{table_name}_deletes")
+                self.db_connection.execute_query(create_query)
+                self.db_connection.execute_query(self.create_sql_str_copy(
+                    target_table_name=f"temp_{table_name}_deletes",
+                    object_path=s3_file_uri,
+                    staging=True))
+
+                # Delete the matching rows from the target table
+                self.apply_key_delete(target_table_name=f"{self.schema}.{table_name}",
+                                      deletes_table_name=f"temp_{table_name}_deletes",
+                                      primary_keys=primary_keys,
+                                      records=int(row["records"]))
+                self.drop_temp_table(temp_table_name=f"temp_{table_name}_deletes")
 
     def load_full_or_log_data(self, table_name: str, object_path: str, headers: list = None):
-        final_headers_for_query: str = ''
-
-        if headers:
-            processed_headers = [
-                self.set_quoted_identifier(header)
-                for header in headers
-            ]
-
-            # 3. Join the processed list back into a comma-separated string for the SQL query.
-            final_headers_for_query = ', '.join(processed_headers)
-
-        self.db_connection.execute_query(f"""
-                COPY {self.database}.{self.schema}.{table_name} ({final_headers_for_query}) 
-                FROM '{object_path}' 
-                IAM_ROLE '{self.iam_role}' 
-                FORMAT AS CSV 
-                QUOTE '\"' 
-                IGNOREHEADER 1 
-                TIMEFORMAT 'auto' 
-                ACCEPTINVCHARS 
-                FILLRECORD 
-                TRUNCATECOLUMNS;
-            """)
+        if not self.append_full_loads:
+            self.copy_file_into_table(target_table_name=f"{self.database}.{self.schema}.{table_name}",
+                                      table_name=table_name,
+                                      object_path=object_path,
+                                      headers=headers)
+            return
+
+        # Load into a shadow table and move its blocks into the target table, which does not rewrite the data
+        shadow_table_name: str = f"{self.schema}.{table_name}_shadow"
+        self.db_connection.execute_query(f"DROP TABLE IF EXISTS {shadow_table_name};")
+        self.db_connection.execute_query(f"CREATE TABLE {shadow_table_name} (LIKE {self.schema}.{table_name});")
+        try:
+            self.copy_file_into_table(target_table_name=shadow_table_name,
+                                      table_name=table_name,
+                                      object_path=object_path,
+                                      headers=headers,
+                                      staging=True)
+            self.db_connection.execute_outside_transaction(
+                f"ALTER TABLE {self.schema}.{table_name} APPEND FROM {shadow_table_name};")
+        finally:
+            self.db_connection.execute_query(f"DROP TABLE IF EXISTS {shadow_table_name};")
 
     def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
-        if table_name == 'metadata':
-            primary_keys = ["extract", "column_name"]
-        elif table_name == 'picklist__sys':
-            primary_keys = ["object", "object_field", "picklist_value_name"]
-        else:
-            primary_keys = ["id"]
-
-        # Load into a temporary staging table
-        staging_table_name: str = f"{table_name}_staging"
-        pk_condition: str = " AND ".join(
-            [f"{self.schema}.{table_name}.{col} = {staging_table_name}.{col}" for col in primary_keys])
-
-        self.create_staging_table(staging_table_name=staging_table_name,
-                                  table_name=table_name,
-                                  object_path=object_path,
-                                  csv_headers=headers)
+        # Apply the table's whole change set as one unit of work
+        with self.db_connection.transaction():
+            primary_keys: list[str] = self.get_primary_keys(table_name=table_name)
+
+            # Load into a temporary staging table
+            staging_table_name: str = f"{table_name}_staging"
+            pk_condition: str = " AND ".join(
+                [f"{self.schema}.{table_name}.{col} = {staging_table_name}.{col}" for col in primary_keys])
+
+            self.create_staging_table(staging_table_name=staging_table_name,
+                                      table_name=table_name,
+                                      object_path=object_path,
+                                      csv_headers=headers)
+
+            if self.merge_incremental_changes:
+                self.merge_into_target_table(table_name=table_name,
+                                             staging_table_name=staging_table_name,
+                                             primary_keys=primary_keys)
+            else:
+                self.delete_duplicate_rows_from_table(table_name=table_name,
+                                                      staging_table_name=staging_table_name,
+                                                      pk_condition=pk_condition)
 
-        self.delete_duplicate_rows_from_table(table_name=table_name,
-                                              staging_table_name=staging_table_name,
-                                              pk_condition=pk_condition)
+                self.insert_into_target_table(table_name=table_name,
+                                              staging_table_name=staging_table_name)
 
-        self.insert_into_target_table(table_name=table_name,
-                                      staging_table_name=staging_table_name)
+            # A failed unit of work rolls back, which also drops the temporary tables it created
+            self.drop_temp_table(temp_table_name=staging_table_name)
 
     def set_quoted_identifier(self, column_name: str) -> str:
         """
@@ -1,3 +1,5 @@
+import time
+
 import snowflake.connector
 from cryptography.hazmat.primitives import serialization
 
@@ -9,6 +11,10 @@ class SnowflakeConnection(DatabaseConnection):
     """
     TODO: Add docstring
     """
+    # Snowflake does not support savepoints, so nested units of work join the outer transaction. DDL statements,
+    # such as creating a staging table, commit the open transaction implicitly, so staging tables are created and
+    # loaded before a unit of work begins, and only DML runs inside it.
+    savepoint_statement: str | None = None
 
     def __init__(self, database: str, account: str, warehouse: str, schema: str, stage_name: str,
                  username: str, role:str, private_key: str, private_key_passphrase: str):
@@ -78,8 +84,55 @@ class SnowflakeConnection(DatabaseConnection):
                 log_level='Exception',
                 message=f"Executing query: {query}",
                 exception=e)
+            if self.in_transaction:
+                raise e
             return []
 
+    def execute_query_async(self, query: str) -> str:
+        """
+        Submits a query without waiting for it to finish.
+
+        :param query: The query
+        :return: The Snowflake query ID, to be passed to wait_for_queries
+        """
+        if not self.connected:
+            self.open()
+            self.cursor = self.con.cursor()
+
+        log_message(
+            log_level='Info',
+            message=f"Submitting query: {query}")
+        self.cursor.execute_async(query)
+        return self.cursor.sfqid
+
+    def wait_for_queries(self, query_ids: dict[str, str], poll_interval_seconds: float = 1.0) -> list[str]:
+        """
+        Polls queries submitted with execute_query_async until all of them have finished.
+
+        :param query_ids: The query ID of each submitted query, by a name used in log messages
+        :param poll_interval_seconds: The time between polls of the running queries
+        :return: The names of the queries that failed
+        """
+        pending_queries: dict[str, str] = dict(query_ids)
+        failed_queries: list[str] = []
+        while pending_queries:
+            for name, query_id in list(pending_queries.items()):
+                try:
+                    status = self.con.get_query_status_throw_if_error(query_id)
+                except snowflake.connector.errors.ProgrammingError as e:
+                    log_message(
+                        log_level='Exception',
+                        message=f"Query {query_id} for {name} failed",
+                        exception=e)
+                    failed_queries.append(name)
+                    del pending_queries[name]
+                    continue
+                if not self.con.is_still_running(status):
+                    del pending_queries[name]
+            if pending_queries:
+                time.sleep(poll_interval_seconds)
+        return failed_queries
+
     def activate_cursor(self):
         if self.connected:
             if self.cursor is None:
@@ -87,3 +140,13 @@ class SnowflakeConnection(DatabaseConnection):
 
     def close_cursor(self):
         self.cursor.close()
+
+    def begin_transaction(self):
+        # The connector runs in autocommit mode, so the transaction is opened explicitly
+        self.cursor.execute('BEGIN')
+
+    def commit_transaction(self):
+        self.cursor.execute('COMMIT')
+
+    def rollback_transaction(self):
+        self.cursor.execute('ROLLBACK')
@@ -1,13 +1,22 @@
+import os
+import threading
+
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from pyarrow import ExtensionArray
 
 from accelerators.snowflake.connections.snowflake_connection import SnowflakeConnection
 from common.services.database_service import DatabaseService
+from common.services.schema_catalog import SchemaCatalog
 from common.utilities import log_message, update_table_name_that_starts_with_digit
 
 
 class SnowflakeService(DatabaseService):
+    supports_combined_changes: bool = True
+    supports_values_merge: bool = True
+    supports_delete_using: bool = True
+    supports_batched_loads: bool = True
+
     def __init__(self, parameters: dict):
         super().__init__(parameters)
         self.account: str = parameters['account']
@@ -19,6 +28,19 @@ class SnowflakeService(DatabaseService):
         self.private_key_passphrase: str = parameters['private_key_passphrase']
         self.stage_name: str = parameters['stage_name'].upper()
         self.infer_schema: bool = parameters['infer_schema']
+        # 'external' loads from the S3 stage. 'internal' PUTs the local extract files into a named internal stage,
+        # which is separate from the S3 stage named by stage_name.
+        self.stage_type: str = parameters.get('stage_type', 'external').lower()
+        self.internal_stage_name: str = parameters.get('internal_stage_name', f'{self.stage_name}_INTERNAL').upper()
+        self.put_parallel: int = int(parameters.get('put_parallel', 4))
+        # File formats created and files PUT in this run, shared by the worker copies of the service. A file being
+        # PUT has an event that is set once its upload has finished or failed.
+        self.created_file_formats: set[str] = set()
+        self.file_format_lock: threading.Lock = threading.Lock()
+        self.staged_files: set[str] = set()
+        self.staging_files: dict[str, threading.Event] = {}
+        self.internal_stage_created: bool = False
+        self.stage_lock: threading.Lock = threading.Lock()
         self.db_connection: SnowflakeConnection = self.get_connection()
 
     def get_connection(self) -> SnowflakeConnection:
@@ -34,6 +56,29 @@ class SnowflakeService(DatabaseService):
             private_key_passphrase=self.private_key_passphrase
         )
 
+    @staticmethod
+    def create_column_definitions(table_df: DataFrame) -> pd.Series:
+        """
+        Maps every metadata row to its Snowflake column definition in a single vectorised pass.
+
+        :param table_df: A DataFrame containing column details (column_name, type, length).
+        :return: The column definitions, with the same index as table_df.
+        """
+        column_names: pd.Series = table_df['column_name'].str.lower()
+        data_types: pd.Series = table_df['type'].str.lower()
+
+        column_types: np.ndarray = np.select(
+            [
+                (data_types == "id") | ((column_names == 'id') & (data_types == 'string')),
+                data_types.isin(["datetime", "timestamp with time zone"]),
+                data_types == "boolean",
+                data_types.isin(["number", "numeric"]),
+                data_types == "date",
+            ],
+            ['VARCHAR()', 'TIMESTAMP_TZ', 'BOOLEAN', 'NUMERIC', 'DATE'],
+            default='VARCHAR()')
+        return '"' + column_names + '" ' + pd.Series(column_types, index=table_df.index)
+
     @staticmethod
     def create_sql_str_column_definitions(table_df: DataFrame, is_picklist: bool = False, is_modify: bool = False, is_add: bool = False) -> str:
         """
@@ -45,26 +90,7 @@ class SnowflakeService(DatabaseService):
         :param is_picklist: A boolean indicating if the table is the picklist table.
         :return: A partial SQL string defining the table columns.
         """
-        column_definitions: list = []
-
-        for _, row in table_df.iterrows():
-            column_name: str = row['column_name'].lower()
-            data_type: str = row['type'].lower()
-
-            if data_type == "id" or (column_name == 'id' and data_type == 'string'):
-                column_def: str = f'"{column_name}" VARCHAR()'
-            elif data_type in ["datetime", "timestamp with time zone"]:
-                column_def: str = f'"{column_name}" TIMESTAMP_TZ'
-            elif data_type == "boolean":
-                column_def: str = f'"{column_name}" BOOLEAN'
-            elif data_type in ["number", "numeric"]:
-                column_def: str = f'"{column_name}" NUMERIC'
-            elif data_type == "date":
-                column_def: str = f'"{column_name}" DATE'
-            else:
-                column_def: str = f'"{column_name}" VARCHAR()'
-
-            column_definitions.append(column_def)
+        column_definitions: list = SnowflakeService.create_column_definitions(table_df=table_df).tolist()
 
         if is_modify and not is_add:
             return "MODIFY COLUMN " + ", MODIFY COLUMN ".join(column_definitions)
@@ -106,50 +132,32 @@ class SnowflakeService(DatabaseService):
                         exception=e)
             raise e
 
-    def retrieve_column_info(self, table_name: str) -> dict:
+    def load_schema_catalog(self) -> dict[str, dict[str, dict]]:
+        schema_columns_query: str = f"""
+        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH 
+        FROM INFORMATION_SCHEMA.COLUMNS 
+        WHERE TABLE_SCHEMA = '{self.schema}'
+        """
+        sql_result: list = self.db_connection.execute_query(schema_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH'])
+
+    def query_column_info(self, table_name: str) -> dict:
         existing_columns_query = f"""
-        SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH 
+        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH 
         FROM INFORMATION_SCHEMA.COLUMNS 
         WHERE TABLE_SCHEMA = '{self.schema}' 
         AND TABLE_NAME = '{table_name.upper()}'
         """
-        sql_result = self.db_connection.execute_query(existing_columns_query)
-        columns = ['COLUMN_NAME', 'DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
-        existing_columns_df = pd.DataFrame(sql_result, columns=columns)
-
-        # Convert to dictionary for quick lookup
-        return {
-            row['COLUMN_NAME'].lower(): {
-                "DATA_TYPE": row["DATA_TYPE"].lower(),
-                "CHARACTER_MAXIMUM_LENGTH": row["CHARACTER_MAXIMUM_LENGTH"]
-            }
-            for _, row in existing_columns_df.iterrows()
-        }
-
-    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
-
-        unique_extract_values: ExtensionArray = metadata_table["extract"].unique()
-
-        for extract in unique_extract_values:
-            filtered_metadata = metadata_table[metadata_table["extract"] == extract]
-            # Vault allows 255 characters for description__sys, but the extract metadata defines a length of 128.
-            if extract == "Object.security_policy__sys":
-                filtered_metadata.loc[
-                    (filtered_metadata['column_name'] == 'description__sys'),
-                    ['type', 'length']
-                ] = ['String', 255]
-
-            new_table_name = update_table_name_that_starts_with_digit(extract.split(".")[1])
-            self.create_single_table(table_name=new_table_name, filtered_metadata=filtered_metadata)
-
-        # Create metadata table
-        column_definitions: dict = {col: ["STRING"] for col in metadata_table.columns}
-        new_metadata_df = pd.DataFrame.from_dict(column_definitions).astype(str)
-        new_metadata_df.loc["length"] = 1000
-        new_metadata_df = new_metadata_df.T.reset_index()
-        new_metadata_df.columns = ["column_name", "type", "length"]
-
-        self.create_single_table(table_name="metadata", filtered_metadata=new_metadata_df)
+        sql_result: list = self.db_connection.execute_query(existing_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
+                                               ).get(table_name.lower(), {})
+
+    def create_table_statement(self, table_name: str, column_definitions: str) -> str:
+        return f"""
+                CREATE TABLE IF NOT EXISTS {self.schema}.{table_name} ({column_definitions})
+            """
 
     def create_single_table(self, table_name: str, filtered_metadata: pd.DataFrame):
         is_picklist: bool = False
@@ -160,9 +168,10 @@ class SnowflakeService(DatabaseService):
                                                                  is_modify=False,
                                                                  is_add=False)
 
-        self.db_connection.execute_query(f"""
-                CREATE TABLE IF NOT EXISTS {self.schema}.{table_name} ({sql_string})
-            """)
+        self.db_connection.execute_query(self.create_table_statement(table_name=table_name,
+                                                                     column_definitions=sql_string))
+
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def add_columns_to_table(self, columns_to_add: pd.DataFrame, table_name: str):
         column_definitions: str = self.create_sql_str_column_definitions(
@@ -173,6 +182,9 @@ class SnowflakeService(DatabaseService):
             """
         self.db_connection.execute_query(alter_query)
 
+        # The database chooses the exact types of the new columns, so re-read this table only
+        self.schema_catalog.refresh_table(database_service=self, table_name=table_name)
+
     def drop_tables_in_schema(self, tables: list | tuple):
         for (table_name,) in tables:
             drop_query: str = f'DROP TABLE "{table_name}";'
@@ -180,6 +192,7 @@ class SnowflakeService(DatabaseService):
                         message=f"Executing: {drop_query}",
                         context=None)
             self.db_connection.execute_query(drop_query)
+            self.schema_catalog.invalidate_table(table_name=table_name)
 
         log_message(log_level='Info',
                     message=f"Tables dropped successfully")
@@ -187,6 +200,7 @@ class SnowflakeService(DatabaseService):
     def drop_table(self, table_name: str):
         drop_query: str = f'DROP TABLE IF EXISTS {self.schema}.{table_name};'
         self.db_connection.execute_query(drop_query)
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def drop_columns_from_table(self, table_name: str, columns: list):
         drop_column_query: str = f"""
@@ -195,15 +209,20 @@ class SnowflakeService(DatabaseService):
         """
         self.db_connection.execute_query(drop_column_query)
 
+        self.schema_catalog.drop_columns(table_name=table_name, columns=columns)
+
     def delete_data_from_table(self, starting_directory: str,
                                manifest_table: pd.DataFrame):
 
         deletes_filter: DataFrame = manifest_table[
             (manifest_table["type"] == "deletes") & (manifest_table["records"] > 0)]
 
-        for index, row in deletes_filter.iterrows():
-            self.process_delete(row=row,
-                                starting_directory=starting_directory)
+        # Deletes for different tables are independent, so they run on the load workers with the largest first
+        self.run_manifest_tasks(
+            manifest_rows=deletes_filter,
+            task_function=lambda worker_service, row: worker_service.process_delete(row=row,
+                                                                                  starting_directory=starting_directory),
+            description='Table delete')
 
     def create_staging_table(self, staging_table_name: str, **kwargs):
         create_staging_table_query = f"""
@@ -213,23 +232,9 @@ class SnowflakeService(DatabaseService):
         self.db_connection.execute_query(create_staging_table_query)
 
     def insert_into_staging_table(self, staging_table_name: str, object_path: str):
-        stage_url: str = f"{self.object_storage_root}/"
-        relative_path: str = object_path.replace(stage_url, '')
-        s3_stage_uri: str = f"{self.stage_name}/{relative_path}"
-
-        match_by_column = "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE"
-        if self.convert_to_parquet:
-            file_format_name = "parquet_file_format"
-        else:
-            file_format_name = "csv_file_format"
-
-        copy_into_query: str = f"""
-                    COPY INTO {staging_table_name}
-                    FROM @{s3_stage_uri}
-                    FILE_FORMAT = {file_format_name}
-                    {match_by_column};
-                """
-        self.db_connection.execute_query(copy_into_query)
+        self.db_connection.execute_query(self.create_sql_str_copy_into(
+            table_name=staging_table_name,
+            stage_uri=self.get_stage_uri(object_path=object_path)))
 
     def insert_into_target_table(self, table_name: str, **kwargs):
         merge_data_query: str = f"""
@@ -296,6 +301,27 @@ class SnowflakeService(DatabaseService):
             print(f"Failed to create table {table_name}: {str(e)}")
             raise e
 
+    def stage_deletes(self, table_name: str, object_path: str) -> str:
+        """
+        Creates a temporary table for the keys of a table's deleted rows and loads the deletes file into it.
+
+        :param table_name: The target table
+        :param object_path: The full object path of the deletes file
+        :return: The name of the temporary table
+        """
+        columns: str = ', '.join(f'"{col}" VARCHAR' for col in self.get_primary_keys(table_name=table_name))
+
+        temp_table_name = f"temp_{table_name}_deletes".upper()
+
+        create_query = f"""
+        CREATE OR REPLACE TEMPORARY TABLE {temp_table_name} ({columns}, deleted_date TIMESTAMP_NTZ);
+        """
+
+        # Load the data from the deletes file into the temporary table
+        self.db_connection.execute_query(create_query)
+        self.insert_into_staging_table(staging_table_name=temp_table_name, object_path=object_path)
+        return temp_table_name
+
     def process_delete(self, row: pd.Series, starting_directory: str):
         raw_table = row["extract"].split(".")[1].lower()
         related_file = row["file"]
@@ -304,120 +330,212 @@ class SnowflakeService(DatabaseService):
         table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
 
         if raw_table != "metadata_deletes":
-            columns = ''
-            column_names = ''
-            if table_name == 'picklist__sys':
-                column_names += '("object" || "object_field" || "picklist_value_name")'
-                columns += '"object" VARCHAR, "object_field" VARCHAR, "picklist_value_name" VARCHAR'
-            elif table_name == "metadata":
-                column_names += '("extract" || "column_name")'
-                columns += '"extract" VARCHAR, "column_name" VARCHAR'
-            else:
-                column_names += '"id"'
-                columns += '"id" VARCHAR'
-
-            temp_table_name = f"temp_{table_name}_deletes".upper()
-
-            create_query = f"""
-            CREATE OR REPLACE TEMPORARY TABLE {temp_table_name} ({columns}, deleted_date TIMESTAMP_NTZ);
-            """
-
-            # Load the data from the CSV file into the temporary view
-            self.db_connection.execute_query(create_query)
-
-            match_by_column = "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;"
-            if self.convert_to_parquet:
-                file_format_name = "parquet_file_format"
-            else:
-                file_format_name = "csv_file_format"
-
-            load_query = f"""
-                COPY INTO {temp_table_name}
-                FROM @{self.stage_name}/{starting_directory}/{related_file}
-                FILE_FORMAT = {file_format_name}
-                {match_by_column}
-            """
-
-            self.db_connection.execute_query(load_query)
-
-            # Delete the matching rows from the target table
-            delete_query = f"""
-                DELETE FROM {table_name.upper()}
-                WHERE {column_names} IN (SELECT {column_names} FROM {temp_table_name});
-            """
-
-            self.db_connection.execute_query(delete_query)
+            # The temporary table is created before the unit of work begins, because DDL commits the open transaction
+            temp_table_name = self.stage_deletes(
+                table_name=table_name,
+                object_path=f"{self.object_storage_root}/{starting_directory}/{related_file}")
+
+            # Delete the matching rows from the target table as one unit of work, or in committed batches if there
+            # are many
+            with self.delete_unit_of_work(records=int(row["records"])):
+                self.apply_key_delete(target_table_name=table_name.upper(),
+                                      deletes_table_name=temp_table_name,
+                                      primary_keys=self.get_primary_keys(table_name=table_name),
+                                      records=int(row["records"]))
+
+    def apply_table_changes(self, table_name: str, updates_object_path: str, deletes_object_path: str,
+                            headers: list[str] = None, **kwargs):
+        # The staging tables are created and loaded before the unit of work begins, because DDL commits the open
+        # transaction. The updates and deletes are then applied with a single MERGE into the target table.
+        staging_table_name: str = f"{table_name}_staging".upper()
+        self.create_staging_table(staging_table_name=staging_table_name, table_name=table_name)
+        self.insert_into_staging_table(staging_table_name=staging_table_name, object_path=updates_object_path)
+        deletes_table_name: str = self.stage_deletes(table_name=table_name, object_path=deletes_object_path)
+
+        table_columns: list = list(self.retrieve_column_info(table_name).keys())
+        with self.db_connection.transaction():
+            self.db_connection.execute_query(self.create_sql_str_change_merge(
+                target_table_name=table_name,
+                updates_table_name=staging_table_name,
+                deletes_table_name=deletes_table_name,
+                table_columns=table_columns,
+                primary_keys=self.get_primary_keys(table_name=table_name)))
+
+    def get_file_format_name(self) -> str:
+        """
+        Returns the file format of the extract files, creating it on first use in this run. The file format is a
+        schema object, so it is created once rather than before every COPY.
+        """
+        file_format_name: str = "parquet_file_format" if self.convert_to_parquet else "csv_file_format"
+        with self.file_format_lock:
+            if file_format_name not in self.created_file_formats:
+                self.create_file_format(file_format_name=file_format_name)
+                self.created_file_formats.add(file_format_name)
+        return file_format_name
 
     def create_file_format(self, file_format_name: str):
         """
-        Creates a file format in Snowflake for the specified file type.
-        :param convert_to_parquet: If True, creates a file format for Parquet files, else create CSV file format.
+        Creates a file format in Snowflake for the specified file type, unless it already exists.
+        :param file_format_name: The name of the file format. A Parquet format is created if convert_to_parquet is
+            set, otherwise a CSV format.
         """
         log_message(log_level='Info',
-                    message=f'Creating file format')
+                    message=f'Creating file format {file_format_name} if it does not exist')
 
         if self.convert_to_parquet:
             self.db_connection.execute_query(
-                f"CREATE OR REPLACE FILE FORMAT {file_format_name} TYPE = 'PARQUET';")
+                f"CREATE FILE FORMAT IF NOT EXISTS {file_format_name} TYPE = 'PARQUET';")
         else:
             self.db_connection.execute_query(f"""
-                CREATE OR REPLACE FILE FORMAT {file_format_name}
+                CREATE FILE FORMAT IF NOT EXISTS {file_format_name}
                 FIELD_OPTIONALLY_ENCLOSED_BY = '"'
                 TYPE = 'CSV'
                 SKIP_HEADER = 0
                 PARSE_HEADER = TRUE;
             """)
 
-    def load_full_or_log_data(self, table_name: str, object_path: str, headers: list = None):
+    def create_sql_str_copy_into(self, table_name: str, stage_uri: str) -> str:
+        """
+        Generates the COPY INTO of a staged file, matching the file's columns to the table by name.
+
+        :param table_name: The table to load
+        :param stage_uri: The file in the stage, without the leading @
+        """
+        return f"""
+                    COPY INTO {table_name}
+                    FROM @{stage_uri}
+                    FILE_FORMAT = {self.get_file_format_name()}
+                    MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;
+                """
+
+    def get_stage_uri(self, object_path: str) -> str:
+        """
+        Returns the location of a file in the stage, without the leading @. With an internal stage, the local copy of
+        the file is PUT into the stage first.
+
+        :param object_path: The full object path of the file
+        """
         stage_url: str = f"{self.object_storage_root}/"
         relative_path: str = object_path.replace(stage_url, '')
-        s3_stage_uri: str = f"{self.stage_name}/{relative_path}"
+        if self.stage_type == 'internal':
+            self.put_local_file(relative_path=relative_path)
+            return f"{self.internal_stage_name}/{relative_path}"
+        return f"{self.stage_name}/{relative_path}"
 
-        match_by_column = "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE"
-        if self.convert_to_parquet:
-            file_format_name = "parquet_file_format"
-        else:
-            file_format_name = "csv_file_format"
+    def put_local_file(self, relative_path: str):
+        """
+        Uploads a local extract file into the internal stage, at the same relative path as in object storage, unless
+        it was already uploaded in this run. The files are where download_and_unzip_direct_data_files wrote them,
+        so loading does not read them back from S3. CSV files are compressed during the upload. Parquet files are
+        already compressed and are uploaded as they are.
+
+        :param relative_path: The path of the file relative to the working directory and the object storage root
+        """
+        with self.stage_lock:
+            if relative_path in self.staged_files:
+                return
+            if not self.internal_stage_created:
+                self.db_connection.execute_query(f"CREATE STAGE IF NOT EXISTS {self.internal_stage_name};")
+                self.internal_stage_created = True
+            upload_event: threading.Event | None = self.staging_files.get(relative_path)
+            is_uploader: bool = upload_event is None
+            if is_uploader:
+                # Claim the file so that a concurrent worker waits for this upload instead of uploading it too
+                upload_event = threading.Event()
+                self.staging_files[relative_path] = upload_event
+
+        if not is_uploader:
+            upload_event.wait()
+            with self.stage_lock:
+                if relative_path in self.staged_files:
+                    return
+            raise Exception(f"Upload of {relative_path} to the internal stage failed")
 
-        self.create_file_format(file_format_name=file_format_name)
+        try:
+            if not os.path.isfile(relative_path):
+                raise FileNotFoundError(f"Local extract file {relative_path} not found for the internal stage")
+
+            local_file_uri: str = 'file://' + os.path.abspath(relative_path).replace('\\', '/')
+            stage_directory: str = os.path.dirname(relative_path).replace('\\', '/')
+            auto_compress: str = 'FALSE' if relative_path.endswith('.parquet') else 'TRUE'
+            put_response: list = self.db_connection.execute_query(f"""
+                    PUT '{local_file_uri}' '@{self.internal_stage_name}/{stage_directory}/'
+                    PARALLEL = {self.put_parallel}
+                    AUTO_COMPRESS = {auto_compress}
+                    OVERWRITE = TRUE;
+                """)
+
+            # Each row of the PUT result describes one uploaded file, with its status in the seventh column
+            if not put_response or any(row[6] not in ('UPLOADED', 'SKIPPED') for row in put_response):
+                raise Exception(f"PUT of {relative_path} to the internal stage failed: {put_response}")
+            with self.stage_lock:
+                self.staged_files.add(relative_path)
+        finally:
+            with self.stage_lock:
+                del self.staging_files[relative_path]
+            upload_event.set()
+
+    def load_full_or_log_data(self, table_name: str, object_path: str, headers: list = None):
+        s3_stage_uri: str = self.get_stage_uri(object_path=object_path)
 
         if self.infer_schema:
             # Create the table dynamically
-            self.create_table_from_file_format(table_name, s3_stage_uri, file_format_name)
+            self.create_table_from_file_format(table_name, s3_stage_uri, self.get_file_format_name())
 
         # Load data into the table
-        self.db_connection.execute_query(f"""
-                    COPY INTO {table_name}
-                    FROM @{s3_stage_uri}
-                    FILE_FORMAT = {file_format_name}
-                    {match_by_column}
-                """)
+        self.db_connection.execute_query(self.create_sql_str_copy_into(table_name=table_name,
+                                                                       stage_uri=s3_stage_uri))
+
+    def load_full_or_log_data_batch(self, loads: list[tuple[str, str]]) -> list[str]:
+        """
+        Loads a batch of tables with COPY INTO statements that are submitted asynchronously and then polled together,
+        so that the tables load concurrently in the warehouse instead of one statement round trip at a time.
+
+        :param loads: The table name and full object path of each table to load
+        :return: The tables whose COPY failed
+        """
+        if self.infer_schema:
+            for table_name, object_path in loads:
+                self.create_table_from_file_format(table_name, self.get_stage_uri(object_path=object_path),
+                                                   self.get_file_format_name())
+
+        query_ids: dict[str, str] = {}
+        for table_name, object_path in loads:
+            copy_into_query: str = self.create_sql_str_copy_into(
+                table_name=table_name,
+                stage_uri=self.get_stage_uri(object_path=object_path))
+            query_ids[table_name] = self.db_connection.execute_query_async(copy_into_query)
+
+        failed_tables: list[str] = self.db_connection.wait_for_queries(query_ids=query_ids)
+        log_message(log_level='Info',
+                    message=f'Loaded {len(loads) - len(failed_tables)} of {len(loads)} tables with async COPY INTO')
+        return failed_tables
 
     def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
+        # The staging table is created and loaded before the unit of work begins, because DDL commits the open
+        # transaction
         staging_table_name: str = f"{table_name}_staging".upper()
         self.create_staging_table(staging_table_name=staging_table_name, table_name=table_name)
         self.insert_into_staging_table(staging_table_name=staging_table_name, object_path=object_path)
 
+        # The staging table is created from the target table, so both have the same columns
         table_column_response: dict = self.retrieve_column_info(table_name)
-        temp_table_column_response: dict = self.retrieve_column_info(staging_table_name)
         table_columns: list = list(table_column_response.keys())
-        temp_table_columns = [col for col in table_columns if col in temp_table_column_response.keys()]
+        temp_table_columns = table_columns
 
         set_clause: str = ', '.join([f'target."{col}" = source."{col}"' for col in table_columns])
         insert_columns: str = ', '.join([f'"{col}"' for col in table_columns])
         insert_values: str = ', '.join([f'source."{col}"' for col in temp_table_columns])
 
-        if table_name == 'picklist__sys':
-            matching_statement = 'target."object" = source."object" \nAND target."object_field" = source."object_field" \nAND target."picklist_value_name" = source."picklist_value_name"'
-        elif table_name == 'metadata':
-            matching_statement = 'target."extract" = source."extract" \nAND target."column_name" = source."column_name"'
-        else:
-            matching_statement = 'target."id" = source."id"'
-
-        self.insert_into_target_table(table_name=table_name,
-                                      staging_table_name=staging_table_name,
-                                      matching_statement=matching_statement,
-                                      set_clause=set_clause,
-                                      insert_columns=insert_columns,
-                                      insert_values=insert_values)
+        matching_statement: str = ' \nAND '.join(
+            f'target."{col}" = source."{col}"' for col in self.get_primary_keys(table_name=table_name))
+
+        # Apply the table's whole change set as one unit of work
+        with self.db_connection.transaction():
+            self.insert_into_target_table(table_name=table_name,
+                                          staging_table_name=staging_table_name,
+                                          matching_statement=matching_statement,
+                                          set_clause=set_clause,
+                                          insert_columns=insert_columns,
+                                          insert_values=insert_values)
 
@@ -9,6 +9,11 @@ class SqlDatabaseConnection(DatabaseConnection):
     """
     TODO: Add docstring
     """
+    savepoint_statement: str | None = 'SAVE TRANSACTION {name}'
+    rollback_to_savepoint_statement: str | None = 'ROLLBACK TRANSACTION {name}'
+    release_savepoint_statement: str | None = None
+    supports_statement_batches: bool = True
+    parameter_marker: str = '?'
 
     def __init__(self, connection_string: str, database: str, server_name: str, username: str, user_password: str):
         """
@@ -66,13 +71,16 @@ class SqlDatabaseConnection(DatabaseConnection):
                 else:
                     return []
             else:
-                self.con.commit()
+                if not self.in_transaction:
+                    self.con.commit()
                 return None
         except Exception as e:
             log_message(
                 log_level='Exception',
                 message=f"Executing query: {query}",
                 exception=e)
+            if self.in_transaction:
+                raise e
             return []
 
     def activate_cursor(self):
@@ -82,3 +90,8 @@ class SqlDatabaseConnection(DatabaseConnection):
 
     def close_cursor(self):
         self.cursor.close()
+
+    def consume_batch_results(self):
+        # pyodbc only raises an error in a later statement of a batch once its result set is reached
+        while self.cursor.nextset():
+            pass
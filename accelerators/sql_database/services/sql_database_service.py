@@ -1,14 +1,19 @@
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from pyarrow import ExtensionArray
 
 from accelerators.sql_database.connections.sql_database_connection import SqlDatabaseConnection
 from common.services.database_service import DatabaseService
+from common.services.schema_catalog import SchemaCatalog
 from common.utilities import log_message, update_table_name_that_starts_with_digit
 
 
 class SqlDatabaseService(DatabaseService):
+    supports_combined_changes: bool = True
+    supports_values_merge: bool = True
+    quoted_identifier_format: str = '[{}]'
+
     def __init__(self, parameters: dict):
         super().__init__(parameters)
         self.server_name: str = parameters['server_name']
@@ -33,6 +38,29 @@ class SqlDatabaseService(DatabaseService):
             connection_string=self.connection_string
         )
 
+    @staticmethod
+    def create_column_definitions(table_df: DataFrame) -> pd.Series:
+        """
+        Maps every metadata row to its Sql Database column definition in a single vectorised pass.
+
+        :param table_df: A DataFrame containing column details (column_name, type, length).
+        :return: The column definitions, with the same index as table_df.
+        """
+        column_names: pd.Series = table_df['column_name'].str.lower()
+        data_types: pd.Series = table_df['type'].str.lower()
+
+        column_types: np.ndarray = np.select(
+            [
+                (data_types == "id") | ((column_names == 'id') & (data_types == 'string')),
+                data_types.isin(["datetime", "timestamp with time zone"]),
+                # TODO: Issue with loading boolean values. Loading as VARCHAR for now
+                data_types == "boolean",
+                data_types.isin(["number", "numeric"]),
+            ],
+            ['NVARCHAR(MAX)', 'DATETIME2(3)', 'VARCHAR(10)', 'NUMERIC'],
+            default='NVARCHAR(MAX)')
+        return '"' + column_names + '" ' + pd.Series(column_types, index=table_df.index)
+
     @staticmethod
     def create_sql_str_column_definitions(table_df: DataFrame, is_picklist: bool = False, is_modify: bool = False, is_add: bool = False) -> str:
         """
@@ -44,25 +72,7 @@ class SqlDatabaseService(DatabaseService):
         :param is_picklist: A boolean indicating if the table is the picklist table.
         :return: A partial SQL string defining the table columns.
         """
-        column_definitions = []
-
-        for _, row in table_df.iterrows():
-            column_name = row['column_name'].lower()
-            data_type = row['type'].lower()
-
-            if data_type == "id" or (column_name == 'id' and data_type == 'string'):
-                column_def = f'"{column_name}" NVARCHAR(MAX)'
-            elif data_type in ["datetime", "timestamp with time zone"]:
-                column_def = f'"{column_name}" DATETIME2(3)'
-            elif data_type == "boolean":
-                # TODO: Issue with loading boolean values. Loading as VARCHAR for now
-                column_def = f'"{column_name}" VARCHAR(10)'
-            elif data_type in ["number", "numeric"]:
-                column_def = f'"{column_name}" NUMERIC'
-            else:
-                column_def = f'"{column_name}" NVARCHAR(MAX)'
-
-            column_definitions.append(column_def)
+        column_definitions: list = SqlDatabaseService.create_column_definitions(table_df=table_df).tolist()
 
         if is_modify and not is_add:
             return "ALTER COLUMN " + ", ALTER COLUMN ".join(column_definitions)
@@ -133,55 +143,39 @@ class SqlDatabaseService(DatabaseService):
                         exception=e)
             raise e
 
-    def retrieve_column_info(self, table_name: str) -> dict:
+    def load_schema_catalog(self) -> dict[str, dict[str, dict]]:
+        schema_columns_query: str = f"""
+            SELECT table_name, column_name, data_type, character_maximum_length
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE
+            table_catalog = '{self.database}' 
+            AND table_schema = '{self.schema}';
+        """
+        sql_result: list = self.db_connection.execute_query(schema_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH'])
+
+    def query_column_info(self, table_name: str) -> dict:
         existing_columns_query = f"""
-            SELECT column_name, data_type, character_maximum_length
-            FROM information_schema.columns
+            SELECT table_name, column_name, data_type, character_maximum_length
+            FROM INFORMATION_SCHEMA.COLUMNS
             WHERE
             table_catalog = '{self.database}' 
             AND table_schema = '{self.schema}'
-            AND table_name = '{table_name}'
+            AND table_name = '{table_name}';
         """
         sql_result: list = self.db_connection.execute_query(existing_columns_query)
-        # Convert pyodbc.Row items to a list of tuples
-        sql_result_tuples = [tuple(row) for row in sql_result]
-
-        columns: list = ['COLUMN_NAME', 'DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
-        existing_columns_df = pd.DataFrame(sql_result_tuples, columns=columns)
-
-        # Convert to dictionary for quick lookup
-        return {
-            row['COLUMN_NAME'].lower(): {
-                "DATA_TYPE": row["DATA_TYPE"].lower(),
-                "CHARACTER_MAXIMUM_LENGTH": row["CHARACTER_MAXIMUM_LENGTH"]
-            }
-            for _, row in existing_columns_df.iterrows()
-        }
-
-    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
-
-        unique_extract_values: ExtensionArray = metadata_table["extract"].unique()
-
-        for extract in unique_extract_values:
-            filtered_metadata: DataFrame = metadata_table[metadata_table["extract"] == extract]
-            # Vault allows 255 characters for description__sys, but the extract metadata defines a length of 128.
-            if extract == "Object.security_policy__sys":
-                filtered_metadata.loc[
-                    (filtered_metadata['column_name'] == 'description__sys'),
-                    ['type', 'length']
-                ] = ['String', 255]
-
-            new_table_name: str = update_table_name_that_starts_with_digit(extract.split(".")[1])
-            self.create_single_table(table_name=new_table_name, filtered_metadata=filtered_metadata)
-
-        # Create metadata table
-        column_definitions: dict = {col: ["STRING"] for col in metadata_table.columns}
-        new_metadata_df = pd.DataFrame.from_dict(column_definitions).astype(str)
-        new_metadata_df.loc["length"] = 1000
-        new_metadata_df = new_metadata_df.T.reset_index()
-        new_metadata_df.columns = ["column_name", "type", "length"]
-
-        self.create_single_table(table_name="metadata", filtered_metadata=new_metadata_df)
+        return SchemaCatalog.group_column_rows(rows=sql_result,
+                                               info_keys=['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
+                                               ).get(table_name.lower(), {})
+
+    def create_table_statement(self, table_name: str, column_definitions: str) -> str:
+        return f"""
+                IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = '{table_name}' AND schema_id = SCHEMA_ID('{self.schema}'))
+                BEGIN
+                    CREATE TABLE {self.schema}.{table_name} ({column_definitions});
+                END
+            """
 
     def create_single_table(self, table_name: str, filtered_metadata: pd.DataFrame):
         is_picklist = False
@@ -190,13 +184,10 @@ class SqlDatabaseService(DatabaseService):
             is_picklist = True
         sql_string: str = self.create_sql_str_column_definitions(filtered_metadata, is_picklist=is_picklist, is_modify=False, is_add=False)
 
+        self.db_connection.execute_query(self.create_table_statement(table_name=table_name,
+                                                                     column_definitions=sql_string))
 
-        self.db_connection.execute_query(f"""
-                IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = '{table_name}' AND schema_id = SCHEMA_ID('{self.schema}'))
-                BEGIN
-                    CREATE TABLE {self.schema}.{table_name} ({sql_string});
-                END
-            """)
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def add_columns_to_table(self, columns_to_add: pd.DataFrame, table_name: str):
         column_definitions: str = self.create_sql_str_column_definitions(
@@ -208,6 +199,9 @@ class SqlDatabaseService(DatabaseService):
                         """
             self.db_connection.execute_query(alter_query)
 
+        # The database chooses the exact types of the new columns, so re-read this table only
+        self.schema_catalog.refresh_table(database_service=self, table_name=table_name)
+
     def drop_tables_in_schema(self, tables: list | tuple):
         for (table_name,) in tables:
             drop_query: str = f'DROP TABLE {self.schema}."{table_name}";'
@@ -215,6 +209,7 @@ class SqlDatabaseService(DatabaseService):
                         message=f"Executing: {drop_query}",
                         context=None)
             self.db_connection.execute_query(drop_query)
+            self.schema_catalog.invalidate_table(table_name=table_name)
 
         log_message(log_level='Info',
                     message=f"Tables dropped successfully")
@@ -222,6 +217,7 @@ class SqlDatabaseService(DatabaseService):
     def drop_table(self, table_name: str):
         drop_query: str = f'DROP TABLE IF EXISTS {self.schema}.{table_name};'
         self.db_connection.execute_query(drop_query)
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def drop_columns_from_table(self, table_name: str, columns: list):
         for column_name in columns:
@@ -231,14 +227,19 @@ class SqlDatabaseService(DatabaseService):
             """
             self.db_connection.execute_query(drop_column_query)
 
+        self.schema_catalog.drop_columns(table_name=table_name, columns=columns)
+
     def delete_data_from_table(self, starting_directory: str,
                                manifest_table: pd.DataFrame):
 
         deletes_filter: DataFrame = manifest_table[(manifest_table["type"] == "deletes") & (manifest_table["records"] > 0)]
 
-        for index, row in deletes_filter.iterrows():
-            self.process_delete(row=row,
-                                starting_directory=starting_directory)
+        # Deletes for different tables are independent, so they run on the load workers with the largest first
+        self.run_manifest_tasks(
+            manifest_rows=deletes_filter,
+            task_function=lambda worker_service, row: worker_service.process_delete(row=row,
+                                                                                  starting_directory=starting_directory),
+            description='Table delete')
 
     def create_raw_data_table(self, raw_data_table_name: str, headers: list[str] = None):
         column_definitions_list = [f"[{col_name}] NVARCHAR(MAX) NULL" for col_name in headers]
@@ -316,51 +317,54 @@ class SqlDatabaseService(DatabaseService):
 
         self.db_connection.execute_query(query=insert_query)
 
-    def process_delete(self, row: pd.Series, starting_directory: str):
-        raw_table = row["extract"].split(".")[1]
-        related_file = row["file"]
-        relative_blob_url = f"{starting_directory}/{related_file}"
-        table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
-        if raw_table != "metadata_deletes":
-            columns = ''
-            column_names = ''
-            if table_name == 'picklist__sys':
-                column_names += 'object || object_field || picklist_value_name'
-                columns += 'object VARCHAR(255), object_field VARCHAR(255), picklist_value_name VARCHAR(255)'
-            elif table_name == 'metadata':
-                column_names += 'extract || column_name'
-                columns += 'extract VARCHAR(255), column_name VARCHAR(255)'
-            else:
-                column_names += 'id'
-                columns += 'id VARCHAR(255)'
-
-            create_query = f"CREATE TABLE #staging_{table_name}_deletes ({columns}, deleted_date DATETIME2(3))"
-
-
-            # Load the data from the CSV file into the temporary view
-            self.db_connection.execute_query(create_query)
-
-            copy_query = f"""
-                    BULK INSERT #staging_{table_name}_deletes 
-                    FROM '{relative_blob_url}'
-                    WITH (
-                        DATA_SOURCE = '{self.external_data_source}',
-                        FORMAT = 'CSV',
-                        FIRSTROW = 2,
-                        ROWTERMINATOR = '0x0a',
-                        FIELDTERMINATOR = ',',
-                        BATCHSIZE=10000,
-                        TABLOCK
-                    );
-                    """
+    def stage_deletes(self, table_name: str, relative_path: str) -> str:
+        """
+        Creates a temporary table for the keys of a table's deleted rows and bulk inserts the deletes file into it.
+
+        :param table_name: The target table
+        :param relative_path: The path of the deletes file relative to the external data source
+        :return: The name of the temporary table
+        """
+        columns: str = ', '.join(f'{col} VARCHAR(255)' for col in self.get_primary_keys(table_name=table_name))
+
+        deletes_table_name: str = f"#staging_{table_name}_deletes"
+        create_query = f"CREATE TABLE {deletes_table_name} ({columns}, deleted_date DATETIME2(3))"
 
-            self.db_connection.execute_query(copy_query)
+        # Load the data from the CSV file into the temporary table
+        self.db_connection.execute_query(create_query)
+
+        copy_query = f"""
+                BULK INSERT {deletes_table_name}
+                FROM '{relative_path}'
+                WITH (
+                    DATA_SOURCE = '{self.external_data_source}',
+                    FORMAT = 'CSV',
+                    FIRSTROW = 2,
+                    ROWTERMINATOR = '0x0a',
+                    FIELDTERMINATOR = ',',
+                    BATCHSIZE=10000,
+                    TABLOCK
+                );
+                """
 
-            # Delete the matching rows from the target table
-            delete_query = (f"DELETE FROM {self.database}.{self.schema}.{table_name} "
-                            f"WHERE {column_names} IN (SELECT {column_names} FROM #staging_{table_name}_deletes);")
+        self.db_connection.execute_query(copy_query)
+        return deletes_table_name
 
-            self.db_connection.execute_query(delete_query)
+    def process_delete(self, row: pd.Series, starting_directory: str):
+        # Apply the deletes for the table as one unit of work, or in committed batches if there are many
+        with self.delete_unit_of_work(records=int(row["records"])):
+            raw_table = row["extract"].split(".")[1]
+            related_file = row["file"]
+            relative_blob_url = f"{starting_directory}/{related_file}"
+            table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
+            if raw_table != "metadata_deletes":
+                deletes_table_name: str = self.stage_deletes(table_name=table_name, relative_path=relative_blob_url)
+
+                # Delete the matching rows from the target table
+                self.apply_key_delete(target_table_name=f"{self.schema}.{table_name}",
+                                      deletes_table_name=deletes_table_name,
+                                      primary_keys=self.get_primary_keys(table_name=table_name),
+                                      records=int(row["records"]))
 
     def load_full_or_log_data(self, table_name: str, object_path: str, headers: list = None):
         object_storage_root: str = f"{self.object_storage_root}/"
@@ -380,18 +384,19 @@ class SqlDatabaseService(DatabaseService):
                 );
             """)
 
-    def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
-        if table_name == 'metadata':
-            primary_keys = ["extract", "column_name"]
-        elif table_name == 'picklist__sys':
-            primary_keys = ["object", "object_field", "picklist_value_name"]
-        else:
-            primary_keys = ["id"]
-
+    def stage_updates(self, table_name: str, object_path: str, headers: list[str]) -> tuple[str, list[str]]:
+        """
+        Loads the updates file of a table into a temporary staging table with the target table's column types. The
+        file is first bulk inserted as strings, then converted, because the 'Z' in Vault datetimes is not recognized
+        by SQL Server.
+
+        :param table_name: The target table
+        :param object_path: The full object path of the updates file
+        :param headers: The headers of the updates file
+        :return: The name of the staging table and its columns
+        """
         csv_table_name: str = f"#csv_{table_name}"
         staging_table_name: str = f"#staging_{table_name}"
-        pk_condition: str = " AND ".join(
-            [f"{self.schema}.{table_name}.{col} = {staging_table_name}.{col}" for col in primary_keys])
 
         # Create CVS table and load all data as Strings
         object_storage_root: str = f"{self.object_storage_root}/"
@@ -427,9 +432,39 @@ class SqlDatabaseService(DatabaseService):
                                        select_expressions_sql_str=select_expressions_sql_str,
                                        insert_columns_sql_str=insert_columns_sql_str)
 
-        self.delete_duplicate_rows_from_table(table_name=table_name,
-                                              staging_table_name=staging_table_name,
-                                              pk_condition=pk_condition)
+        return staging_table_name, [info['name'] for info in target_columns_info]
 
-        self.insert_into_target_table(table_name=table_name,
-                                      staging_table_name=staging_table_name)
+    def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
+        # Apply the table's whole change set as one unit of work
+        with self.db_connection.transaction():
+            primary_keys: list[str] = self.get_primary_keys(table_name=table_name)
+
+            staging_table_name, _ = self.stage_updates(table_name=table_name, object_path=object_path,
+                                                       headers=headers)
+            pk_condition: str = " AND ".join(
+                [f"{self.schema}.{table_name}.{col} = {staging_table_name}.{col}" for col in primary_keys])
+
+            self.delete_duplicate_rows_from_table(table_name=table_name,
+                                                  staging_table_name=staging_table_name,
+                                                  pk_condition=pk_condition)
+
+            self.insert_into_target_table(table_name=table_name,
+                                          staging_table_name=staging_table_name)
+
+    def apply_table_changes(self, table_name: str, updates_object_path: str, deletes_object_path: str,
+                            headers: list[str] = None, **kwargs):
+        # Apply the table's updates and deletes as one unit of work, with a single MERGE into the target table
+        with self.db_connection.transaction():
+            staging_table_name, table_columns = self.stage_updates(table_name=table_name,
+                                                                   object_path=updates_object_path,
+                                                                   headers=headers)
+            deletes_table_name: str = self.stage_deletes(
+                table_name=table_name,
+                relative_path=deletes_object_path.replace(f"{self.object_storage_root}/", ''))
+
+            self.db_connection.execute_query(self.create_sql_str_change_merge(
+                target_table_name=f"{self.schema}.{table_name}",
+                updates_table_name=staging_table_name,
+                deletes_table_name=deletes_table_name,
+                table_columns=table_columns,
+                primary_keys=self.get_primary_keys(table_name=table_name)))
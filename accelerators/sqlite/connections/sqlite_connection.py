@@ -6,6 +6,10 @@ from common.utilities import log_message
 
 
 class SqliteConnection(DatabaseConnection):
+    supports_statement_batches: bool = True
+    parameter_marker: str = '?'
+    # The default SQLITE_MAX_VARIABLE_NUMBER of SQLite versions before 3.32
+    max_statement_parameters: int = 999
 
     def __init__(self, databases_folder: str, database: str):
         """
@@ -28,7 +32,8 @@ class SqliteConnection(DatabaseConnection):
 
             # Use the Sqlite connection
             database_filepath: str = f"{self.databases_folder}/{self.database}"
-            conn: Connection = sqlite3.connect(database_filepath)
+            # Pooled connections are handed from one worker thread to the next, never used by two at once
+            conn: Connection = sqlite3.connect(database_filepath, check_same_thread=False)
 
             self.con = conn
             self.connected = True
@@ -55,11 +60,44 @@ class SqliteConnection(DatabaseConnection):
             if query.strip().upper().startswith("SELECT"):
                 return self.cursor.fetchall()
             else:
-                self.con.commit()
+                if not self.in_transaction:
+                    self.con.commit()
                 return None
         except Exception as e:
             log_message(
                 log_level='Exception',
                 message=f"Executing query: {query}",
                 exception=e)
+            if self.in_transaction:
+                raise e
             return []
+
+    def execute_batch(self, statements: list[str]):
+        # cursor.execute only accepts a single statement, so batches go through executescript. executescript commits
+        # any open transaction first, so statements inside a unit of work are executed one at a time instead.
+        if not self.connected:
+            self.open()
+            self.cursor = self.con.cursor()
+        if self.in_transaction:
+            for statement in statements:
+                self.execute_query(statement)
+            return
+
+        script: str = ';\n'.join(statement.strip().rstrip(';') for statement in statements)
+        log_message(
+            log_level='Info',
+            message=f"Executing script: {script}")
+        try:
+            self.cursor.executescript(f'BEGIN;\n{script};\nCOMMIT;')
+        except Exception as e:
+            log_message(
+                log_level='Warning',
+                message=f'Batch of {len(statements)} statements failed. Executing them one at a time',
+                exception=e)
+            self.con.rollback()
+            for statement in statements:
+                self.execute_query(statement)
+
+    def begin_transaction(self):
+        # An explicit BEGIN also covers DDL, which the sqlite3 module does not open a transaction for
+        self.cursor.execute('BEGIN')
@@ -67,6 +67,7 @@ def handle_metadata_updates(local_params: dict,
                 sqlite_service.db_connection.execute_query(f"""
                             ALTER TABLE {sqlite_service.schema}.{table_name} {modify_column_statement}
                         """)
+                sqlite_service.schema_catalog.refresh_table(database_service=sqlite_service, table_name=table_name)
 
 
 def handle_metadata_deletes(local_params: dict,
@@ -132,17 +133,26 @@ def process_manifest_row(sqlite_service: SqliteService,
                               local_params=local_params,
                               extract_type=extract_type,
                               table_name=table_name,
-                              filename=filename)
+                              filename=filename,
+                              records=int(row["records"]))
 
 
 def load_data_into_tables(sqlite_service: SqliteService,
                           local_params: dict,
                           extract_type: str,
                           table_name: str,
-                          filename: str):
+                          filename: str,
+                          records: int = 0):
     full_object_path: str = f"{local_params['direct_data_folder']}/{local_params['extract_folder']}/{filename}"
     headers: list[str] | None = None
 
+    # Small updates files are applied with parameterised statements instead of a staging table
+    if extract_type == "incremental" and sqlite_service.use_small_change_load(
+            records=records, file_size_bytes=os.path.getsize(full_object_path)):
+        changes: pd.DataFrame = pd.read_csv(full_object_path, dtype=str, keep_default_na=False, na_values=[''])
+        if sqlite_service.load_small_incremental_data(table_name=table_name, changes=changes):
+            return
+
     if extract_type in ["full", "log"]:
         sqlite_service.load_full_or_log_data(table_name=table_name,
                                              object_path=full_object_path,
@@ -201,6 +211,8 @@ def run(direct_data_params: Dict[str, Any],
                                  row=row,
                                  extract_type=extract_type)
 
+        sqlite_service.close_connection_pool()
+
     except Exception as e:
         log_message(log_level='Error',
                     message=f'Errors encountered when loading into SQLite',
@@ -1,9 +1,10 @@
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from pyarrow import ExtensionArray
 
 from accelerators.sqlite.connections.sqlite_connection import SqliteConnection
 from common.services.database_service import DatabaseService
+from common.services.schema_catalog import SchemaCatalog
 from common.utilities import log_message, update_table_name_that_starts_with_digit
 
 
@@ -12,6 +13,8 @@ class SqliteService(DatabaseService):
         super().__init__(parameters)
         self.databases_folder = parameters['databases_folder']
         self.database = parameters['database']
+        # SQLite allows a single writer at a time
+        self.load_workers = 1
         self.db_connection: SqliteConnection = self.get_connection()
 
     def get_connection(self) -> SqliteConnection:
@@ -20,6 +23,26 @@ class SqliteService(DatabaseService):
             database=self.database
         )
 
+    @staticmethod
+    def create_column_definitions(table_df: DataFrame) -> pd.Series:
+        """
+        Maps every metadata row to its Sqlite column definition in a single vectorised pass.
+
+        :param table_df: A DataFrame containing column details (column_name, type, length).
+        :return: The column definitions, with the same index as table_df.
+        """
+        column_names: pd.Series = table_df['column_name'].str.lower()
+        data_types: pd.Series = table_df['type'].str.lower()
+
+        column_types: np.ndarray = np.select(
+            [
+                data_types == "boolean",
+                data_types.isin(["number", "numeric"]),
+            ],
+            ['INTEGER', 'INTEGER'],
+            default='TEXT')
+        return '"' + column_names + '" ' + pd.Series(column_types, index=table_df.index)
+
     @staticmethod
     def create_sql_str_column_definitions(table_df: DataFrame, is_picklist: bool = False, is_modify: bool = False,
                                           is_add: bool = False) -> str:
@@ -32,24 +55,7 @@ class SqliteService(DatabaseService):
         :param is_picklist: A boolean indicating if the table is the picklist table.
         :return: A partial SQL string defining the table columns.
         """
-        column_definitions = []
-
-        for _, row in table_df.iterrows():
-            column_name = row['column_name'].lower()
-            data_type = row['type'].lower()
-
-            if  data_type == 'string':
-                column_def = f'"{column_name}" TEXT'
-            if data_type in ["datetime", "timestamp with time zone"]:
-                column_def = f'"{column_name}" TEXT'
-            elif data_type == "boolean":
-                column_def = f'"{column_name}" INTEGER'
-            elif data_type in ["number", "numeric"]:
-                column_def = f'"{column_name}" INTEGER'
-            else:
-                column_def = f'"{column_name}" TEXT'
-
-            column_definitions.append(column_def)
+        column_definitions: list = SqliteService.create_column_definitions(table_df=table_df).tolist()
 
         if is_modify and not is_add:
             return "ALTER COLUMN " + ", ALTER COLUMN ".join(column_definitions)
@@ -93,50 +99,40 @@ class SqliteService(DatabaseService):
                         exception=e)
             raise e
 
-    def retrieve_column_info(self, table_name: str) -> dict:
+    def load_schema_catalog(self) -> dict[str, dict[str, dict]]:
+        schema_columns_query: str = """
+            SELECT
+                tables.name AS TABLE_NAME,
+                columns.name AS COLUMN_NAME,
+                columns.type AS DATA_TYPE
+            FROM
+                sqlite_master AS tables
+                JOIN pragma_table_info(tables.name) AS columns
+            WHERE
+                tables.type = 'table';
+        """
+        sql_result: list = self.db_connection.execute_query(schema_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result, info_keys=['DATA_TYPE'])
+
+    def query_column_info(self, table_name: str) -> dict:
         existing_columns_query = f"""
             SELECT
+                '{table_name}' AS TABLE_NAME,
                 name AS COLUMN_NAME,
                 type AS DATA_TYPE
             FROM
                 pragma_table_info('{table_name}');
         """
-        sql_result = self.db_connection.execute_query(existing_columns_query)
-        columns = ['COLUMN_NAME', 'DATA_TYPE']
-        existing_columns_df = pd.DataFrame(sql_result, columns=columns)
-
-        # Convert to dictionary for quick lookup
-        return {
-            row['COLUMN_NAME'].lower(): {
-                "DATA_TYPE": row["DATA_TYPE"].lower()
-            }
-            for _, row in existing_columns_df.iterrows()
-        }
-
-    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
-
-        unique_extract_values: ExtensionArray = metadata_table["extract"].unique()
-
-        for extract in unique_extract_values:
-            filtered_metadata = metadata_table[metadata_table["extract"] == extract]
-            # Vault allows 255 characters for description__sys, but the extract metadata defines a length of 128.
-            if extract == "Object.security_policy__sys":
-                filtered_metadata.loc[
-                    (filtered_metadata['column_name'] == 'description__sys'),
-                    ['type', 'length']
-                ] = ['String', 255]
-
-            new_table_name = update_table_name_that_starts_with_digit(extract.split(".")[1])
-            self.create_single_table(table_name=new_table_name, filtered_metadata=filtered_metadata)
-
-        # Create metadata table
-        column_definitions: dict = {col: ["STRING"] for col in metadata_table.columns}
-        new_metadata_df = pd.DataFrame.from_dict(column_definitions).astype(str)
-        new_metadata_df.loc["length"] = 1000
-        new_metadata_df = new_metadata_df.T.reset_index()
-        new_metadata_df.columns = ["column_name", "type", "length"]
-
-        self.create_single_table(table_name="metadata", filtered_metadata=new_metadata_df)
+        sql_result: list = self.db_connection.execute_query(existing_columns_query)
+        return SchemaCatalog.group_column_rows(rows=sql_result, info_keys=['DATA_TYPE']).get(table_name.lower(), {})
+
+    def qualified_table_name(self, table_name: str) -> str:
+        return table_name
+
+    def create_table_statement(self, table_name: str, column_definitions: str) -> str:
+        return f"""
+                CREATE TABLE IF NOT EXISTS {table_name} ({column_definitions})
+            """
 
     def create_single_table(self, table_name: str, filtered_metadata: pd.DataFrame):
         is_picklist = False
@@ -146,9 +142,10 @@ class SqliteService(DatabaseService):
         sql_string = self.create_sql_str_column_definitions(filtered_metadata, is_picklist=is_picklist, is_modify=False,
                                                             is_add=False)
 
-        self.db_connection.execute_query(f"""
-                CREATE TABLE IF NOT EXISTS {table_name} ({sql_string})
-            """)
+        self.db_connection.execute_query(self.create_table_statement(table_name=table_name,
+                                                                     column_definitions=sql_string))
+
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def add_columns_to_table(self, columns_to_add: pd.DataFrame, table_name: str):
         column_definitions: str = self.create_sql_str_column_definitions(
@@ -160,12 +157,16 @@ class SqliteService(DatabaseService):
                         """
             self.db_connection.execute_query(alter_query)
 
+        # The database chooses the exact types of the new columns, so re-read this table only
+        self.schema_catalog.refresh_table(database_service=self, table_name=table_name)
+
     def drop_tables_in_schema(self, tables: list | tuple):
         for (table_name,) in tables:
             drop_query: str = f'DROP TABLE IF EXISTS {table_name};'
             log_message(log_level='Info',
                         message=f"Executing: {drop_query}")
             self.db_connection.execute_query(drop_query)
+            self.schema_catalog.invalidate_table(table_name=table_name)
 
         log_message(log_level='Info',
                     message=f"Tables dropped successfully", )
@@ -173,6 +174,7 @@ class SqliteService(DatabaseService):
     def drop_table(self, table_name: str):
         drop_query: str = f'DROP TABLE IF EXISTS {self.schema}.{table_name};'
         self.db_connection.execute_query(drop_query)
+        self.schema_catalog.invalidate_table(table_name=table_name)
 
     def drop_columns_from_table(self, table_name: str, columns: list):
         for column_name in columns:
@@ -182,15 +184,20 @@ class SqliteService(DatabaseService):
             """
             self.db_connection.execute_query(drop_column_query)
 
+        self.schema_catalog.drop_columns(table_name=table_name, columns=columns)
+
     def delete_data_from_table(self, starting_directory: str,
                                manifest_table: pd.DataFrame):
 
         deletes_filter: DataFrame = manifest_table[
             (manifest_table["type"] == "deletes") & (manifest_table["records"] > 0)]
 
-        for index, row in deletes_filter.iterrows():
-            self.process_delete(row=row,
-                                starting_directory=starting_directory)
+        # Deletes for different tables are independent, so they run on the load workers with the largest first
+        self.run_manifest_tasks(
+            manifest_rows=deletes_filter,
+            task_function=lambda worker_service, row: worker_service.process_delete(row=row,
+                                                                                  starting_directory=starting_directory),
+            description='Table delete')
 
     def create_staging_table(self, staging_table_name: str, **kwargs):
 
@@ -244,22 +251,9 @@ class SqliteService(DatabaseService):
         file_path: str = f"{starting_directory}/{related_file}"
         table_name = update_table_name_that_starts_with_digit(raw_table.replace('_deletes', ''))
         if raw_table != "metadata_deletes":
-            columns = ''
-            column_names = ''
-            if table_name == 'picklist__sys':
-                column_names += 'object || object_field || picklist_value_name'
-                columns += 'object TEXT, object_field TEXT, picklist_value_name TEXT'
-            elif table_name == 'metadata':
-                column_names += 'extract || column_name'
-                columns += 'extract TEXT, column_name TEXT'
-            else:
-                column_names += 'id'
-                columns += 'id TEXT'
-
-            # Load the CSV keys into a pandas DataFrame
+            # Load the CSV keys into a temp table. pandas commits the table it writes, so it is created before the
+            # unit of work begins.
             df_deletions: DataFrame = pd.read_csv(file_path)
-
-            # Create a temp table
             temp_table_name: str = f'temp_{table_name}_deletes'
             df_deletions.to_sql(
                 temp_table_name,
@@ -267,10 +261,13 @@ class SqliteService(DatabaseService):
                 if_exists='replace',
                 index=False
             )
-            delete_query = (f"DELETE FROM {table_name} "
-                            f"WHERE {column_names} IN (SELECT {column_names} FROM {temp_table_name});")
 
-            self.db_connection.execute_query(delete_query)
+            # Apply the deletes for the table as one unit of work, or in committed batches if there are many
+            with self.delete_unit_of_work(records=int(row["records"])):
+                self.apply_key_delete(target_table_name=table_name,
+                                      deletes_table_name=temp_table_name,
+                                      primary_keys=self.get_primary_keys(table_name=table_name),
+                                      records=int(row["records"]))
 
             # Delete the temp table
             drop_temp_table_query = f"DROP TABLE IF EXISTS {temp_table_name};"
@@ -287,14 +284,10 @@ class SqliteService(DatabaseService):
                     message=f'Loaded {len(dataframe)} records into {table_name}')
 
     def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
-        if table_name == 'metadata':
-            primary_keys = ["extract", "column_name"]
-        elif table_name == 'picklist__sys':
-            primary_keys = ["object", "object_field", "picklist_value_name"]
-        else:
-            primary_keys = ["id"]
+        primary_keys: list[str] = self.get_primary_keys(table_name=table_name)
 
-        # Load into a temporary staging table
+        # Load into a temporary staging table. pandas commits the table it writes, so it is created before the unit
+        # of work begins.
         staging_table_name: str = f"{table_name}_staging"
 
         self.create_staging_table(staging_table_name=staging_table_name,
@@ -302,11 +295,13 @@ class SqliteService(DatabaseService):
                                   object_path=object_path,
                                   csv_headers=headers)
 
-        self.delete_duplicate_rows_from_table(table_name=table_name,
-                                              staging_table_name=staging_table_name,
-                                              primary_keys=primary_keys)
+        # Apply the table's whole change set as one unit of work
+        with self.db_connection.transaction():
+            self.delete_duplicate_rows_from_table(table_name=table_name,
+                                                  staging_table_name=staging_table_name,
+                                                  primary_keys=primary_keys)
 
-        self.insert_into_target_table(table_name=table_name,
-                                      staging_table_name=staging_table_name)
+            self.insert_into_target_table(table_name=table_name,
+                                          staging_table_name=staging_table_name)
 
         self.db_connection.execute_query(f'DROP TABLE IF EXISTS {staging_table_name};')
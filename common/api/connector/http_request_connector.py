@@ -66,7 +66,8 @@ def send(http_method: HttpMethod,
          query_params: Dict = {},
          body: Any = None,
          headers: Dict = {},
-         files: Dict = {}) -> requests.Response:
+         files: Dict = {},
+         stream: bool = False) -> requests.Response:
     """
     Perform an HTTP call based on the arguments provided
     (url, query_params, body, headers, files)
@@ -79,6 +80,7 @@ def send(http_method: HttpMethod,
         body (Any): Body for the HTTP call if any
         headers (Dict): Headers for the HTTP call if any
         files (Dict): Files for the HTTP call if any
+        stream (bool): If True, the response body is not read until it is accessed
 
     Returns:
         Dict: Attributes from the HTTP response as a Dict
@@ -106,7 +108,8 @@ def send(http_method: HttpMethod,
                                          params=query_params,
                                          data=body,
                                          headers=headers,
-                                         files=files_to_send)
+                                         files=files_to_send,
+                                         stream=stream)
     except Exception as e:
         _LOGGER.error(e)
         raise requests.RequestException("HTTP request failed")
@@ -90,7 +90,8 @@ class VaultResponse(VaultModel):
         response (str): The raw response content.
         responseStatus (str): The status of the response.
         responseMessage (str): A descriptive message about the response.
-        binary_content (bytes): Binary content of the response, if applicable.
+        binary_content (bytes): Binary content of the response, if applicable. This is a memoryview over a pooled
+            buffer when the request was given a buffer pool.
         errorType (str): The type of error, if present.
     """
 
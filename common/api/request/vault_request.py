@@ -99,6 +99,7 @@ class VaultRequest(ABC):
     _vault_password: str = None
     _vault_client_id: str = None
     _http_timeout: int = 60
+    _binary_buffer_pool: Any = None
     _set_log_api_errors: bool = True
     _idp_oauth_access_token: str = None
     _idp_oauth_scope: str = 'openid'
@@ -134,7 +135,10 @@ class VaultRequest(ABC):
                                                                        query_params=self._query_params,
                                                                        body=body,
                                                                        headers=self._header_params,
-                                                                       files=self._file_params)
+                                                                       files=self._file_params,
+                                                                       stream=self._response_option in (
+                                                                           _ResponseOption.BYTES,
+                                                                           _ResponseOption.TO_FILE))
         return self._process_response(http_response=http_response, response_class=response_class)
 
     # def _send_return_binary(self, http_method: http_request_connector.HttpMethod,
@@ -200,9 +204,9 @@ class VaultRequest(ABC):
                 response_object = VaultResponse(**data)
                 response_object.response = response_dict['response']
             else:
-                response_dict['binary_content'] = http_response.content
-                response_object = response_class(binary_content=response_dict['binary_content'])
-                response_object.binary_content = response_dict['binary_content']
+                # Assigned after construction so the payload is not copied by model validation
+                response_object = response_class()
+                response_object.binary_content = self._read_binary_content(http_response=http_response)
         else:
             response_dict['response'] = http_response.text
             data = json.loads(response_dict['response'])
@@ -212,6 +216,42 @@ class VaultRequest(ABC):
         response_object.headers = dict(response_dict['headers'])
         return response_object
 
+    def _read_binary_content(self, http_response: requests.Response) -> bytes | memoryview:
+        # Read the body of a binary response. When the request has a buffer pool and the body length is known, the
+        # body is read from the socket straight into a pooled buffer, so it is copied once on its way to the upload
+        # body. A body that ends before its Content-Length is an error rather than a short payload.
+        #
+        # Args:
+        #     http_response (requests.Response): The streamed HTTP response
+        #
+        # Returns:
+        #     bytes | memoryview: The response body
+
+        content_length = http_response.headers.get(http_request_connector.HTTP_HEADER_CONTENT_LENGTH)
+        if (self._binary_buffer_pool is None or content_length is None
+                or http_response.headers.get('Content-Encoding')):
+            return http_response.content
+
+        content_length = int(content_length)
+        buffer = self._binary_buffer_pool.acquire(size=content_length)
+        buffer_view = memoryview(buffer)
+        bytes_read = 0
+        try:
+            while bytes_read < content_length:
+                chunk_size = http_response.raw.readinto(buffer_view[bytes_read:content_length])
+                if not chunk_size:
+                    break
+                bytes_read += chunk_size
+            if bytes_read < content_length:
+                raise IOError(f'Response body ended after {bytes_read} of {content_length} bytes')
+        except Exception:
+            buffer_view.release()
+            self._binary_buffer_pool.release(buffer=buffer)
+            raise
+        finally:
+            http_response.close()
+        return buffer_view[:bytes_read]
+
     def _add_header_param(self, key: str, value: Any):
         # Add a header param name/value pair to the request.
         #
@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import Callable
+
+from common.connections.database_connection import DatabaseConnection
+from common.utilities import log_message
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of DatabaseConnections created by a connection factory, typically DatabaseService.get_connection.
+
+    Connections are checked out per thread: a thread that acquires again before releasing gets the same connection.
+    Idle connections are health-checked before reuse; connections the server or driver closed are discarded and
+    replaced with new ones. Connections idle
+    for longer than idle_timeout_seconds are closed, down to min_size. At most max_size connections are open at
+    once, and acquire() blocks until one is released when the limit is reached.
+    """
+
+    def __init__(self, connection_factory: Callable[[], DatabaseConnection], min_size: int = 1, max_size: int = 4,
+                 idle_timeout_seconds: float = 300.0):
+        """
+        :param connection_factory: Creates a new, unopened connection
+        :param min_size: The number of connections kept open, even when idle
+        :param max_size: The maximum number of connections open at once
+        :param idle_timeout_seconds: How long an idle connection above min_size is kept before it is closed
+        """
+        self.connection_factory: Callable[[], DatabaseConnection] = connection_factory
+        self.max_size: int = max(1, max_size)
+        self.min_size: int = min(max(0, min_size), self.max_size)
+        self.idle_timeout_seconds: float = idle_timeout_seconds
+        # Idle connections with the time they were released, most recently released last
+        self.idle_connections: list[tuple[DatabaseConnection, float]] = []
+        # Checked out connections by thread ID, with the number of times the thread acquired them
+        self.checked_out: dict[int, list] = {}
+        self.open_count: int = 0
+        # Set by close() only. It describes the pool, never an individual connection
+        self.pool_closed: bool = False
+        self.condition: threading.Condition = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def prefill(self):
+        """
+        Opens connections until min_size are open, so that the first workers do not pay the connect cost.
+        """
+        while True:
+            with self.condition:
+                if self.open_count >= self.min_size:
+                    return
+                self.open_count += 1
+            connection: DatabaseConnection = self._open_connection()
+            with self.condition:
+                self.idle_connections.append((connection, time.monotonic()))
+                self.condition.notify()
+
+    def acquire(self) -> DatabaseConnection:
+        """
+        Checks out a connection for the current thread.
+        """
+        thread_id: int = threading.get_ident()
+        connection: DatabaseConnection | None = None
+        with self.condition:
+            if thread_id in self.checked_out:
+                self.checked_out[thread_id][1] += 1
+                return self.checked_out[thread_id][0]
+
+            self._evict_idle_connections()
+            # Reopens a pool that close() shut down. Connection state is checked separately below
+            self.pool_closed = False
+            while not self.idle_connections and self.open_count >= self.max_size:
+                self.condition.wait()
+
+            if self.idle_connections:
+                connection = self.idle_connections.pop()[0]
+            else:
+                self.open_count += 1
+
+        if connection is not None and not connection.is_healthy():
+            log_message(log_level='Warning',
+                        message='Pooled database connection failed its health check. Replacing it')
+            self._close_connection(connection)
+            connection = None
+
+        try:
+            if connection is None:
+                connection = self._open_connection()
+        except Exception:
+            with self.condition:
+                self.open_count -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            self.checked_out[thread_id] = [connection, 1]
+        return connection
+
+    def release(self, connection: DatabaseConnection):
+        """
+        Returns a connection to the pool once every acquire() for it has been released. The connection may be
+        released from a different thread than the one that acquired it.
+
+        :param connection: A connection returned by acquire()
+        """
+        with self.condition:
+            for thread_id, checkout in self.checked_out.items():
+                if checkout[0] is connection:
+                    checkout[1] -= 1
+                    if checkout[1] == 0:
+                        del self.checked_out[thread_id]
+                        if connection.connected:
+                            self.idle_connections.append((connection, time.monotonic()))
+                            self._evict_idle_connections()
+                        else:
+                            # Closed while checked out, so it is not returned to the pool and a new one replaces it
+                            self.open_count -= 1
+                        self.condition.notify()
+                    return
+
+    def close(self):
+        """
+        Closes the idle connections. Checked out connections are closed when they are released to a closed pool.
+        A later acquire() reopens the pool.
+        """
+        with self.condition:
+            idle_connections: list[tuple[DatabaseConnection, float]] = self.idle_connections
+            self.idle_connections = []
+            self.open_count -= len(idle_connections)
+            self.pool_closed = True
+            self.condition.notify_all()
+        for connection, _ in idle_connections:
+            self._close_connection(connection)
+
+    def _open_connection(self) -> DatabaseConnection:
+        connection: DatabaseConnection = self.connection_factory()
+        connection.open()
+        connection.activate_cursor()
+        return connection
+
+    def _evict_idle_connections(self):
+        # Must be called while holding the condition. Connections that have been idle the longest are at the front.
+        now: float = time.monotonic()
+        while self.idle_connections and (self.pool_closed or (
+                self.open_count > self.min_size
+                and now - self.idle_connections[0][1] > self.idle_timeout_seconds)):
+            connection, _ = self.idle_connections.pop(0)
+            self.open_count -= 1
+            self._close_connection(connection)
+
+    @staticmethod
+    def _close_connection(connection: DatabaseConnection):
+        try:
+            connection.close()
+        except Exception as e:
+            log_message(log_level='Warning',
+                        message='Error closing pooled database connection',
+                        exception=e)
@@ -1,14 +1,110 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from common.utilities import log_message
 
 
 class DatabaseConnection(ABC):
+    health_check_query: str = 'SELECT 1'
+    # Subclasses override these when the target has no transactions or uses a different savepoint syntax.
+    # A savepoint statement of None makes nested units of work join the outer transaction.
+    supports_transactions: bool = True
+    savepoint_statement: str | None = 'SAVEPOINT {name}'
+    rollback_to_savepoint_statement: str | None = 'ROLLBACK TO SAVEPOINT {name}'
+    release_savepoint_statement: str | None = 'RELEASE SAVEPOINT {name}'
+    # Subclasses set this when the driver accepts several statements in a single execute call
+    supports_statement_batches: bool = False
+    # The driver's placeholder for a bound parameter, and the number of parameters one statement may bind
+    parameter_marker: str = '%s'
+    max_statement_parameters: int = 2000
+
     def __init__(self):
         super().__init__()
         self.connected: bool = False
         self.con: Any = None
         self.cursor: Any = None
         self.convert_to_parquet: bool
+        self.transaction_depth: int = 0
+
+    @property
+    def in_transaction(self) -> bool:
+        """
+        True while a unit of work is open. execute_query does not commit, and re-raises errors, inside a unit of work.
+        """
+        return self.transaction_depth > 0
+
+    def begin_transaction(self):
+        """
+        Starts a transaction. Drivers that open a transaction implicitly with the first statement need nothing here.
+        """
+        pass
+
+    def commit_transaction(self):
+        self.con.commit()
+
+    def rollback_transaction(self):
+        self.con.rollback()
+
+    def end_transaction(self):
+        """
+        Restores the connection state changed by begin_transaction, once the transaction is committed or rolled back.
+        """
+        pass
+
+    @contextmanager
+    def transaction(self) -> Iterator['DatabaseConnection']:
+        """
+        A unit of work. Statements executed inside the block are committed together when the block exits, or rolled
+        back together if a statement or the block raises. A nested block uses a savepoint where the target supports
+        one, so that only the nested statements are rolled back.
+        """
+        if not self.supports_transactions:
+            yield self
+            return
+
+        if not self.connected:
+            self.open()
+            self.cursor = self.con.cursor()
+
+        if self.in_transaction:
+            with self._savepoint():
+                yield self
+            return
+
+        self.begin_transaction()
+        self.transaction_depth = 1
+        try:
+            yield self
+            self.commit_transaction()
+        except Exception:
+            try:
+                self.rollback_transaction()
+            except Exception as e:
+                log_message(log_level='Warning',
+                            message='Error rolling back transaction',
+                            exception=e)
+            raise
+        finally:
+            self.transaction_depth = 0
+            self.end_transaction()
+
+    @contextmanager
+    def _savepoint(self) -> Iterator['DatabaseConnection']:
+        savepoint_name: str = f'unit_of_work_{self.transaction_depth}'
+        if self.savepoint_statement:
+            self.cursor.execute(self.savepoint_statement.format(name=savepoint_name))
+        self.transaction_depth += 1
+        try:
+            yield self
+            if self.savepoint_statement and self.release_savepoint_statement:
+                self.cursor.execute(self.release_savepoint_statement.format(name=savepoint_name))
+        except Exception:
+            if self.savepoint_statement and self.rollback_to_savepoint_statement:
+                self.cursor.execute(self.rollback_to_savepoint_statement.format(name=savepoint_name))
+            raise
+        finally:
+            self.transaction_depth -= 1
 
     @abstractmethod
     def open(self):
@@ -22,10 +118,85 @@ class DatabaseConnection(ABC):
             self.con.close()
             self.connected = False
 
+    def is_healthy(self) -> bool:
+        """
+        Runs the health check query on a separate cursor. Unlike execute_query, failures are not logged and retried,
+        so a dropped connection is reported as unhealthy.
+        """
+        if not self.connected:
+            return False
+        try:
+            cursor = self.con.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
     @abstractmethod
     def execute_query(self, query: str):
         pass
 
+    def execute_batch(self, statements: list[str]):
+        """
+        Executes statements, such as CREATE TABLE, in a single round trip where the driver accepts multi-statement
+        batches, and one at a time otherwise. A batch runs as one unit of work. If it fails, the statements are
+        executed again one at a time, so that a single failing statement does not prevent the others.
+
+        :param statements: The statements to execute, with or without a trailing semicolon
+        """
+        if not self.supports_statement_batches:
+            for statement in statements:
+                self.execute_query(statement)
+            return
+
+        batch: str = ';\n'.join(statement.strip().rstrip(';') for statement in statements)
+        try:
+            with self.transaction():
+                self.execute_query(batch)
+                self.consume_batch_results()
+        except Exception as e:
+            log_message(log_level='Warning',
+                        message=f'Batch of {len(statements)} statements failed. Executing them one at a time',
+                        exception=e)
+            for statement in statements:
+                self.execute_query(statement)
+
+    def execute_with_parameters(self, query: str, parameters: list):
+        """
+        Executes a statement with bound parameters, written with parameter_marker as the placeholder. Errors are
+        handled as in execute_query: re-raised inside a unit of work, logged otherwise. Parameter values are not
+        logged.
+
+        :param query: The statement
+        :param parameters: One value per placeholder, in order
+        """
+        if not self.connected:
+            self.open()
+            self.cursor = self.con.cursor()
+        self.activate_cursor()
+
+        log_message(log_level='Info',
+                    message=f"Executing query with {len(parameters)} parameters: {query}")
+        try:
+            self.cursor.execute(query, parameters)
+            if self.supports_transactions and not self.in_transaction:
+                self.commit_transaction()
+        except Exception as e:
+            log_message(log_level='Exception',
+                        message=f"Executing query: {query}",
+                        exception=e)
+            if self.in_transaction:
+                raise e
+
+    def consume_batch_results(self):
+        """
+        Reads the result of every statement in a batch, so that errors in later statements are raised. Drivers that
+        raise on the first failing statement need nothing here.
+        """
+        pass
+
     def activate_cursor(self):
         """
         Activates the cursor for executing queries.
@@ -1,5 +1,4 @@
 import sys
-import io
 
 sys.path.append('.')
 from common.utilities import log_message
@@ -7,6 +6,7 @@ from common.api.model.response.direct_data_response import DirectDataResponse
 from common.api.model.response.vault_response import VaultResponse
 from common.services.object_storage_service import ObjectStorageService
 from common.services.vault_service import VaultService
+from common.transfer_pipeline import BufferPool, TransferPipeline
 
 
 def _handle_multipart_upload(object_storage_service: ObjectStorageService, vault_service: VaultService,
@@ -20,19 +20,34 @@ def _handle_multipart_upload(object_storage_service: ObjectStorageService, vault
         multipart_upload_response = object_storage_service.create_multipart_upload(
             object_path=object_path)
 
-        upload_parts: list = []
-
-        for file_part in direct_data_item.filepart_details:
-            download_response: VaultResponse = vault_service.download_direct_data_file(
-                name=file_part.name)
-
-            part_info: dict = object_storage_service.upload_part(
-                object_path=object_path,
-                multipart_upload_response=multipart_upload_response,
-                part_number=file_part.filepart,
-                data=download_response.binary_content)
-
-            upload_parts.append(part_info)
+        # Parts are read from the socket straight into part-sized pooled buffers, which are uploaded in place and
+        # reused once their upload completes. One buffer more than the byte budget allows for the part being downloaded.
+        part_size: int = max(file_part.size or 0 for file_part in direct_data_item.filepart_details)
+        buffer_pool: BufferPool = BufferPool(
+            buffer_size=part_size,
+            buffer_count=object_storage_service.transfer_max_in_flight_bytes // max(1, part_size) + 1)
+
+        # Vault downloads are produced in this thread while part uploads run on the pipeline workers.
+        # The pipeline blocks further downloads while the in-flight parts exceed the configured byte budget.
+        with TransferPipeline(max_in_flight_bytes=object_storage_service.transfer_max_in_flight_bytes,
+                              worker_count=object_storage_service.transfer_workers,
+                              buffer_pool=buffer_pool) as transfer_pipeline:
+            for file_part in direct_data_item.filepart_details:
+                download_response: VaultResponse = vault_service.download_direct_data_file(
+                    name=file_part.name, buffer_pool=buffer_pool)
+
+                upload_part_size: int = object_storage_service.payload_size(download_response.binary_content)
+                transfer_pipeline.submit(payload_size=upload_part_size,
+                                         transfer_function=object_storage_service.upload_part,
+                                         payload_buffer=download_response.binary_content,
+                                         object_path=object_path,
+                                         multipart_upload_response=multipart_upload_response,
+                                         part_number=file_part.filepart,
+                                         data=download_response.binary_content,
+                                         part_size=upload_part_size)
+                del download_response
+
+        upload_parts: list = sorted(transfer_pipeline.results(), key=lambda part: part['PartNumber'])
 
         object_storage_service.complete_multipart_upload(
             object_path=object_path,
@@ -86,7 +101,7 @@ def run(vault_service: VaultService, object_storage_service: ObjectStorageServic
 
             object_storage_service.upload_object(
                 object_path=object_path,
-                data=io.BytesIO(download_response.binary_content)
+                data=download_response.binary_content
             )
 
         # Create multi-part upload if Direct Data File has multiple parts
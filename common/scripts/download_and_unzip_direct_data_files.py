@@ -1,25 +1,178 @@
 import gzip
+import json
+import math
 import os
 import sys
 import tarfile
+import tempfile
 import io
 from io import BytesIO
-from typing import Dict, Any, IO
 
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
 from common.services.object_storage_service import ObjectStorageService
-from common.utilities import log_message
+from common.task_scheduler import ScheduledTask, TaskScheduler, estimate_table_cost
+from common.transfer_pipeline import TransferPipeline
+from common.utilities import PARQUET_COLUMN_TYPES, log_message
 
 sys.path.append('.')
 
+# The size of the blocks a CSV file is read in when it is split into shards
+SHARD_READ_BYTES: int = 8 * 1024 * 1024
 
-def process_tar_gz_member(tar: tarfile.TarFile,
+
+def upload_local_file(object_storage_service: ObjectStorageService, object_path: str, file_path: str) -> None:
+    with open(file_path, 'rb') as file:
+        object_storage_service.upload_object(object_path=object_path, data=file)
+
+
+def is_within_directory(directory: str, member_name: str) -> bool:
+    # True if an archive member extracts inside the directory, rather than to an absolute path or through '..'
+    directory_path: str = os.path.realpath(directory)
+    member_path: str = os.path.realpath(os.path.join(directory, member_name))
+    return os.path.commonpath([directory_path, member_path]) == directory_path
+
+
+def is_copied_file(member_name: str) -> bool:
+    # Every extract file, including the metadata and deletes files, may be loaded with COPY ... MANIFEST. Only the
+    # extract's manifest is read directly by load_data.
+    return member_name != 'manifest.csv'
+
+
+def find_record_boundary(block: bytes, start: int, in_quotes: bool) -> tuple[int, bool]:
+    """
+    Finds the end of the first CSV record that ends at or after start, skipping newlines inside quoted values.
+    Escaped quotes ("") toggle the quote state twice, so they do not change it.
+
+    :param block: A block of the CSV file
+    :param start: The position in the block to search from
+    :param in_quotes: True if start is inside a quoted value
+    :return: The position after the record's newline, or -1 if the record does not end in the block, and whether
+        that position, or the end of the block, is inside a quoted value
+    """
+    while True:
+        newline: int = block.find(b'\n', start)
+        if newline < 0:
+            return -1, in_quotes ^ (block.count(b'"', start) % 2 == 1)
+        in_quotes ^= block.count(b'"', start, newline) % 2 == 1
+        if not in_quotes:
+            return newline + 1, in_quotes
+        start = newline + 1
+
+
+def write_file_shards(file_path: str, shard_size_bytes: int) -> list[str]:
+    """
+    Splits an extract file into shards of about shard_size_bytes, so that the shards can be loaded in parallel. CSV
+    files are split on record boundaries without being parsed, so the shards keep the quoting and line endings of the
+    file, and each shard starts with the file's header row. The original file is left in place.
+
+    :param file_path: The local path of the CSV or Parquet file
+    :param shard_size_bytes: The target size of each shard
+    :return: The local paths of the shards, or only file_path if the file is not larger than one shard
+    """
+    file_size: int = os.path.getsize(file_path)
+    if file_size <= shard_size_bytes:
+        return [file_path]
+
+    file_stem, file_extension = os.path.splitext(file_path)
+    shard_paths: list[str] = []
+    if file_extension == '.parquet':
+        parquet_file: pq.ParquetFile = pq.ParquetFile(file_path)
+        shard_count: int = math.ceil(file_size / shard_size_bytes)
+        rows_per_shard: int = max(1, math.ceil(parquet_file.metadata.num_rows / shard_count))
+        for batch in parquet_file.iter_batches(batch_size=rows_per_shard):
+            shard_path: str = f"{file_stem}.shard-{len(shard_paths) + 1:04d}{file_extension}"
+            pq.write_table(table=pa.Table.from_batches([batch], schema=parquet_file.schema_arrow), where=shard_path)
+            shard_paths.append(shard_path)
+        return shard_paths
+
+    shard_file = None
+    try:
+        with open(file_path, 'rb') as source:
+            header: bytes = source.readline()
+            while header.count(b'"') % 2 == 1:
+                line: bytes = source.readline()
+                if not line:
+                    break
+                header += line
+
+            in_quotes: bool = False
+            while block := source.read(SHARD_READ_BYTES):
+                start: int = 0
+                while start < len(block):
+                    if shard_file is None:
+                        shard_path = f"{file_stem}.shard-{len(shard_paths) + 1:04d}{file_extension}"
+                        shard_file = open(shard_path, 'wb')
+                        shard_paths.append(shard_path)
+                        shard_file.write(header)
+
+                    remaining_bytes: int = shard_size_bytes - shard_file.tell()
+                    if remaining_bytes >= len(block) - start:
+                        in_quotes ^= block.count(b'"', start) % 2 == 1
+                        shard_file.write(block[start:])
+                        break
+
+                    # Fill the shard to its target size, then end it with the rest of the record that crosses it
+                    split: int = start + max(remaining_bytes, 0)
+                    in_quotes ^= block.count(b'"', start, split) % 2 == 1
+                    boundary, in_quotes = find_record_boundary(block=block, start=split, in_quotes=in_quotes)
+                    end: int = boundary if boundary >= 0 else len(block)
+                    shard_file.write(block[start:end])
+                    start = end
+                    if boundary >= 0:
+                        shard_file.close()
+                        shard_file = None
+    finally:
+        if shard_file is not None:
+            shard_file.close()
+    return shard_paths
+
+
+def write_copy_manifest(object_storage_service: ObjectStorageService, file_path: str,
+                        transfer_pipeline: TransferPipeline) -> None:
+    """
+    Shards an extract file and uploads the shards with a COPY manifest listing them, next to the file. The manifest
+    has the name of the file with a .manifest extension. Its entries include the content length, which Redshift
+    requires for Parquet files.
+
+    :param object_storage_service: An instance of ObjectStorageService class
+    :param file_path: The local path of the extract file, which is also its object path
+    :param transfer_pipeline: The pipeline uploading the extract files
+    """
+    shard_paths: list[str] = write_file_shards(file_path=file_path,
+                                               shard_size_bytes=object_storage_service.shard_size_bytes)
+    entries: list[dict] = []
+    for shard_path in shard_paths:
+        shard_size: int = os.path.getsize(shard_path)
+        if shard_path != file_path:
+            transfer_pipeline.submit(payload_size=0,
+                                     transfer_function=upload_local_file,
+                                     object_storage_service=object_storage_service,
+                                     object_path=shard_path,
+                                     file_path=shard_path)
+        entries.append({'url': object_storage_service.get_object_url(shard_path),
+                        'mandatory': True,
+                        'meta': {'content_length': shard_size}})
+
+    manifest_path: str = f"{os.path.splitext(file_path)[0]}.manifest"
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump({'entries': entries}, manifest_file)
+    transfer_pipeline.submit(payload_size=0,
+                             transfer_function=upload_local_file,
+                             object_storage_service=object_storage_service,
+                             object_path=manifest_path,
+                             file_path=manifest_path)
+    log_message(log_level='Debug',
+                message=f'Wrote COPY manifest for {file_path} with {len(entries)} files')
+
+
+def process_tar_gz_member(raw_directory: str,
                           member: tarfile.TarInfo,
                           object_storage_service: ObjectStorageService,
-                          metadata_df: pd.DataFrame) -> None:
+                          metadata_df: pd.DataFrame,
+                          transfer_pipeline: TransferPipeline) -> None:
     try:
         log_message(log_level='Debug',
                     message=f'Processing TAR Member: {member.name}')
@@ -34,18 +187,19 @@ def process_tar_gz_member(tar: tarfile.TarFile,
         # Ensure the directory structure exists locally
         os.makedirs(os.path.dirname(extract_file_path), exist_ok=True)
 
-        # Process the file content
-        file_content: IO[bytes] = tar.extractfile(member)
+        # Process the file content, which was extracted from the archive to the raw directory
         is_first_chunk = True
 
-        with pd.read_csv(file_content, chunksize=100000) as reader:
+        with open(os.path.join(raw_directory, member.name), 'rb') as file_content, \
+                pd.read_csv(file_content, chunksize=100000) as reader:
             if member.name.endswith('.csv') and object_storage_service.convert_to_parquet:
                 extract_file_path = extract_file_path.replace('.csv', '.parquet')
                 os.makedirs(os.path.dirname(extract_file_path), exist_ok=True)
                 first_chunk = next(reader)
                 schema = get_pyarrow_schema(metadata_df=metadata_df,
                                             csv_df=first_chunk,
-                                            extract_name=member.name)
+                                            extract_name=member.name,
+                                            number_type=object_storage_service.parquet_number_type)
                 cleaned_first_chunk = clean_column_data_types(csv_df=first_chunk, schema=schema)
                 with pq.ParquetWriter(where=extract_file_path, schema=schema) as writer:
                     table: pa.Table = pa.Table.from_pandas(df=cleaned_first_chunk, schema=schema)
@@ -67,15 +221,25 @@ def process_tar_gz_member(tar: tarfile.TarFile,
                         # For all other chunks, append to the existing file without the header
                         chunk.to_csv(extract_file_path, mode='a', header=False, index=False)
 
-            # Upload file to Object Storage with the same directory structure
-            with open(extract_file_path, 'rb') as file:
-                object_storage_service.upload_object(object_path=extract_file_path, data=file)
+            # Upload file to Object Storage with the same directory structure. The upload runs on the transfer
+            # pipeline so the next member is converted while this one uploads. The file is streamed from disk rather
+            # than held in memory, so it is not counted against the pipeline's in-flight byte budget.
+            transfer_pipeline.submit(payload_size=0,
+                                     transfer_function=upload_local_file,
+                                     object_storage_service=object_storage_service,
+                                     object_path=extract_file_path,
+                                     file_path=extract_file_path)
 
+            if object_storage_service.shard_size_bytes > 0 and is_copied_file(member.name):
+                write_copy_manifest(object_storage_service=object_storage_service,
+                                    file_path=extract_file_path,
+                                    transfer_pipeline=transfer_pipeline)
 
     except Exception as e:
         log_message(log_level='Error',
                     message=f"Failed to process tar member {member.name}",
                     exception=e)
+        raise e
 
 
 def get_manifest_schema() -> pa.Schema:
@@ -101,7 +265,8 @@ def get_metadata_schema() -> pa.Schema:
     ])
 
 
-def get_pyarrow_schema(metadata_df: pd.DataFrame, csv_df: pd.DataFrame, extract_name: str) -> pa.Schema:
+def get_pyarrow_schema(metadata_df: pd.DataFrame, csv_df: pd.DataFrame, extract_name: str,
+                       number_type: str = 'inferred') -> pa.Schema:
     log_message('Debug', f"Generating schema for file: {extract_name}")
 
     # Filter metadata for the relevant table
@@ -114,20 +279,6 @@ def get_pyarrow_schema(metadata_df: pd.DataFrame, csv_df: pd.DataFrame, extract_
     normalized_extract_name = os.path.splitext(extract_name)[0].replace('/', '.')
     extract_metadata = metadata_df[metadata_df['extract'] == normalized_extract_name]
 
-    # Mapping from your metadata types to PyArrow types
-    type_mapping: Dict[str, Any] = {
-        'String': pa.string(),
-        'Number': pa.int64(),
-        'LongText': pa.large_string(),
-        'Date': pa.date32(),
-        'DateTime': pa.timestamp('ms', tz='UTC'),
-        'Relationship': pa.string(),
-        'MultiRelationship': pa.string(),
-        'Picklist': pa.string(),
-        'MultiPicklist': pa.string(),
-        'Boolean': pa.bool_()
-    }
-
     fields = []
     for column_name in csv_df.columns:
         # Find the metadata for the current column
@@ -135,7 +286,10 @@ def get_pyarrow_schema(metadata_df: pd.DataFrame, csv_df: pd.DataFrame, extract_
         if not column_meta.empty:
             meta_type = column_meta.iloc[0]['type']
 
-            if meta_type == 'Number':
+            if meta_type == 'Number' and number_type == 'double':
+                # Every file of the extract gets the same type, whether or not its values have decimals
+                pa_type = pa.float64()
+            elif meta_type == 'Number':
                 # Convert the column to numeric first
                 numeric_col = pd.to_numeric(csv_df[column_name], errors='coerce')
 
@@ -148,7 +302,7 @@ def get_pyarrow_schema(metadata_df: pd.DataFrame, csv_df: pd.DataFrame, extract_
                     pa_type = pa.int64()
             else:
                 # Use the standard mapping for all other types
-                pa_type = type_mapping.get(meta_type, pa.string())
+                pa_type = PARQUET_COLUMN_TYPES.get(meta_type, pa.string())
 
             fields.append(pa.field(column_name, pa_type))
         else:
@@ -215,12 +369,43 @@ def run(object_storage_service: ObjectStorageService):
                         metadata_df = pd.read_csv(BytesIO(file_content))
                         break
 
-                for member in tar.getmembers():
-                    process_tar_gz_member(metadata_df=metadata_df,
-                                          member=member,
-                                          tar=tar,
-                                          object_storage_service=object_storage_service)
-
+                # --- Second Pass: Convert and upload the members, largest first ---
+                # The archive is decompressed once into a temporary directory, so that members can be converted
+                # in parallel and in any order rather than in archive order.
+                with tempfile.TemporaryDirectory() as raw_directory, \
+                        TransferPipeline(max_in_flight_bytes=object_storage_service.transfer_max_in_flight_bytes,
+                                         worker_count=object_storage_service.transfer_workers) as transfer_pipeline:
+                    members: list[tarfile.TarInfo] = [member for member in tar.getmembers() if member.isfile()]
+                    unsafe_members: list[str] = [member.name for member in members
+                                                 if not is_within_directory(raw_directory, member.name)]
+                    if unsafe_members:
+                        raise Exception(f'Archive members outside the extract directory: {", ".join(unsafe_members)}')
+                    # The data filter also rejects unsafe members, on Python versions that have it
+                    extract_options: dict = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+                    tar.extractall(path=raw_directory, members=members, **extract_options)
+
+                    tasks: list[ScheduledTask] = [
+                        ScheduledTask(name=member.name,
+                                      function=process_tar_gz_member,
+                                      cost=estimate_table_cost(file_size_bytes=member.size),
+                                      raw_directory=raw_directory,
+                                      member=member,
+                                      object_storage_service=object_storage_service,
+                                      metadata_df=metadata_df,
+                                      transfer_pipeline=transfer_pipeline)
+                        for member in members
+                    ]
+                    TaskScheduler(worker_count=object_storage_service.transfer_workers,
+                                  worker_name='unzip').run(tasks=tasks)
+                    TaskScheduler.log_summary(tasks=tasks, description='Unzip')
+
+                    # Raise if a member could not be converted or uploaded, so that the data is not loaded from an
+                    # incomplete set of files
+                    failed_members: list[str] = [task.name for task in tasks if not task.succeeded]
+                    if failed_members:
+                        raise Exception(f'Failed to unzip {len(failed_members)} of {len(tasks)} members: '
+                                        f'{", ".join(failed_members)}')
+                    transfer_pipeline.results()
 
         except tarfile.TarError or gzip.BadGzipFile as e:
             if isinstance(tarfile.TarError, e):
@@ -232,3 +417,4 @@ def run(object_storage_service: ObjectStorageService):
         log_message(log_level='Error',
                     message=f'Errors encountered when unzipping direct data files',
                     exception=e)
+        raise e
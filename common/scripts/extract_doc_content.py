@@ -1,5 +1,4 @@
 import time
-import io
 from typing import Generator, List, Any
 
 from pandas import Series
@@ -12,6 +11,7 @@ from common.api.model.response.document_response import DocumentExportResponse
 from common.api.model.response.jobs_response import JobCreateResponse
 from common.api.model.response.vault_response import VaultResponse
 from common.api.request.document_request import DocumentRequest
+from common.transfer_pipeline import TransferPipeline
 from common.utilities import log_message
 import pandas as pd
 import pyarrow.parquet as pq
@@ -40,11 +40,12 @@ def run(object_storage_service: ObjectStorageService, vault_service: VaultServic
     log_message(log_level='Info',
                 message=f'Retrieving document version file from Object Storage')
 
-    # Check if the file exists in Object Storage
+    # Check if the file exists in Object Storage, using a single listing of the Document folder
+    object_storage_service.cache_object_listing(prefix=f"{starting_directory}/Document/")
     object_storage_service.check_if_object_exists(object_path=document_filepath)
 
     # Download the file from Object Storage to local
-    object_storage_service.download_object_to_local(object_path=document_filepath, output_path=document_filepath)
+    object_storage_service.download_cached_object_to_local(object_path=document_filepath, output_path=document_filepath)
 
     if file_extension == '.parquet':
         document_table = pq.read_table(document_filepath).to_pandas()
@@ -58,6 +59,10 @@ def run(object_storage_service: ObjectStorageService, vault_service: VaultServic
 
     document_batches = batch_document_list(document_version_list.tolist(), 10000)
 
+    transfer_pipeline: TransferPipeline = TransferPipeline(
+        max_in_flight_bytes=object_storage_service.transfer_max_in_flight_bytes,
+        worker_count=object_storage_service.transfer_workers)
+
     for i, batch_of_versions in enumerate(document_batches):
         try:
             request_string = []
@@ -99,9 +104,11 @@ def run(object_storage_service: ObjectStorageService, vault_service: VaultServic
                             file_staging_response: VaultResponse = vault_service.download_item_from_file_staging(exported_document=exported_document,
                                                                                                                  security_profile=security_profile)
                             filename: str = pyrfc6266.parse_filename(file_staging_response.headers.get("Content-Disposition"))
-                            object_storage_service.upload_object(
+                            transfer_pipeline.submit(
+                                payload_size=len(file_staging_response.binary_content),
+                                transfer_function=object_storage_service.upload_object,
                                 object_path=f'{direct_data_folder}/{exported_document.id}/{exported_document.major_version_number__v}_{exported_document.minor_version_number__v}/{filename}',
-                                data=io.BytesIO(file_staging_response.binary_content))
+                                data=file_staging_response.binary_content)
                     is_vault_job_finished = True
                 else:
                     log_message(log_level='Debug',
@@ -112,3 +119,6 @@ def run(object_storage_service: ObjectStorageService, vault_service: VaultServic
             log_message(log_level='Error',
                         message=f'Error when attempting to download document',
                         exception=e)
+
+    # Wait for the remaining document uploads to finish
+    transfer_pipeline.close()
@@ -1,3 +1,4 @@
+import io
 import os
 import sys
 
@@ -6,6 +7,7 @@ import pyarrow as pa
 
 from common.services.database_service import DatabaseService
 from common.services.object_storage_service import ObjectStorageService
+from common.task_scheduler import ScheduledTask, TaskScheduler, estimate_table_cost
 from common.utilities import log_message
 from common.utilities import update_table_name_that_starts_with_digit
 from common.utilities import convert_file_to_table
@@ -28,8 +30,8 @@ def handle_metadata_updates(object_storage_service: ObjectStorageService,
     object_storage_service.check_if_object_exists(object_path=metadata_updates_file_path)
 
     # Download the file from Object Storage to local
-    object_storage_service.download_object_to_local(object_path=metadata_updates_file_path,
-                                                    output_path=metadata_updates_file_path)
+    object_storage_service.download_cached_object_to_local(object_path=metadata_updates_file_path,
+                                                           output_path=metadata_updates_file_path)
 
     metadata_updates_table: pd.DataFrame | pa.Table = convert_file_to_table(file_path=metadata_updates_file_path,
                                                                             convert_to_parquet=database_service.convert_to_parquet)
@@ -70,6 +72,7 @@ def handle_metadata_updates(object_storage_service: ObjectStorageService,
                 database_service.db_connection.execute_query(f"""
                             ALTER TABLE {database_service.schema}.{table_name} {modify_column_statement}
                         """)
+                database_service.schema_catalog.refresh_table(database_service=database_service, table_name=table_name)
 
 
 def handle_metadata_deletes(object_storage_service: ObjectStorageService,
@@ -89,8 +92,8 @@ def handle_metadata_deletes(object_storage_service: ObjectStorageService,
     object_storage_service.check_if_object_exists(object_path=metadata_deletes_file_path)
 
     # Download the file from Object Storage to local
-    object_storage_service.download_object_to_local(object_path=metadata_deletes_file_path,
-                                                    output_path=metadata_deletes_file_path)
+    object_storage_service.download_cached_object_to_local(object_path=metadata_deletes_file_path,
+                                                           output_path=metadata_deletes_file_path)
 
     metadata_deletes_table: pd.DataFrame | pa.Table = convert_file_to_table(file_path=metadata_deletes_file_path,
                                                                             convert_to_parquet=database_service.convert_to_parquet)
@@ -149,21 +152,144 @@ def process_manifest_row(database_service: DatabaseService,
                               object_storage_service=object_storage_service,
                               extract_type=extract_type,
                               table_name=table_name,
-                              filename=filename)
+                              filename=filename,
+                              records=int(row["records"]))
+
+
+def estimate_manifest_row_cost(object_storage_service: ObjectStorageService,
+                               row: pd.Series,
+                               file_extension: str,
+                               column_counts: dict[str, int]) -> float:
+    # Estimate the cost of loading an extract from its record count, its file size in the object listing and its
+    # column count in the metadata, whichever are available
+    object_path: str = object_storage_service.get_relative_object_path(
+        filename=f"{os.path.splitext(row['file'])[0]}{file_extension}")
+    object_info: dict | None = object_storage_service.get_cached_object_info(object_path=object_path)
+    return estimate_table_cost(records=int(row["records"]),
+                               file_size_bytes=object_info['size'] if object_info else 0,
+                               column_count=column_counts.get(row["extract"], 0))
+
+
+def load_manifest_rows(database_service: DatabaseService,
+                       object_storage_service: ObjectStorageService,
+                       manifest_filtered_table: pd.DataFrame,
+                       extract_type: str,
+                       file_extension: str,
+                       metadata_table: pd.DataFrame | None = None):
+    # Each table is loaded by one of database_service.load_workers threads, each with its own database connection.
+    # The largest tables start first. A failed table is logged and reported in the summary without stopping the
+    # other tables.
+    column_counts: dict[str, int] = {}
+    if metadata_table is not None:
+        column_counts = metadata_table.groupby("extract").size().to_dict()
+
+    costs: dict[str, float] = {
+        row["extract"]: estimate_manifest_row_cost(object_storage_service=object_storage_service,
+                                                   row=row,
+                                                   file_extension=file_extension,
+                                                   column_counts=column_counts)
+        for _, row in manifest_filtered_table.iterrows()
+    }
+
+    if extract_type in ["full", "log"] and database_service.load_batch_size > 0:
+        load_manifest_rows_in_batches(database_service=database_service,
+                                      object_storage_service=object_storage_service,
+                                      manifest_filtered_table=manifest_filtered_table,
+                                      costs=costs)
+        return
+
+    database_service.run_manifest_tasks(
+        manifest_rows=manifest_filtered_table,
+        task_function=lambda worker_service, row: process_manifest_row(database_service=worker_service,
+                                                                      object_storage_service=object_storage_service,
+                                                                      row=row,
+                                                                      extract_type=extract_type),
+        description='Table load',
+        costs=costs)
+
+
+def load_table_batch(worker_context: DatabaseService, loads: list[tuple[str, str]]):
+    failed_tables: list[str] = worker_context.load_full_or_log_data_batch(loads=loads)
+    if failed_tables:
+        raise Exception(f'Failed to load {", ".join(failed_tables)}')
+
+
+def load_manifest_rows_in_batches(database_service: DatabaseService,
+                                  object_storage_service: ObjectStorageService,
+                                  manifest_filtered_table: pd.DataFrame,
+                                  costs: dict[str, float]):
+    # Tables are grouped into batches of load_batch_size, largest first. Each batch is loaded by one of the load
+    # workers, which runs the COPY statements of all its tables at once.
+    rows: list[pd.Series] = sorted((row for _, row in manifest_filtered_table.iterrows()),
+                                   key=lambda row: costs[row["extract"]], reverse=True)
+    batches: list[list[pd.Series]] = [rows[start:start + database_service.load_batch_size]
+                                      for start in range(0, len(rows), database_service.load_batch_size)]
+
+    tasks: list[ScheduledTask] = []
+    for batch_number, batch_rows in enumerate(batches, start=1):
+        loads: list[tuple[str, str]] = []
+        for row in batch_rows:
+            filename: str = row['file']
+            if database_service.convert_to_parquet:
+                filename = filename.replace(".csv", ".parquet")
+            loads.append((update_table_name_that_starts_with_digit(row["extract"].split(".")[1]),
+                          object_storage_service.get_full_object_path(filename=filename)))
+        tasks.append(ScheduledTask(name=f'{batch_number} of {len(batches)}',
+                                   function=load_table_batch,
+                                   cost=sum(costs[row["extract"]] for row in batch_rows),
+                                   loads=loads))
+
+    database_service.run_worker_tasks(tasks=tasks, description='Table load batch')
+    TaskScheduler.log_summary(tasks=tasks, description='Table load batch')
+
+
+def get_file_headers(database_service: DatabaseService,
+                     object_storage_service: ObjectStorageService,
+                     filename: str) -> list[str]:
+    relative_object_path: str = object_storage_service.get_relative_object_path(filename=filename)
+    if database_service.convert_to_parquet:
+        return object_storage_service.get_headers_from_parquet_file(object_path=relative_object_path)
+    return object_storage_service.get_headers_from_csv_file(object_path=relative_object_path)
+
+
+def load_small_change(database_service: DatabaseService,
+                      object_storage_service: ObjectStorageService,
+                      table_name: str,
+                      filename: str,
+                      records: int) -> bool:
+    # Small updates files are read locally and applied with parameterised statements, skipping the staging table and
+    # COPY. Returns False if the file is loaded with COPY instead.
+    relative_object_path: str = object_storage_service.get_relative_object_path(filename=filename)
+    object_info: dict | None = object_storage_service.get_cached_object_info(object_path=relative_object_path)
+    if not database_service.use_small_change_load(records=records,
+                                                  file_size_bytes=object_info['size'] if object_info else 0):
+        return False
+
+    data: bytes = object_storage_service.download_object_bytes(object_path=relative_object_path)
+    if database_service.convert_to_parquet:
+        changes: pd.DataFrame = pd.read_parquet(io.BytesIO(data))
+    else:
+        changes = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, na_values=[''])
+    return database_service.load_small_incremental_data(table_name=table_name, changes=changes)
 
 
 def load_data_into_tables(database_service: DatabaseService,
                           object_storage_service: ObjectStorageService,
                           extract_type: str,
                           table_name: str,
-                          filename: str):
+                          filename: str,
+                          records: int = 0):
+    if extract_type == "incremental" and load_small_change(database_service=database_service,
+                                                           object_storage_service=object_storage_service,
+                                                           table_name=table_name,
+                                                           filename=filename,
+                                                           records=records):
+        return
+
     full_object_path: str = object_storage_service.get_full_object_path(filename=filename)
-    relative_object_path: str = object_storage_service.get_relative_object_path(filename=filename)
-    headers: list[str] | None = None
-    if database_service.convert_to_parquet:
-        headers = object_storage_service.get_headers_from_parquet_file(object_path=relative_object_path)
-    else:
-        headers = object_storage_service.get_headers_from_csv_file(object_path=relative_object_path)
+    headers: list[str] = get_file_headers(database_service=database_service,
+                                          object_storage_service=object_storage_service,
+                                          filename=filename)
 
     if extract_type in ["full", "log"]:
         database_service.load_full_or_log_data(table_name=table_name,
@@ -175,6 +301,76 @@ def load_data_into_tables(database_service: DatabaseService,
                                                headers=headers)
 
 
+def get_combined_change_extracts(database_service: DatabaseService, manifest_table: pd.DataFrame) -> list[str]:
+    # Extracts with both updates and deletes in this incremental, which combine_incremental_changes applies with a
+    # single MERGE. Metadata changes are handled separately by handle_metadata_changes.
+    if not database_service.combine_incremental_changes:
+        return []
+
+    changed_rows: pd.DataFrame = manifest_table[
+        (manifest_table["records"] > 0)
+        & ~manifest_table["extract"].str.split(".").str[1].str.contains("metadata")]
+    change_types: pd.Series = changed_rows.groupby("extract")["type"].agg(set)
+    return [extract for extract, types in change_types.items() if {"updates", "deletes"} <= types]
+
+
+def get_changed_tables(manifest_table: pd.DataFrame) -> list[str]:
+    # Tables with updates or deletes in this incremental, excluding the metadata
+    changed_extracts: pd.Series = manifest_table.loc[manifest_table["records"] > 0, "extract"]
+    table_names: set[str] = {update_table_name_that_starts_with_digit(extract.split(".")[1].replace("_deletes", ""))
+                             for extract in changed_extracts}
+    return sorted(table_name for table_name in table_names if "metadata" not in table_name)
+
+
+def process_change_manifest_row(database_service: DatabaseService,
+                                object_storage_service: ObjectStorageService,
+                                row: pd.Series,
+                                deletes_row: pd.Series):
+    table_name: str = update_table_name_that_starts_with_digit(row["extract"].split(".")[1])
+    filename: str = row['file']
+    deletes_filename: str = deletes_row['file']
+    if database_service.convert_to_parquet:
+        filename = filename.replace(".csv", ".parquet")
+        deletes_filename = deletes_filename.replace(".csv", ".parquet")
+
+    database_service.apply_table_changes(
+        table_name=table_name,
+        updates_object_path=object_storage_service.get_full_object_path(filename=filename),
+        deletes_object_path=object_storage_service.get_full_object_path(filename=deletes_filename),
+        headers=get_file_headers(database_service=database_service,
+                                 object_storage_service=object_storage_service,
+                                 filename=filename),
+        deletes_row=deletes_row,
+        starting_directory=f"{object_storage_service.direct_data_folder}/{object_storage_service.extract_folder}")
+
+
+def apply_combined_changes(database_service: DatabaseService,
+                           object_storage_service: ObjectStorageService,
+                           manifest_table: pd.DataFrame,
+                           combined_extracts: list[str]):
+    # Each table's updates and deletes are applied together on the load workers, largest change set first
+    combined_rows: pd.DataFrame = manifest_table[manifest_table["extract"].isin(combined_extracts)]
+    updates_rows: pd.DataFrame = combined_rows[combined_rows["type"] == "updates"]
+    deletes_rows: pd.DataFrame = combined_rows[combined_rows["type"] == "deletes"]
+    deletes_by_extract: dict[str, pd.Series] = {row["extract"]: row for _, row in deletes_rows.iterrows()}
+
+    costs: dict[str, float] = {
+        row["extract"]: estimate_table_cost(
+            records=int(row["records"]) + int(deletes_by_extract[row["extract"]]["records"]))
+        for _, row in updates_rows.iterrows()
+    }
+
+    database_service.run_manifest_tasks(
+        manifest_rows=updates_rows,
+        task_function=lambda worker_service, row: process_change_manifest_row(
+            database_service=worker_service,
+            object_storage_service=object_storage_service,
+            row=row,
+            deletes_row=deletes_by_extract[row["extract"]]),
+        description='Table change',
+        costs=costs)
+
+
 def run(object_storage_service: ObjectStorageService, database_service: DatabaseService, direct_data_params: dict):
     log_message(log_level='Info',
                 message=f'---Executing load_data.py---')
@@ -185,6 +381,9 @@ def run(object_storage_service: ObjectStorageService, database_service: Database
         database_service.db_connection.activate_cursor()
         database_service.check_if_schema_exists()
 
+        # List the extract once so that existence checks are served from the listing cache
+        object_storage_service.cache_object_listing(prefix=f"{starting_directory}/")
+
         file_extension: str = '.csv'
         if database_service.convert_to_parquet:
             file_extension = '.parquet'
@@ -192,12 +391,14 @@ def run(object_storage_service: ObjectStorageService, database_service: Database
         # Retrieve the Manifest File from Object Storage
         manifest_filepath: str = f"{starting_directory}/manifest{file_extension}"
         object_storage_service.check_if_object_exists(object_path=manifest_filepath)
-        object_storage_service.download_object_to_local(object_path=manifest_filepath, output_path=manifest_filepath)
+        object_storage_service.download_cached_object_to_local(object_path=manifest_filepath, output_path=manifest_filepath)
 
         # Convert the manifest file to a table
         manifest_table: pd.DataFrame | pa.Table = convert_file_to_table(file_path=manifest_filepath,
                                                                         convert_to_parquet=database_service.convert_to_parquet)
 
+        metadata_table: pd.DataFrame | None = None
+        combined_extracts: list[str] = []
         if extract_type in ["full", "log"]:
             # Retrieve the Metadata File from Object Storage
             metadata_filepath: str = (
@@ -206,11 +407,11 @@ def run(object_storage_service: ObjectStorageService, database_service: Database
                 else f"{starting_directory}/metadata_full{file_extension}"
             )
             object_storage_service.check_if_object_exists(object_path=metadata_filepath)
-            object_storage_service.download_object_to_local(metadata_filepath, metadata_filepath)
+            object_storage_service.download_cached_object_to_local(metadata_filepath, metadata_filepath)
 
             # Convert the metadata file to a table
-            metadata_table: pd.DataFrame | pa.Table = convert_file_to_table(file_path=metadata_filepath,
-                                                                            convert_to_parquet=database_service.convert_to_parquet)
+            metadata_table = convert_file_to_table(file_path=metadata_filepath,
+                                                   convert_to_parquet=database_service.convert_to_parquet)
 
             # Create all tables in the database
             database_service.create_all_tables(starting_directory=starting_directory, metadata_table=metadata_table)
@@ -220,20 +421,33 @@ def run(object_storage_service: ObjectStorageService, database_service: Database
             handle_metadata_changes(object_storage_service=object_storage_service,
                                     database_service=database_service,
                                     manifest_table=manifest_table)
-            database_service.delete_data_from_table(starting_directory=starting_directory,
-                                                    manifest_table=manifest_table)
+            combined_extracts = get_combined_change_extracts(database_service=database_service,
+                                                             manifest_table=manifest_table)
+            database_service.delete_data_from_table(
+                starting_directory=starting_directory,
+                manifest_table=manifest_table[~manifest_table["extract"].isin(combined_extracts)])
+            apply_combined_changes(database_service=database_service,
+                                   object_storage_service=object_storage_service,
+                                   manifest_table=manifest_table,
+                                   combined_extracts=combined_extracts)
 
         manifest_filtered_table = manifest_table[
-            (manifest_table["type"] == "updates") & (manifest_table["records"] > 0)]
+            (manifest_table["type"] == "updates") & (manifest_table["records"] > 0)
+            & ~manifest_table["extract"].isin(combined_extracts)]
 
-        for _, row in manifest_filtered_table.iterrows():
-            process_manifest_row(database_service=database_service,
-                                 object_storage_service=object_storage_service,
-                                 row=row,
-                                 extract_type=extract_type)
+        load_manifest_rows(database_service=database_service,
+                           object_storage_service=object_storage_service,
+                           manifest_filtered_table=manifest_filtered_table,
+                           extract_type=extract_type,
+                           file_extension=file_extension,
+                           metadata_table=metadata_table)
+
+        if extract_type == "incremental":
+            database_service.maintain_changed_tables(table_names=get_changed_tables(manifest_table=manifest_table))
 
         database_service.db_connection.close_cursor()
         database_service.db_connection.close()
+        database_service.close_connection_pool()
 
     except Exception as e:
         log_message(log_level='Error',
@@ -1,5 +1,4 @@
 from typing import Generator, List, Any
-import io
 
 import pandas as pd
 import pyarrow.parquet as pq
@@ -8,6 +7,7 @@ from pandas import DataFrame
 from common.api.model.response.vault_response import VaultResponse
 from common.services.object_storage_service import ObjectStorageService
 from common.services.vault_service import VaultService
+from common.transfer_pipeline import TransferPipeline
 from common.utilities import log_message
 
 
@@ -34,11 +34,12 @@ def run(object_storage_service: ObjectStorageService, vault_service: VaultServic
     log_message(log_level='Info',
                 message=f'Retrieving document version file from Object Storage')
 
-    # Check if the file exists in Object Storage
+    # Check if the file exists in Object Storage, using a single listing of the Document folder
+    object_storage_service.cache_object_listing(prefix=f"{starting_directory}/Document/")
     object_storage_service.check_if_object_exists(object_path=document_filepath)
 
     # Download the file from Object Storage to local
-    object_storage_service.download_object_to_local(object_path=document_filepath, output_path=document_filepath)
+    object_storage_service.download_cached_object_to_local(object_path=document_filepath, output_path=document_filepath)
 
     if file_extension == '.parquet':
         document_table = pq.read_table(document_filepath).to_pandas()
@@ -57,6 +58,10 @@ def run(object_storage_service: ObjectStorageService, vault_service: VaultServic
 
     document_batches: Generator[List] = batch_document_list(document_list_for_batching, 10000)
 
+    transfer_pipeline: TransferPipeline = TransferPipeline(
+        max_in_flight_bytes=object_storage_service.transfer_max_in_flight_bytes,
+        worker_count=object_storage_service.transfer_workers)
+
     for i, batch_of_doc_versions in enumerate(document_batches):
         try:
             for doc_version in batch_of_doc_versions:
@@ -74,10 +79,15 @@ def run(object_storage_service: ObjectStorageService, vault_service: VaultServic
                                         f' - Skipping to next document',)
                     continue
                 object_path: str = f'{direct_data_folder}/{doc_id}/{major_version}_{minor_version}/{doc_version["name__v"]}.txt'
-                object_storage_service.upload_object(object_path=object_path,
-                                                     data=io.BytesIO(download_text_response.binary_content))
+                transfer_pipeline.submit(payload_size=len(download_text_response.binary_content),
+                                         transfer_function=object_storage_service.upload_object,
+                                         object_path=object_path,
+                                         data=download_text_response.binary_content)
 
         except Exception as e:
             log_message(log_level='Error',
                         message=f'Error when attempting to download document text',
                         exception=e)
+
+    # Wait for the remaining document text uploads to finish
+    transfer_pipeline.close()
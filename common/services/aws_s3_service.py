@@ -2,13 +2,17 @@ import io
 import json
 import csv
 import os
+import threading
 import time
 from typing import BinaryIO
 
 import pyarrow.parquet as pq
 import pyarrow.fs
 
+import botocore.session
 from botocore.client import BaseClient
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
 from botocore.response import StreamingBody
 
 from common.services.object_storage_service import ObjectStorageService
@@ -17,28 +21,91 @@ import boto3
 from botocore.exceptions import ClientError
 from common.utilities import log_message
 
+# Credentials are refreshed ahead of expiry so that botocore's advisory refresh window always receives new credentials
+CREDENTIAL_REFRESH_MARGIN_SECONDS: int = 15 * 60
+
+
+class AssumeRoleCredentialProvider(CredentialProvider):
+    """
+    Credential provider that resolves to refreshable credentials obtained by assuming the configured IAM role.
+    """
+    METHOD = 'direct-data-assume-role'
+    CANONICAL_NAME = 'DirectDataAssumeRole'
+
+    def __init__(self, refresh_using):
+        super().__init__()
+        self.refresh_using = refresh_using
+
+    def load(self) -> RefreshableCredentials:
+        return RefreshableCredentials.create_from_metadata(
+            metadata=self.refresh_using(),
+            refresh_using=self.refresh_using,
+            method='sts-assume-role'
+        )
+
 
 class AwsS3Service(ObjectStorageService):
+    _s3_clients: dict[tuple[str, str | None], BaseClient] = {}
+    _s3_clients_lock: threading.Lock = threading.Lock()
+    _sts_clients: dict[str | None, BaseClient] = {}
+    _sts_clients_lock: threading.Lock = threading.Lock()
+
     def __init__(self, parameters: dict):
         super().__init__(parameters=parameters)
         self.iam_role_arn: str = parameters['iam_role_arn']
         self.bucket_name: str = parameters['bucket_name']
-        self.credentials: dict = self.retrieve_credentials(step='retrieve')
-        self.s3_client: BaseClient = boto3.client(
-            's3',
-            aws_access_key_id=self.credentials['AccessKeyId'],
-            aws_secret_access_key=self.credentials['SecretAccessKey'],
-            aws_session_token=self.credentials['SessionToken']
-        )
+        self.region_name: str | None = parameters.get('region_name')
+        self.max_pool_connections: int = int(parameters.get('max_pool_connections', 50))
+        self.s3_client: BaseClient = self.get_s3_client()
+
+    def get_s3_client(self) -> BaseClient:
+        """
+        Returns the S3 client shared by every service assuming the same role in the same region. The client is backed
+        by refreshable credentials, so the role is re-assumed shortly before the session credentials expire, and it is
+        safe to share across worker threads, which then reuse a single connection pool.
+        """
+        client_key: tuple[str, str | None] = (self.iam_role_arn, self.region_name)
+        with AwsS3Service._s3_clients_lock:
+            s3_client: BaseClient | None = AwsS3Service._s3_clients.get(client_key)
+            if s3_client is None:
+                botocore_session: botocore.session.Session = botocore.session.get_session()
+                botocore_session.register_component(
+                    'credential_provider',
+                    CredentialResolver(providers=[AssumeRoleCredentialProvider(refresh_using=self._refresh_credentials)])
+                )
+
+                s3_client = boto3.Session(botocore_session=botocore_session).client(
+                    's3',
+                    region_name=self.region_name,
+                    config=Config(max_pool_connections=self.max_pool_connections)
+                )
+                AwsS3Service._s3_clients[client_key] = s3_client
+            return s3_client
+
+    def _refresh_credentials(self) -> dict:
+        """
+        Assumes the IAM role and returns the credentials in the format expected by botocore's RefreshableCredentials.
+        """
+        credentials: dict = self.retrieve_credentials(step='retrieve')
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat()
+        }
 
     def retrieve_credentials(self, step: str) -> dict:
-        sts_client = boto3.client('sts')
+        with AwsS3Service._sts_clients_lock:
+            sts_client: BaseClient | None = AwsS3Service._sts_clients.get(self.region_name)
+            if sts_client is None:
+                sts_client = boto3.client('sts', region_name=self.region_name)
+                AwsS3Service._sts_clients[self.region_name] = sts_client
 
         if self.credentials:
             current_time = time.time()
             expiration_time = self.credentials['Expiration'].timestamp()
 
-            if current_time < expiration_time:
+            if current_time < expiration_time - CREDENTIAL_REFRESH_MARGIN_SECONDS:
                 return self.credentials
 
         try:
@@ -59,6 +126,11 @@ class AwsS3Service(ObjectStorageService):
     def check_if_object_exists(self, object_path: str):
         log_message(log_level='Debug',
                     message=f'Checking if object exists: {self.bucket_name}/{object_path}')
+        if self.get_cached_object_info(object_path=object_path) is not None:
+            log_message(log_level='Info',
+                        message=f'Object exists in cached listing: {self.bucket_name}/{object_path}')
+            return
+
         try:
             self.s3_client.head_object(Bucket=self.bucket_name, Key=object_path)
             log_message(log_level='Info',
@@ -70,21 +142,58 @@ class AwsS3Service(ObjectStorageService):
                             exception=e)
             raise e
 
+    def get_object_info(self, object_path: str) -> dict:
+        log_message(log_level='Debug',
+                    message=f'Retrieving object info for {self.bucket_name}/{object_path}')
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_path)
+            return {
+                'size': response['ContentLength'],
+                'etag': response['ETag'].strip('"'),
+                'last_modified': response['LastModified']
+            }
+        except ClientError as e:
+            log_message(log_level='Error',
+                        message=f'Error retrieving object info for {self.bucket_name}/{object_path}',
+                        exception=e)
+            raise e
+
+    def list_objects(self, prefix: str) -> dict[str, dict]:
+        log_message(log_level='Debug',
+                    message=f'Listing objects in {self.bucket_name}/{prefix}')
+        try:
+            listed_objects: dict[str, dict] = {}
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for s3_object in page.get('Contents', []):
+                    listed_objects[s3_object['Key']] = {
+                        'size': s3_object['Size'],
+                        'etag': s3_object['ETag'].strip('"'),
+                        'last_modified': s3_object['LastModified']
+                    }
+            log_message(log_level='Info',
+                        message=f'Listed {len(listed_objects)} objects in {self.bucket_name}/{prefix}')
+            return listed_objects
+        except ClientError as e:
+            log_message(log_level='Error',
+                        message=f'Error listing objects in {self.bucket_name}/{prefix}',
+                        exception=e)
+            raise e
 
-    def upload_object(self, object_path: str, data: BinaryIO) -> None:
+    def upload_object(self, object_path: str, data: bytes | bytearray | memoryview | BinaryIO) -> None:
         """
         Uploads an object to the specified S3 bucket using a memory-efficient,
         multipart-capable method.
 
         :param object_path: Path to the object in the storage.
-        :param data: The binary stream (file-like object) to be uploaded.
+        :param data: The binary stream (file-like object) or in-memory buffer to be uploaded.
         :return: None on success. Raises ClientError on failure.
         """
         log_message(log_level='Debug',
                     message=f'Uploading to {self.bucket_name}/{object_path}')
         try:
             self.s3_client.upload_fileobj(
-                Fileobj=data,
+                Fileobj=self.as_readable(data),
                 Bucket=self.bucket_name,
                 Key=object_path
             )
@@ -112,13 +221,16 @@ class AwsS3Service(ObjectStorageService):
                         exception=e)
             raise e
 
-    def upload_part(self, object_path: str, multipart_upload_response: dict, part_number: int, data: bytes) -> dict:
+    def upload_part(self, object_path: str, multipart_upload_response: dict, part_number: int,
+                    data: bytes | bytearray | memoryview, part_size: int | None = None) -> dict:
         log_message(log_level='Debug',
                     message=f'Uploading part {part_number} to bucket: {self.bucket_name} and directory: {object_path}')
         try:
             response = self.s3_client.upload_part(Bucket=self.bucket_name,
                                                   Key=object_path,
-                                                  Body=data,
+                                                  Body=self.as_readable(data),
+                                                  ContentLength=part_size if part_size is not None
+                                                  else self.payload_size(data),
                                                   UploadId=multipart_upload_response['UploadId'],
                                                   PartNumber=part_number)
             log_message(log_level='Info',
@@ -214,6 +326,13 @@ class AwsS3Service(ObjectStorageService):
         """
         return f"s3://{self.bucket_name}/{self.get_relative_object_path(filename)}"
 
+    def get_object_url(self, object_path: str) -> str:
+        """
+        Constructs the S3 URL of an object from its key.
+        :param object_path: The key of the object in the S3 bucket.
+        """
+        return f"s3://{self.bucket_name}/{object_path}"
+
     def get_relative_object_path(self, filename: str) -> str:
         """
         Constructs the S3 object URL for a given filename.
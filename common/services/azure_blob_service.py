@@ -2,6 +2,7 @@ import io
 import csv
 import os
 from io import BytesIO
+from typing import BinaryIO
 
 from azure.common import AzureException
 
@@ -66,6 +67,11 @@ class AzureBlobService(ObjectStorageService):
     def check_if_object_exists(self, object_path: str):
         log_message(log_level='Debug',
                     message=f'Checking if object exists: {self.container}/{object_path}')
+        if self.get_cached_object_info(object_path=object_path) is not None:
+            log_message(log_level='Info',
+                        message=f'Object exists in cached listing: {self.container}/{object_path}')
+            return
+
         try:
             blob_client: BlobClient = self.get_blob_client(blob_name=object_path)
             exists: bool = blob_client.exists()
@@ -79,13 +85,50 @@ class AzureBlobService(ObjectStorageService):
                         exception=e)
             raise e
 
+    def get_object_info(self, object_path: str) -> dict:
+        log_message(log_level='Debug',
+                    message=f'Retrieving blob properties for {self.container}/{object_path}')
+        try:
+            blob_properties = self.get_blob_client(blob_name=object_path).get_blob_properties()
+            return {
+                'size': blob_properties.size,
+                'etag': blob_properties.etag.strip('"'),
+                'last_modified': blob_properties.last_modified
+            }
+        except Exception as e:
+            log_message(log_level='Error',
+                        message=f'Error retrieving blob properties for {self.container}/{object_path}',
+                        exception=e)
+            raise e
 
-    def upload_object(self, object_path: str, data) -> dict:
+    def list_objects(self, prefix: str) -> dict[str, dict]:
+        log_message(log_level='Debug',
+                    message=f'Listing blobs in {self.container}/{prefix}')
+        try:
+            listed_objects: dict[str, dict] = {}
+            blob_pages = self.get_container_client().list_blobs(name_starts_with=prefix).by_page()
+            for page in blob_pages:
+                for blob in page:
+                    listed_objects[blob.name] = {
+                        'size': blob.size,
+                        'etag': blob.etag.strip('"'),
+                        'last_modified': blob.last_modified
+                    }
+            log_message(log_level='Info',
+                        message=f'Listed {len(listed_objects)} blobs in {self.container}/{prefix}')
+            return listed_objects
+        except Exception as e:
+            log_message(log_level='Error',
+                        message=f'Error listing blobs in {self.container}/{prefix}',
+                        exception=e)
+            raise e
+
+    def upload_object(self, object_path: str, data: bytes | bytearray | memoryview | BinaryIO) -> dict:
         log_message(log_level='Debug',
                     message=f'Uploading to {self.container}/{object_path}')
         try:
             blob_client: BlobClient = self.get_blob_client(blob_name=object_path)
-            response: dict = blob_client.upload_blob(data=data, overwrite=True)
+            response: dict = blob_client.upload_blob(data=self.as_readable(data), overwrite=True)
             log_message(log_level='Info',
                         message=f'Uploaded successfully to {self.container}/{blob_client.blob_name}')
             return response
@@ -100,13 +143,16 @@ class AzureBlobService(ObjectStorageService):
                     message=f'Initiating multipart upload not required for Azure Blob')
         return {}
 
-    def upload_part(self, object_path: str, multipart_upload_response: dict, part_number: int, data: bytes) -> dict:
+    def upload_part(self, object_path: str, multipart_upload_response: dict, part_number: int,
+                    data: bytes | bytearray | memoryview, part_size: int | None = None) -> dict:
         log_message(log_level='Debug',
                     message=f'Staging block with ID: {part_number}')
         try:
             blob_client: BlobClient = self.get_blob_client(blob_name=object_path)
             response: dict = blob_client.stage_block(block_id=part_number,
-                                                     data=data,
+                                                     data=self.as_readable(data),
+                                                     length=part_size if part_size is not None
+                                                     else self.payload_size(data),
                                                      connection_timeout=3600)
             log_message(log_level='Info',
                         message=f'Staged block with ID: {part_number} successfully', )
@@ -197,6 +243,14 @@ class AzureBlobService(ObjectStorageService):
         """
         return f"{self.account_url}{self.container}/{self.get_relative_object_path(filename)}"
 
+    def get_object_url(self, object_path: str) -> str:
+        """
+        Constructs the URL of a blob from its name.
+        :param object_path: The name of the blob in the container.
+        :return: Blob URL in the format 'account_url/container/object_path'.
+        """
+        return f"{self.account_url}{self.container}/{object_path}"
+
     def get_relative_object_path(self, filename: str) -> str:
         """
         Constructs the relative object path for a file within the Azure Blob Storage container.
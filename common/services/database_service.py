@@ -1,26 +1,267 @@
+import copy
+import time
+from datetime import date, datetime
+from decimal import Decimal
 from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager, nullcontext
+from typing import Any, Callable
+
+from common.connections.connection_pool import ConnectionPool
 from common.connections.database_connection import DatabaseConnection
+from common.services.schema_catalog import SchemaCatalog
+from common.task_scheduler import ScheduledTask, TaskScheduler, estimate_table_cost
+from common.utilities import log_message, update_table_name_that_starts_with_digit
 
 import pandas as pd
 from pandas import DataFrame
 
+# Columns that identify a row of a Direct Data table, by table name. Tables not listed are identified by id.
+PRIMARY_KEYS: dict[str, list[str]] = {
+    'metadata': ["extract", "column_name"],
+    'picklist__sys': ["object", "object_field", "picklist_value_name"],
+}
+DEFAULT_PRIMARY_KEYS: list[str] = ["id"]
+
+# Maximum rows in one multi-row VALUES list of a small change statement
+SMALL_CHANGE_ROWS_PER_STATEMENT: int = 1000
+
+# Flags each staged row of a combined change MERGE as an update ('U') or a delete ('D')
+CHANGE_OPERATION_COLUMN: str = 'change_op'
+
 
 class DatabaseService(ABC):
+    # Set by services that can apply a table's updates and deletes with a single MERGE statement
+    supports_combined_changes: bool = False
+    # How the target quotes identifiers in generated statements
+    quoted_identifier_format: str = '"{}"'
+    # Set by services whose target supports DELETE ... USING, which joins the target table to the delete keys
+    supports_delete_using: bool = False
+    # Appended to the column definitions of the picklist table. None for targets without primary key constraints.
+    picklist_primary_key_constraint: str | None = \
+        'CONSTRAINT picklist_primary_key PRIMARY KEY (object, object_field, picklist_value_name)'
+    # Set by services whose target accepts MERGE ... USING (VALUES ...) AS source (columns). Other targets apply
+    # small changes by deleting the changed keys and inserting the rows.
+    supports_values_merge: bool = False
+    # Set by services that can load a batch of tables with concurrently running COPY statements
+    supports_batched_loads: bool = False
+
     def __init__(self, parameters: dict):
         self.convert_to_parquet: bool = parameters.get('convert_to_parquet', False)
         self.object_storage_root: str = parameters.get('object_storage_root', '')
         self.schema: str = parameters.get('schema', '')
         self.db_connection: DatabaseConnection | None = None
+        self.load_workers: int = int(parameters.get('load_workers', 4))
+        self.connection_pool_min_size: int = int(parameters.get('connection_pool_min_size', 1))
+        self.connection_pool_max_size: int = int(parameters.get('connection_pool_max_size', self.load_workers))
+        self.connection_idle_timeout_seconds: float = float(parameters.get('connection_idle_timeout_seconds', 300))
+        self.ddl_batch_size: int = int(parameters.get('ddl_batch_size', 100))
+        self.delete_batch_size: int = int(parameters.get('delete_batch_size', 0))
+        self.delete_batch_retries: int = int(parameters.get('delete_batch_retries', 3))
+        self.small_change_max_records: int = int(parameters.get('small_change_max_records', 0))
+        self.small_change_max_bytes: int = int(parameters.get('small_change_max_bytes', 1024 * 1024))
+        self.load_batch_size: int = int(parameters.get('load_batch_size', 0)) if self.supports_batched_loads else 0
+        self.combine_incremental_changes: bool = (bool(parameters.get('combine_incremental_changes', False))
+                                                  and self.supports_combined_changes)
+        self.connection_pool: ConnectionPool | None = None
+        self.schema_catalog: SchemaCatalog = SchemaCatalog()
 
     @abstractmethod
     def get_connection(self):
         pass
 
+    def get_connection_pool(self) -> ConnectionPool:
+        """
+        Returns the pool of connections shared by the worker services, creating it on first use. The pool keeps
+        connections warm between stages, e.g. from deletes to loads, so workers do not reconnect for each stage.
+        """
+        if self.connection_pool is None:
+            self.connection_pool = ConnectionPool(connection_factory=self.get_connection,
+                                                  min_size=self.connection_pool_min_size,
+                                                  max_size=max(self.connection_pool_max_size, self.load_workers),
+                                                  idle_timeout_seconds=self.connection_idle_timeout_seconds)
+        return self.connection_pool
+
+    def close_connection_pool(self):
+        """
+        Closes the pooled connections once all stages have finished.
+        """
+        if self.connection_pool is not None:
+            self.connection_pool.close()
+
+    def open_worker_service(self) -> 'DatabaseService':
+        """
+        Returns a copy of this service with a connection checked out from the connection pool, so that a worker thread
+        can run queries concurrently with other workers. The copy shares all other configuration with this service.
+        """
+        worker_service: DatabaseService = copy.copy(self)
+        worker_service.db_connection = self.get_connection_pool().acquire()
+        return worker_service
+
+    def close_worker_service(self, worker_service: 'DatabaseService'):
+        """
+        Returns the connection of a service created by open_worker_service to the connection pool.
+        """
+        self.get_connection_pool().release(connection=worker_service.db_connection)
+
+    def run_worker_tasks(self, tasks: list[ScheduledTask], description: str) -> list[ScheduledTask]:
+        """
+        Runs tasks on load_workers threads, each with its own worker service passed as worker_context. The most
+        expensive tasks start first.
+
+        :param tasks: The tasks to run. Each task function is called as function(worker_context=..., **kwargs)
+        :param description: What the tasks do, used to name the worker threads, e.g. 'Table delete'
+        :return: The completed tasks
+        """
+        if not tasks:
+            return tasks
+
+        # Create the pool before the workers start so that every worker service shares it
+        self.get_connection_pool().prefill()
+        scheduler: TaskScheduler = TaskScheduler(worker_count=self.load_workers,
+                                                 worker_name=description.lower().replace(' ', '-'),
+                                                 initialize_worker=self.open_worker_service,
+                                                 finalize_worker=self.close_worker_service)
+        return scheduler.run(tasks=tasks)
+
+    def run_manifest_tasks(self, manifest_rows: pd.DataFrame, task_function: Callable, description: str,
+                           costs: dict[str, float] | None = None) -> list[ScheduledTask]:
+        """
+        Runs a task for each manifest row on load_workers threads, each with its own worker service. The largest
+        extracts start first. Failures are logged per extract and summarized once all tasks have finished.
+
+        :param manifest_rows: The manifest rows to process
+        :param task_function: Called as task_function(worker_service, row) for each row
+        :param description: What the tasks do, used in the summary, e.g. 'Table delete'
+        :param costs: Optional cost per extract. Defaults to an estimate from the manifest record count
+        :return: The completed tasks
+        """
+        tasks: list[ScheduledTask] = [
+            ScheduledTask(name=row["extract"],
+                          function=lambda worker_context, row: task_function(worker_context, row),
+                          cost=(costs or {}).get(row["extract"], estimate_table_cost(records=int(row["records"]))),
+                          row=row)
+            for _, row in manifest_rows.iterrows()
+        ]
+        if not tasks:
+            return tasks
+
+        self.run_worker_tasks(tasks=tasks, description=description)
+        TaskScheduler.log_summary(tasks=tasks, description=description)
+        return tasks
+
     @staticmethod
     @abstractmethod
     def create_sql_str_column_definitions(table_df: DataFrame, is_picklist: bool = False, is_modify: bool = False, is_add: bool = False) -> str:
         pass
 
+    @staticmethod
+    @abstractmethod
+    def create_column_definitions(table_df: DataFrame) -> pd.Series:
+        """
+        Maps every metadata row to its column definition in a single vectorised pass, e.g. '"name__v" VARCHAR()'.
+
+        :param table_df: A DataFrame containing column details (column_name, type, length)
+        :return: The column definitions, with the same index as table_df
+        """
+        pass
+
+    @abstractmethod
+    def create_table_statement(self, table_name: str, column_definitions: str) -> str:
+        """
+        Returns the statement that creates a table if it does not exist yet.
+
+        :param table_name: The table name
+        :param column_definitions: The column definitions, as returned by create_sql_str_column_definitions
+        """
+        pass
+
+    def compile_table_definitions(self, metadata_table: pd.DataFrame) -> dict[str, str]:
+        """
+        Compiles the column definitions of every table in the metadata. The types of all columns are mapped in one
+        vectorised pass and grouped by extract, instead of filtering the metadata once per table.
+
+        :param metadata_table: The metadata of all extracts
+        :return: The column definitions of each table by table name, in metadata order
+        """
+        table_metadata: DataFrame = metadata_table.copy()
+        # Vault allows 255 characters for description__sys, but the extract metadata defines a length of 128.
+        security_policy_description: pd.Series = (
+                (table_metadata["extract"] == "Object.security_policy__sys")
+                & (table_metadata["column_name"] == "description__sys"))
+        table_metadata.loc[security_policy_description, ["type", "length"]] = ["String", 255]
+
+        table_metadata["column_definition"] = self.create_column_definitions(table_df=table_metadata)
+        extract_definitions: pd.Series = (table_metadata.groupby("extract", sort=False)["column_definition"]
+                                          .agg(", ".join))
+
+        table_definitions: dict[str, str] = {}
+        for extract, column_definitions in extract_definitions.items():
+            table_name: str = update_table_name_that_starts_with_digit(extract.split(".")[1])
+            if table_name == "picklist" and self.picklist_primary_key_constraint:
+                column_definitions = f"{column_definitions}, {self.picklist_primary_key_constraint}"
+            table_definitions[table_name] = column_definitions
+        return table_definitions
+
+    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
+        """
+        Creates a table for every extract in the metadata, plus the metadata table itself.
+
+        :param starting_directory: The directory of the extract files
+        :param metadata_table: The metadata of all extracts
+        """
+        table_definitions: dict[str, str] = self.compile_table_definitions(metadata_table=metadata_table)
+
+        table_definitions["metadata"] = self.create_metadata_column_definitions(metadata_table=metadata_table)
+
+        self.create_tables(table_definitions=table_definitions)
+
+    def create_metadata_column_definitions(self, metadata_table: pd.DataFrame) -> str:
+        """
+        Returns the column definitions of the metadata table. Every column of the metadata table is a string.
+
+        :param metadata_table: The metadata of all extracts
+        """
+        metadata_columns: DataFrame = pd.DataFrame({"column_name": metadata_table.columns,
+                                                    "type": "STRING",
+                                                    "length": 1000})
+        return ", ".join(self.create_column_definitions(table_df=metadata_columns))
+
+    def create_tables(self, table_definitions: dict[str, str]):
+        """
+        Creates the tables that do not exist yet. Where the connection accepts multi-statement batches, the CREATE
+        TABLE statements are sent ddl_batch_size at a time. Otherwise they run in parallel on pooled connections.
+
+        :param table_definitions: The column definitions of each table by table name
+        """
+        statements: dict[str, str] = {
+            table_name: self.create_table_statement(table_name=table_name, column_definitions=column_definitions)
+            for table_name, column_definitions in table_definitions.items()
+        }
+
+        if self.db_connection.supports_statement_batches:
+            statement_list: list[str] = list(statements.values())
+            batch_size: int = max(1, self.ddl_batch_size)
+            for start in range(0, len(statement_list), batch_size):
+                self.db_connection.execute_batch(statements=statement_list[start:start + batch_size])
+        else:
+            tasks: list[ScheduledTask] = [
+                ScheduledTask(name=table_name,
+                              function=lambda worker_context, statement: worker_context.db_connection.execute_query(
+                                  statement),
+                              statement=statement)
+                for table_name, statement in statements.items()
+            ]
+            self.run_worker_tasks(tasks=tasks, description='Create table')
+            failed_tables: list[str] = [task.name for task in tasks if not task.succeeded]
+            if failed_tables:
+                log_message(log_level='Error',
+                            message=f'Create table failed for: {", ".join(failed_tables)}')
+
+        for table_name in statements:
+            self.schema_catalog.invalidate_table(table_name=table_name)
+        log_message(log_level='Info',
+                    message=f'Ensured {len(statements)} tables exist')
+
     @abstractmethod
     def check_if_schema_exists(self):
         """
@@ -28,12 +269,26 @@ class DatabaseService(ABC):
         """
         pass
 
-    @abstractmethod
     def retrieve_column_info(self, table_name: str) -> dict:
+        """
+        Returns the column info of a table by lower-case column name, served from the schema catalog.
+        """
+        return self.schema_catalog.get_columns(database_service=self, table_name=table_name)
+
+    @abstractmethod
+    def load_schema_catalog(self) -> dict[str, dict[str, dict]]:
+        """
+        Reads the columns of every table in the schema with a single information_schema query.
+
+        :return: The column info of each table, as built by SchemaCatalog.group_column_rows
+        """
         pass
 
     @abstractmethod
-    def create_all_tables(self, starting_directory: str, metadata_table: pd.DataFrame):
+    def query_column_info(self, table_name: str) -> dict:
+        """
+        Reads the columns of a single table from information_schema, bypassing the schema catalog.
+        """
         pass
 
     @abstractmethod
@@ -60,6 +315,16 @@ class DatabaseService(ABC):
     def delete_data_from_table(self, starting_directory: str, manifest_table: pd.DataFrame):
         pass
 
+    @abstractmethod
+    def process_delete(self, row: pd.Series, starting_directory: str):
+        """
+        Deletes the rows listed in a deletes file of the manifest from the target table.
+
+        :param row: The manifest row of the deletes file
+        :param starting_directory: The folder of the extract in object storage
+        """
+        pass
+
     @abstractmethod
     def create_staging_table(self, staging_table_name: str, **kwargs):
         pass
@@ -80,6 +345,481 @@ class DatabaseService(ABC):
         """
         pass
 
+    def load_full_or_log_data_batch(self, loads: list[tuple[str, str]]) -> list[str]:
+        """
+        Loads a batch of tables. Services that set supports_batched_loads override this to load the tables at once.
+        Otherwise, the tables are loaded one at a time with load_full_or_log_data, and a failed table does not stop
+        the others.
+
+        :param loads: The table name and full object path of each table to load
+        :return: The tables that failed to load
+        """
+        failed_tables: list[str] = []
+        for table_name, object_path in loads:
+            try:
+                self.load_full_or_log_data(table_name=table_name, object_path=object_path)
+            except Exception as e:
+                log_message(log_level='Error',
+                            message=f'Failed to load {table_name}',
+                            exception=e)
+                failed_tables.append(table_name)
+        return failed_tables
+
+    def maintain_changed_tables(self, table_names: list[str]):
+        """
+        Runs table maintenance, such as compaction, once the changes of an incremental extract have been applied.
+        Does nothing unless a service overrides it.
+
+        :param table_names: The tables with updates or deletes in the extract
+        """
+        pass
+
     @abstractmethod
     def load_incremental_data(self, table_name: str, object_path: str, headers: str = None):
         pass
+
+    @staticmethod
+    def get_primary_keys(table_name: str) -> list[str]:
+        """
+        Returns the columns that identify a row of a Direct Data table, from the PRIMARY_KEYS registry.
+
+        :param table_name: The table name
+        """
+        return list(PRIMARY_KEYS.get(table_name, DEFAULT_PRIMARY_KEYS))
+
+    def qualified_table_name(self, table_name: str) -> str:
+        """
+        Returns a target table name qualified for statements run on the service's connection.
+
+        :param table_name: The table name
+        """
+        return f"{self.schema}.{table_name}"
+
+    def use_small_change_load(self, records: int, file_size_bytes: int = 0) -> bool:
+        """
+        Chooses the load strategy of an incremental updates file. Files with at most small_change_max_records records
+        and small_change_max_bytes bytes are read locally and applied with parameterised multi-row statements, which
+        avoids the fixed cost of a staging table, a COPY from object storage and a staged merge. Larger files are
+        loaded with COPY.
+
+        :param records: The number of records in the file, from the manifest
+        :param file_size_bytes: The size of the file, or 0 if it is not known
+        """
+        return 0 < records <= self.small_change_max_records and file_size_bytes <= self.small_change_max_bytes
+
+    def load_small_incremental_data(self, table_name: str, changes: DataFrame) -> bool:
+        """
+        Applies a small incremental updates file as one unit of work, with a MERGE of the rows as a VALUES list where
+        the target supports one, and otherwise by deleting the changed keys and inserting the rows. Values are bound
+        as parameters, converted to the column types from the schema catalog.
+
+        :param table_name: The target table
+        :param changes: The rows of the updates file
+        :return: False if the table or one of the file's columns is not in the schema catalog, or the rows are too
+            wide to bind, in which case nothing was applied and the file is loaded as usual
+        """
+        table_columns: dict = self.retrieve_column_info(table_name)
+        columns: list[str] = [str(column).lower() for column in changes.columns]
+        if (not table_columns or any(column not in table_columns for column in columns)
+                or len(columns) > self.db_connection.max_statement_parameters):
+            return False
+
+        column_types: list[str] = [str(table_columns[column].get('DATA_TYPE', table_columns[column].get('data_type')))
+                                   for column in columns]
+        rows: list[tuple] = self.convert_small_change_values(changes=changes, column_types=column_types)
+        primary_keys: list[str] = self.get_primary_keys(table_name=table_name)
+        target_table_name: str = self.qualified_table_name(table_name=table_name)
+        rows_per_statement: int = min(SMALL_CHANGE_ROWS_PER_STATEMENT,
+                                      self.db_connection.max_statement_parameters // len(columns))
+        row_batches: list[list[tuple]] = [rows[start:start + rows_per_statement]
+                                          for start in range(0, len(rows), rows_per_statement)]
+
+        with self.db_connection.transaction():
+            if self.supports_values_merge:
+                for row_batch in row_batches:
+                    self.db_connection.execute_with_parameters(
+                        query=self.create_sql_str_values_merge(target_table_name=target_table_name,
+                                                               columns=columns,
+                                                               primary_keys=primary_keys,
+                                                               row_count=len(row_batch)),
+                        parameters=[value for row in row_batch for value in row])
+            else:
+                key_positions: list[int] = [columns.index(key) for key in primary_keys]
+                key_batch_size: int = max(1, self.db_connection.max_statement_parameters // len(primary_keys))
+                keys: list[tuple] = list(dict.fromkeys(tuple(row[i] for i in key_positions) for row in rows))
+                for start in range(0, len(keys), key_batch_size):
+                    key_batch: list[tuple] = keys[start:start + key_batch_size]
+                    self.db_connection.execute_with_parameters(
+                        query=self.create_sql_str_values_delete(target_table_name=target_table_name,
+                                                                primary_keys=primary_keys,
+                                                                row_count=len(key_batch)),
+                        parameters=[value for key in key_batch for value in key])
+                for row_batch in row_batches:
+                    self.db_connection.execute_with_parameters(
+                        query=self.create_sql_str_values_insert(target_table_name=target_table_name,
+                                                                columns=columns,
+                                                                row_count=len(row_batch)),
+                        parameters=[value for row in row_batch for value in row])
+
+        log_message(log_level='Info',
+                    message=f'Applied {len(rows)} changed records to {table_name} in {len(row_batches)} '
+                            f'parameterised batches')
+        return True
+
+    @staticmethod
+    def convert_small_change_values(changes: DataFrame, column_types: list[str]) -> list[tuple]:
+        """
+        Converts the values of an updates file, read as strings or from Parquet, to Python values that the drivers
+        bind with the target column types. Empty values become NULL.
+
+        :param changes: The rows of the updates file
+        :param column_types: The target data type of each column, in the order of the file's columns
+        :return: The converted rows
+        """
+        def to_boolean(value) -> bool:
+            return str(value).strip().lower() in ('true', '1', 't', 'y', 'yes')
+
+        def to_integer(value) -> int:
+            text: str = str(value).strip().lower()
+            if text in ('true', 'false'):
+                return int(text == 'true')
+            return int(Decimal(text))
+
+        def to_timestamp(value) -> datetime:
+            timestamp: pd.Timestamp = pd.Timestamp(value)
+            # Vault timestamps are UTC. They are bound as naive UTC values, which all targets accept.
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.tz_convert(None)
+            return timestamp.to_pydatetime()
+
+        def to_date(value) -> date:
+            return pd.Timestamp(value).date()
+
+        converters: list[Callable[[Any], Any]] = []
+        for column_type in column_types:
+            column_type = column_type.lower()
+            if column_type.startswith('bool') or column_type == 'bit':
+                converters.append(to_boolean)
+            elif 'int' in column_type:
+                converters.append(to_integer)
+            elif column_type.startswith(('number', 'numeric', 'decimal')):
+                converters.append(lambda value: Decimal(str(value).strip()))
+            elif column_type.startswith(('float', 'double', 'real')):
+                converters.append(float)
+            elif 'timestamp' in column_type or 'datetime' in column_type:
+                converters.append(to_timestamp)
+            elif column_type == 'date':
+                converters.append(to_date)
+            else:
+                converters.append(str)
+
+        return [
+            tuple(None if pd.isna(value) or value == '' else converter(value)
+                  for converter, value in zip(converters, row))
+            for row in changes.itertuples(index=False, name=None)
+        ]
+
+    def create_sql_str_values_merge(self, target_table_name: str, columns: list[str], primary_keys: list[str],
+                                    row_count: int) -> str:
+        """
+        Generates a MERGE of rows bound as a VALUES list into the target table.
+
+        :param target_table_name: The target table, qualified as needed
+        :param columns: The columns of each row
+        :param primary_keys: The columns that identify a row
+        :param row_count: The number of rows in the VALUES list
+        :return: The MERGE statement, with one parameter marker per value
+        """
+        def quote(identifier: str) -> str:
+            return self.quoted_identifier_format.format(identifier)
+
+        quoted_columns: str = ', '.join(quote(col) for col in columns)
+        matching_condition: str = ' AND '.join(f'target.{quote(col)} = source.{quote(col)}' for col in primary_keys)
+        set_clause: str = ', '.join(f'target.{quote(col)} = source.{quote(col)}' for col in columns)
+        insert_values: str = ', '.join(f'source.{quote(col)}' for col in columns)
+
+        return f"""
+                MERGE INTO {target_table_name} AS target
+                USING (VALUES {self.create_sql_str_values_rows(column_count=len(columns), row_count=row_count)})
+                    AS source ({quoted_columns})
+                ON {matching_condition}
+                WHEN MATCHED THEN
+                    UPDATE SET {set_clause}
+                WHEN NOT MATCHED THEN
+                    INSERT ({quoted_columns}) VALUES ({insert_values});
+            """
+
+    def create_sql_str_values_delete(self, target_table_name: str, primary_keys: list[str], row_count: int) -> str:
+        """
+        Generates a DELETE of the target rows with any of row_count bound keys.
+
+        :param target_table_name: The target table, qualified as needed
+        :param primary_keys: The columns that identify a row
+        :param row_count: The number of keys
+        :return: The DELETE statement, with one parameter marker per key value
+        """
+        marker: str = self.db_connection.parameter_marker
+        if len(primary_keys) == 1:
+            key_condition: str = (f'{self.quoted_identifier_format.format(primary_keys[0])} '
+                                  f'IN ({", ".join([marker] * row_count)})')
+        else:
+            key_match: str = ' AND '.join(f'{self.quoted_identifier_format.format(col)} = {marker}'
+                                          for col in primary_keys)
+            key_condition = ' OR '.join([f'({key_match})'] * row_count)
+        return f"""
+                DELETE FROM {target_table_name}
+                WHERE {key_condition};
+            """
+
+    def create_sql_str_values_insert(self, target_table_name: str, columns: list[str], row_count: int) -> str:
+        """
+        Generates a multi-row INSERT of bound rows into the target table.
+
+        :param target_table_name: The target table, qualified as needed
+        :param columns: The columns of each row
+        :param row_count: The number of rows
+        :return: The INSERT statement, with one parameter marker per value
+        """
+        quoted_columns: str = ', '.join(self.quoted_identifier_format.format(col) for col in columns)
+        return f"""
+                INSERT INTO {target_table_name} ({quoted_columns})
+                VALUES {self.create_sql_str_values_rows(column_count=len(columns), row_count=row_count)};
+            """
+
+    def create_sql_str_values_rows(self, column_count: int, row_count: int) -> str:
+        """
+        Generates the rows of a VALUES list with one parameter marker per value, e.g. '(?, ?), (?, ?)'.
+        """
+        row: str = f'({", ".join([self.db_connection.parameter_marker] * column_count)})'
+        return ', '.join([row] * row_count)
+
+    def create_sql_str_key_delete(self, target_table_name: str, deletes_table_name: str, primary_keys: list[str],
+                                  key_range: tuple[Any, Any] | None = None) -> str:
+        """
+        Generates a DELETE of the target rows whose primary key is in the deletes table. Each key column is compared
+        on its own, as a join where the target supports DELETE ... USING and as a correlated EXISTS otherwise, so the
+        target can use indexes, sort keys or clustering on the key columns. Unlike comparing concatenated keys, this
+        cannot match a different key with the same concatenation.
+
+        :param target_table_name: The target table, as it is qualified in column references
+        :param deletes_table_name: The table holding the keys of the deleted rows
+        :param primary_keys: The columns that identify a row
+        :param key_range: Optional lower (inclusive) and upper (exclusive) bounds on the first key column, to delete
+            one batch of keys. None leaves that side unbounded
+        :return: The DELETE statement
+        """
+        def quote(identifier: str) -> str:
+            return self.quoted_identifier_format.format(identifier)
+
+        key_conditions: list[str] = [f'{target_table_name}.{quote(col)} = deletes.{quote(col)}'
+                                     for col in primary_keys]
+        if key_range is not None:
+            lower_bound, upper_bound = key_range
+            if lower_bound is not None:
+                key_conditions.append(f'deletes.{quote(primary_keys[0])} >= {self.to_sql_literal(lower_bound)}')
+            if upper_bound is not None:
+                key_conditions.append(f'deletes.{quote(primary_keys[0])} < {self.to_sql_literal(upper_bound)}')
+        key_condition: str = ' AND '.join(key_conditions)
+
+        if self.supports_delete_using:
+            return f"""
+                DELETE FROM {target_table_name}
+                USING {deletes_table_name} AS deletes
+                WHERE {key_condition};
+            """
+        return f"""
+                DELETE FROM {target_table_name}
+                WHERE EXISTS (
+                    SELECT 1 FROM {deletes_table_name} AS deletes
+                    WHERE {key_condition}
+                );
+            """
+
+    @staticmethod
+    def to_sql_literal(value: Any) -> str:
+        """
+        Formats a key value read back from the database as a SQL literal.
+        """
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def is_chunked_delete(self, records: int) -> bool:
+        """
+        True if a table's deletes are applied in batches, i.e. delete_batch_size is set and the table has more
+        delete records than that.
+
+        :param records: The number of delete records of the table, from the manifest
+        """
+        return 0 < self.delete_batch_size < records
+
+    def delete_unit_of_work(self, records: int) -> AbstractContextManager:
+        """
+        Returns the unit of work for a table's deletes: one transaction, unless the deletes are applied in batches,
+        in which case each batch commits on its own.
+
+        :param records: The number of delete records of the table, from the manifest
+        """
+        if self.is_chunked_delete(records=records):
+            return nullcontext()
+        return self.db_connection.transaction()
+
+    def apply_key_delete(self, target_table_name: str, deletes_table_name: str, primary_keys: list[str],
+                         records: int = 0):
+        """
+        Deletes the target rows whose primary key is in the deletes table. Above delete_batch_size records, the keys
+        are split into ranges of about delete_batch_size keys on the first key column, and each range is deleted and
+        committed on its own, so that a large cleanup does not hold locks or grow the transaction log for the whole
+        table at once. A failed batch is retried up to delete_batch_retries times. Committed batches are kept if a
+        later batch fails, and running the deletes again finishes the remaining batches.
+
+        :param target_table_name: The target table, as it is qualified in column references
+        :param deletes_table_name: The table holding the keys of the deleted rows
+        :param primary_keys: The columns that identify a row
+        :param records: The number of delete records of the table, from the manifest
+        """
+        if not self.is_chunked_delete(records=records):
+            self.db_connection.execute_query(self.create_sql_str_key_delete(target_table_name=target_table_name,
+                                                                            deletes_table_name=deletes_table_name,
+                                                                            primary_keys=primary_keys))
+            return
+
+        key_ranges: list[tuple[Any, Any]] = self.get_delete_key_ranges(deletes_table_name=deletes_table_name,
+                                                                        key_column=primary_keys[0])
+        log_message(log_level='Info',
+                    message=f'Deleting {records} records from {target_table_name} in {len(key_ranges)} batches')
+        start_time: float = time.perf_counter()
+        for batch_number, key_range in enumerate(key_ranges, start=1):
+            delete_query: str = self.create_sql_str_key_delete(target_table_name=target_table_name,
+                                                               deletes_table_name=deletes_table_name,
+                                                               primary_keys=primary_keys,
+                                                               key_range=key_range)
+            self.run_delete_batch(delete_query=delete_query,
+                                  description=f'Delete batch {batch_number} of {len(key_ranges)} '
+                                              f'from {target_table_name}')
+            log_message(log_level='Info',
+                        message=f'Deleted batch {batch_number} of {len(key_ranges)} from {target_table_name} '
+                                f'({batch_number * 100 // len(key_ranges)}%, '
+                                f'{time.perf_counter() - start_time:.2f}s elapsed)')
+
+    def get_delete_key_ranges(self, deletes_table_name: str, key_column: str) -> list[tuple[Any, Any]]:
+        """
+        Splits the keys of a deletes table into ranges of about delete_batch_size keys, using every
+        delete_batch_size-th value of the key column as a boundary. Ranges can be larger when many keys share a
+        boundary value.
+
+        :param deletes_table_name: The table holding the keys of the deleted rows
+        :param key_column: The key column to split on
+        :return: Lower (inclusive) and upper (exclusive) bounds of each range, None where unbounded
+        """
+        quoted_key: str = self.quoted_identifier_format.format(key_column)
+        boundary_rows: list = self.db_connection.execute_query(f"""
+                SELECT boundary FROM (
+                    SELECT {quoted_key} AS boundary, ROW_NUMBER() OVER (ORDER BY {quoted_key}) AS key_row
+                    FROM {deletes_table_name}
+                    WHERE {quoted_key} IS NOT NULL
+                ) AS numbered_keys
+                WHERE (key_row - 1) % {self.delete_batch_size} = 0
+                ORDER BY boundary
+            """) or []
+
+        # Keep the database's ordering, which may differ from Python's, and skip repeated boundaries
+        boundaries: list = []
+        for (boundary,) in boundary_rows:
+            if not boundaries or boundaries[-1] != boundary:
+                boundaries.append(boundary)
+
+        # The first range is unbounded below and the last unbounded above
+        lower_bounds: list = [None] + boundaries[1:]
+        upper_bounds: list = boundaries[1:] + [None]
+        return list(zip(lower_bounds, upper_bounds))
+
+    def run_delete_batch(self, delete_query: str, description: str):
+        """
+        Runs a delete batch in its own transaction, retrying it with a growing delay if it fails.
+
+        :param delete_query: The DELETE statement of the batch
+        :param description: The batch, used in log messages
+        """
+        for attempt in range(1, self.delete_batch_retries + 2):
+            try:
+                with self.db_connection.transaction():
+                    self.db_connection.execute_query(delete_query)
+                return
+            except Exception as e:
+                if attempt > self.delete_batch_retries:
+                    raise
+                log_message(log_level='Warning',
+                            message=f'{description} failed on attempt {attempt}. Retrying',
+                            exception=e)
+                time.sleep(min(2 ** attempt, 30))
+
+    def apply_table_changes(self, table_name: str, updates_object_path: str, deletes_object_path: str,
+                            headers: list[str] = None, **kwargs):
+        """
+        Applies the updates and deletes of a table in an incremental extract. Services with supports_combined_changes
+        override this with a single MERGE, so that the target table is scanned once instead of once for the deletes
+        and once for the updates. Otherwise, the deletes are applied and then the updates are loaded, as when the
+        changes are not combined.
+
+        :param table_name: The target table
+        :param updates_object_path: The full object path of the updates file
+        :param deletes_object_path: The full object path of the deletes file
+        :param headers: The headers of the updates file
+        :param kwargs: deletes_row, the manifest row of the deletes file, and starting_directory, the folder of the
+            extract, which are passed to process_delete
+        """
+        log_message(log_level='Debug',
+                    message=f'{type(self).__name__} applies the deletes and updates of {table_name} separately')
+        self.process_delete(row=kwargs['deletes_row'], starting_directory=kwargs['starting_directory'])
+        self.load_incremental_data(table_name=table_name, object_path=updates_object_path, headers=headers)
+
+    def create_sql_str_change_merge(self, target_table_name: str, updates_table_name: str, deletes_table_name: str,
+                                    table_columns: list[str], primary_keys: list[str]) -> str:
+        """
+        Generates the MERGE statement of a combined change. The staged updates are flagged 'U' and the staged delete
+        keys are flagged 'D'. Keys that are also in the updates are left out of the deletes, so that, as when the
+        deletes are applied before the updates, the updated row is kept.
+
+        :param target_table_name: The target table, qualified as needed
+        :param updates_table_name: The staging table holding the updates, with the same columns as the target
+        :param deletes_table_name: The staging table holding the keys of the deleted rows
+        :param table_columns: The columns of the target table
+        :param primary_keys: The columns that identify a row
+        :return: The MERGE statement
+        """
+        def quote(identifier: str) -> str:
+            return self.quoted_identifier_format.format(identifier)
+
+        operation: str = quote(CHANGE_OPERATION_COLUMN)
+        update_columns: str = ', '.join(quote(col) for col in table_columns)
+        delete_columns: str = ', '.join(
+            f'deletes.{quote(col)}' if col in primary_keys else f'NULL AS {quote(col)}' for col in table_columns)
+        delete_keys: str = ', '.join(quote(col) for col in primary_keys)
+        updated_key_condition: str = ' AND '.join(
+            f'updates.{quote(col)} = deletes.{quote(col)}' for col in primary_keys)
+        matching_condition: str = ' AND '.join(
+            f'target.{quote(col)} = source.{quote(col)}' for col in primary_keys)
+        set_clause: str = ', '.join(f'target.{quote(col)} = source.{quote(col)}' for col in table_columns)
+        insert_values: str = ', '.join(f'source.{quote(col)}' for col in table_columns)
+
+        return f"""
+                MERGE INTO {target_table_name} AS target
+                USING (
+                    SELECT {update_columns}, 'U' AS {operation}
+                    FROM {updates_table_name}
+                    UNION ALL
+                    SELECT {delete_columns}, 'D' AS {operation}
+                    FROM (SELECT DISTINCT {delete_keys} FROM {deletes_table_name}) AS deletes
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM {updates_table_name} AS updates WHERE {updated_key_condition}
+                    )
+                ) AS source
+                ON {matching_condition}
+                WHEN MATCHED AND source.{operation} = 'D' THEN
+                    DELETE
+                WHEN MATCHED THEN
+                    UPDATE SET {set_clause}
+                WHEN NOT MATCHED AND source.{operation} = 'U' THEN
+                    INSERT ({update_columns}) VALUES ({insert_values});
+            """
@@ -1,4 +1,12 @@
+import hashlib
+import io
+import os
+import shutil
+import threading
 from abc import ABC, abstractmethod
+from typing import BinaryIO
+
+from common.transfer_pipeline import BufferReader
 from common.utilities import log_message
 
 
@@ -12,13 +20,49 @@ class ObjectStorageService(ABC):
         self.document_text_folder: str = parameters['document_text_folder']
         self.credentials: dict | None = None
         self.client: object | None = None
+        self.object_listing_cache: dict[str, dict] = {}
+        self.local_cache_folder: str = parameters.get('local_cache_folder', '.direct_data_cache')
+        self.local_cache_size_limit_bytes: int = int(parameters.get('local_cache_size_limit_mb', 1024)) * 1024 * 1024
+        self.local_cache_lock: threading.Lock = threading.Lock()
+        self.transfer_max_in_flight_bytes: int = int(parameters.get('transfer_max_in_flight_mb', 256)) * 1024 * 1024
+        self.transfer_workers: int = int(parameters.get('transfer_workers', 4))
+        self.shard_size_bytes: int = int(parameters.get('shard_size_mb', 0)) * 1024 * 1024
+        # 'inferred' writes Parquet Number columns as int64, or as float64 if the first chunk has decimals. 'double'
+        # always writes float64, for targets whose COPY needs every file of a table to have the same types.
+        self.parquet_number_type: str = parameters.get('parquet_number_type', 'inferred')
+
+    @staticmethod
+    def as_readable(data: bytes | bytearray | memoryview | BinaryIO) -> BinaryIO:
+        """
+            Wraps an in-memory payload in a file object without copying it. File objects are returned unchanged.
+            :param data: The payload or file object to be uploaded
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return BufferReader(data)
+        return data
+
+    @staticmethod
+    def payload_size(data: bytes | bytearray | memoryview | BinaryIO) -> int:
+        """
+            Returns the number of bytes in a payload. len() of a memoryview counts items rather than bytes, and file
+            objects have no length, so their remaining size is measured from the current position.
+            :param data: The payload or file object to be uploaded
+        """
+        if isinstance(data, memoryview):
+            return data.nbytes
+        if isinstance(data, (bytes, bytearray)):
+            return len(data)
+        position: int = data.tell()
+        size: int = data.seek(0, io.SEEK_END) - position
+        data.seek(position)
+        return size
 
     @abstractmethod
-    def upload_object(self, object_path: str, data) -> dict:
+    def upload_object(self, object_path: str, data: bytes | bytearray | memoryview | BinaryIO) -> dict:
         """
             Upload file to object storage
             :param object_path: Path to the object in the storage
-            :param data: Data to be uploaded
+            :param data: Data to be uploaded, either a file object or an in-memory buffer
             :return: Response from the upload operation
         """
         pass
@@ -32,13 +76,15 @@ class ObjectStorageService(ABC):
         pass
 
     @abstractmethod
-    def upload_part(self, object_path: str, multipart_upload_response: dict, part_number: int, data: bytes) -> dict:
+    def upload_part(self, object_path: str, multipart_upload_response: dict, part_number: int,
+                    data: bytes | bytearray | memoryview, part_size: int | None = None) -> dict:
         """
             Upload a part of a multipart upload
             :param object_path: Path to the object in the storage
             :param multipart_upload_response: Response from the create_multipart_upload method
             :param part_number: Part number to be uploaded
-            :param data: Data to be uploaded
+            :param data: Data to be uploaded. Buffers are uploaded in place without being copied.
+            :param part_size: Size of the part in bytes. Measured from data when not provided.
         """
         pass
 
@@ -86,6 +132,72 @@ class ObjectStorageService(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_object_info(self, object_path: str) -> dict:
+        """
+            Retrieve the size, ETag and last modified time of an object without downloading it
+            :param object_path: Path to the object in the storage
+            :return: Dictionary with size, etag and last_modified values
+        """
+        pass
+
+    def download_cached_object_to_local(self, object_path: str, output_path: str) -> None:
+        """
+            Download file from object storage to local through a content-addressed local cache. The cached copy is
+            reused when the remote ETag and last modified time still match, otherwise the object is downloaded again.
+            :param object_path: Path to the object in the storage
+            :param output_path: Local path to save the downloaded file
+        """
+        object_info: dict | None = self.get_cached_object_info(object_path=object_path)
+        if object_info is None:
+            object_info = self.get_object_info(object_path=object_path)
+
+        cache_key: str = hashlib.sha256(
+            f"{object_info.get('etag')}|{object_info.get('last_modified')}|{object_info.get('size')}".encode('utf-8')
+        ).hexdigest()
+        cached_file_path: str = os.path.join(self.local_cache_folder, cache_key)
+
+        if os.path.exists(cached_file_path):
+            log_message(log_level='Info',
+                        message=f'Using locally cached copy of {object_path}')
+            # Touching the cached file marks it as most recently used for eviction
+            os.utime(cached_file_path)
+        else:
+            os.makedirs(self.local_cache_folder, exist_ok=True)
+            temporary_file_path: str = f"{cached_file_path}.{threading.get_ident()}.part"
+            self.download_object_to_local(object_path=object_path, output_path=temporary_file_path)
+            os.replace(temporary_file_path, cached_file_path)
+            self._evict_local_cache(protected_file_path=cached_file_path)
+
+        directory: str = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.abspath(output_path) != os.path.abspath(cached_file_path):
+            shutil.copyfile(cached_file_path, output_path)
+
+    def _evict_local_cache(self, protected_file_path: str) -> None:
+        """
+            Removes the least recently used files from the local cache until it fits within the size limit
+            :param protected_file_path: Cached file that must not be evicted
+        """
+        with self.local_cache_lock:
+            cached_files: list = []
+            for entry in os.scandir(self.local_cache_folder):
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    entry_stat = entry.stat()
+                    cached_files.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+
+            total_size: int = sum(size for _, size, _ in cached_files)
+            for _, size, file_path in sorted(cached_files):
+                if total_size <= self.local_cache_size_limit_bytes:
+                    break
+                if file_path == protected_file_path:
+                    continue
+                log_message(log_level='Debug',
+                            message=f'Evicting {file_path} from the local cache')
+                os.remove(file_path)
+                total_size -= size
+
     @abstractmethod
     def check_if_object_exists(self, object_path: str):
         """
@@ -94,6 +206,49 @@ class ObjectStorageService(ABC):
         """
         pass
 
+    @abstractmethod
+    def list_objects(self, prefix: str) -> dict[str, dict]:
+        """
+            List every object under a prefix in object storage, following pagination
+            :param prefix: Prefix of the objects in the storage
+            :return: Dictionary of object paths mapped to their size, etag and last_modified values
+        """
+        pass
+
+    def cache_object_listing(self, prefix: str) -> dict[str, dict]:
+        """
+            Lists all objects under a prefix once and caches their existence, size and ETag, so that later
+            existence checks within the same extract do not require a request per object.
+            :param prefix: Prefix of the objects in the storage
+            :return: Dictionary of the objects listed under the prefix
+        """
+        log_message(log_level='Debug',
+                    message=f'Caching object listing for prefix: {prefix}')
+        try:
+            listed_objects: dict[str, dict] = self.list_objects(prefix=prefix)
+        except Exception as e:
+            log_message(log_level='Warning',
+                        message=f'Unable to list objects for prefix: {prefix}. Falling back to per-object checks',
+                        exception=e)
+            return {}
+
+        # Replace any stale entries for the prefix with the new listing
+        self.object_listing_cache = {object_path: object_info
+                                     for object_path, object_info in self.object_listing_cache.items()
+                                     if not object_path.startswith(prefix)}
+        self.object_listing_cache.update(listed_objects)
+        log_message(log_level='Info',
+                    message=f'Cached {len(listed_objects)} objects for prefix: {prefix}')
+        return listed_objects
+
+    def get_cached_object_info(self, object_path: str) -> dict | None:
+        """
+            Get the cached size, ETag and last modified time of an object
+            :param object_path: Path to the object in the storage
+            :return: The cached object info, or None if the object is not in the listing cache
+        """
+        return self.object_listing_cache.get(object_path)
+
     @abstractmethod
     def get_full_object_path(self, filename: str) -> str:
         """
@@ -102,6 +257,14 @@ class ObjectStorageService(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_object_url(self, object_path: str) -> str:
+        """
+            Get the URL of an object from its path within the bucket or container
+            :param object_path: Path to the object in the storage
+        """
+        pass
+
     @abstractmethod
     def get_relative_object_path(self, filename: str) -> str:
         """
@@ -0,0 +1,97 @@
+import threading
+
+from common.utilities import log_message
+
+
+class SchemaCatalog:
+    """
+    An in-memory copy of information_schema.columns for the target schema, keyed by lower-case table name and then
+    lower-case column name. All tables are read with a single query on first use. Tables that did not exist at that
+    point are read individually when first requested. Schema changes made by the DatabaseService are applied here
+    in place, so lookups during a run do not need a round trip to the catalog.
+
+    The catalog is shared by the worker copies of a DatabaseService. Queries use the connection of the service
+    passed to each method.
+    """
+
+    def __init__(self):
+        self.tables: dict[str, dict[str, dict]] | None = None
+        self.lock: threading.RLock = threading.RLock()
+
+    @staticmethod
+    def group_column_rows(rows: list, info_keys: list[str]) -> dict[str, dict[str, dict]]:
+        """
+        Groups information_schema rows by table and column.
+
+        :param rows: Rows of (table_name, column_name, data_type, ...) with one value per key in info_keys
+        :param info_keys: Keys for the values from data_type onwards, e.g. ['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH']
+        :return: The column info of each table. Data types are lower case.
+        """
+        tables: dict[str, dict[str, dict]] = {}
+        for table_name, column_name, data_type, *values in rows:
+            tables.setdefault(table_name.lower(), {})[column_name.lower()] = dict(
+                zip(info_keys, [data_type.lower(), *values]))
+        return tables
+
+    def get_columns(self, database_service, table_name: str) -> dict:
+        """
+        Returns the column info of a table, loading the catalog on first use.
+
+        :param database_service: The DatabaseService whose connection runs any catalog query
+        :param table_name: The table name
+        :return: A copy of the column info by lower-case column name, or an empty dict if the table does not exist
+        """
+        table_key: str = table_name.lower()
+        with self.lock:
+            if self.tables is None:
+                self.tables = database_service.load_schema_catalog()
+                log_message(log_level='Info',
+                            message=f'Loaded schema catalog with {len(self.tables)} tables')
+            columns: dict | None = self.tables.get(table_key)
+
+        if columns is None:
+            columns = database_service.query_column_info(table_name=table_name)
+            # Missing tables are not cached, so that a table created later in the run is found
+            if columns:
+                with self.lock:
+                    if self.tables is not None:
+                        self.tables[table_key] = columns
+        return dict(columns)
+
+    def refresh_table(self, database_service, table_name: str):
+        """
+        Re-reads the columns of one table, e.g. after columns were added with types chosen by the database.
+
+        :param database_service: The DatabaseService whose connection runs the query
+        :param table_name: The table name
+        """
+        with self.lock:
+            if self.tables is None:
+                return
+        columns: dict = database_service.query_column_info(table_name=table_name)
+        with self.lock:
+            if self.tables is not None:
+                self.tables[table_name.lower()] = columns
+
+    def drop_columns(self, table_name: str, columns: list):
+        """
+        Removes dropped columns from a table in the catalog.
+
+        :param table_name: The table name
+        :param columns: The dropped column names
+        """
+        with self.lock:
+            table_columns: dict | None = (self.tables or {}).get(table_name.lower())
+            if table_columns is not None:
+                for column_name in columns:
+                    table_columns.pop(column_name.lower(), None)
+
+    def invalidate_table(self, table_name: str):
+        """
+        Forgets a table that was created or dropped, so that its columns are read again on the next lookup.
+
+        :param table_name: The table name
+        """
+        with self.lock:
+            if self.tables is not None:
+                self.tables.pop(table_name.lower(), None)
@@ -47,11 +47,19 @@ class VaultService:
                         exception=e)
             raise e
 
-    def download_direct_data_file(self, name: str) -> VaultResponse:
+    def download_direct_data_file(self, name: str, buffer_pool=None) -> VaultResponse:
+        """
+        Downloads a Direct Data file or file part.
+
+        :param name: The name of the file part to download
+        :param buffer_pool: An optional common.transfer_pipeline.BufferPool. When provided, the body is read into a
+            pooled buffer and binary_content is a memoryview over it, which the caller releases back to the pool.
+        """
         log_message(log_level='Debug',
                     message=f'Downloading Direct Data file: {name}')
         try:
             request: DirectDataRequest = self._vault_client.new_request(DirectDataRequest)
+            setattr(request, '_binary_buffer_pool', buffer_pool)
             response: VaultResponse = request.download_direct_data_file(name=name)
 
             if response.has_errors():
@@ -0,0 +1,147 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from common.utilities import log_message
+
+# Fixed per-table cost, in bytes, covering query round trips and commit latency regardless of the table size
+TABLE_OVERHEAD_BYTES: int = 1024 * 1024
+# Estimated size of a single value when only the record and column counts of a table are known
+ESTIMATED_BYTES_PER_VALUE: int = 16
+
+
+def estimate_table_cost(records: int = 0, file_size_bytes: int = 0, column_count: int = 0) -> float:
+    """
+    Estimates the relative cost of loading, converting or deleting a table, expressed in bytes. The file size is used
+    when it is known; otherwise the size is estimated from the record and column counts. A fixed overhead is added so
+    that many small tables are not treated as free.
+
+    :param records: The number of records, e.g. from the manifest
+    :param file_size_bytes: The size of the table's file, e.g. from the object listing
+    :param column_count: The number of columns, e.g. from the metadata
+    :return: The estimated cost
+    """
+    estimated_size: float = records * max(1, column_count) * ESTIMATED_BYTES_PER_VALUE
+    return max(float(file_size_bytes or 0), estimated_size) + TABLE_OVERHEAD_BYTES
+
+
+class ScheduledTask:
+    """
+    A named unit of work run by the TaskScheduler. The cost, e.g. from estimate_table_cost, decides the order in which
+    tasks start. After the run, the task records its duration and either the result of the work or the exception it
+    raised.
+    """
+
+    def __init__(self, name: str, function: Callable[..., Any], cost: float = 0.0, **kwargs):
+        self.name: str = name
+        self.function: Callable[..., Any] = function
+        self.cost: float = cost
+        self.kwargs: dict = kwargs
+        self.result: Any = None
+        self.exception: Exception | None = None
+        self.duration_seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> bool:
+        return self.exception is None
+
+
+class TaskScheduler:
+    """
+    Runs independent tasks on a fixed number of worker threads, starting the most expensive tasks first so that
+    smaller tasks fill in around them (longest processing time first). A failing task is logged and recorded on the
+    task without stopping the others. Worker threads can hold their own resources, such as a database connection, by
+    providing initialize_worker and finalize_worker.
+    """
+
+    def __init__(self, worker_count: int, worker_name: str = 'task-worker',
+                 initialize_worker: Callable[[], Any] | None = None,
+                 finalize_worker: Callable[[Any], None] | None = None):
+        """
+        :param worker_count: The number of tasks to run at the same time
+        :param worker_name: The thread name prefix used in log messages
+        :param initialize_worker: Called once in each worker thread. Its return value is passed to every task the
+            thread runs, as the worker_context keyword argument
+        :param finalize_worker: Called with each worker context once all tasks have finished
+        """
+        self.worker_count: int = max(1, worker_count)
+        self.worker_name: str = worker_name
+        self.initialize_worker: Callable[[], Any] | None = initialize_worker
+        self.finalize_worker: Callable[[Any], None] | None = finalize_worker
+        self.worker_contexts: list = []
+        self.worker_local: threading.local = threading.local()
+        self.lock: threading.Lock = threading.Lock()
+
+    def _get_worker_context(self) -> Any:
+        if not hasattr(self.worker_local, 'context'):
+            self.worker_local.context = self.initialize_worker()
+            with self.lock:
+                self.worker_contexts.append(self.worker_local.context)
+        return self.worker_local.context
+
+    def _run_task(self, task: ScheduledTask):
+        start_time: float = time.perf_counter()
+        try:
+            if self.initialize_worker is None:
+                task.result = task.function(**task.kwargs)
+            else:
+                task.result = task.function(worker_context=self._get_worker_context(), **task.kwargs)
+        except Exception as e:
+            task.exception = e
+            log_message(log_level='Error',
+                        message=f'{task.name} failed in {threading.current_thread().name}',
+                        exception=e)
+        finally:
+            task.duration_seconds = time.perf_counter() - start_time
+
+    def run(self, tasks: list[ScheduledTask], largest_first: bool = True) -> list[ScheduledTask]:
+        """
+        Runs the tasks and waits for all of them to finish.
+
+        :param tasks: The tasks to run
+        :param largest_first: If True, tasks start in descending order of cost; otherwise in list order
+        :return: The same tasks in their original order, with their results, exceptions and durations recorded
+        """
+        ordered_tasks: list[ScheduledTask] = tasks
+        if largest_first:
+            ordered_tasks = sorted(tasks, key=lambda task: task.cost, reverse=True)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.worker_count,
+                                    thread_name_prefix=self.worker_name) as executor:
+                # Consume the iterator so that every task has finished before the worker contexts are finalized
+                list(executor.map(self._run_task, ordered_tasks))
+        finally:
+            if self.finalize_worker is not None:
+                for worker_context in self.worker_contexts:
+                    try:
+                        self.finalize_worker(worker_context)
+                    except Exception as e:
+                        log_message(log_level='Warning',
+                                    message=f'Error releasing {self.worker_name} resources',
+                                    exception=e)
+                self.worker_contexts = []
+        return tasks
+
+    @staticmethod
+    def log_summary(tasks: list[ScheduledTask], description: str):
+        """
+        Logs the duration of each task, slowest first, followed by the failed tasks.
+
+        :param tasks: Tasks returned by run()
+        :param description: What the tasks did, e.g. 'Table load'
+        """
+        for task in sorted(tasks, key=lambda scheduled_task: scheduled_task.duration_seconds, reverse=True):
+            status: str = 'succeeded' if task.succeeded else 'failed'
+            log_message(log_level='Info',
+                        message=f'{description} {task.name} {status} in {task.duration_seconds:.2f}s')
+
+        failed_tasks: list[str] = [task.name for task in tasks if not task.succeeded]
+        total_seconds: float = sum(task.duration_seconds for task in tasks)
+        log_message(log_level='Info',
+                    message=f'{description}: {len(tasks) - len(failed_tasks)} of {len(tasks)} succeeded, '
+                            f'{total_seconds:.2f}s of task time')
+        if failed_tasks:
+            log_message(log_level='Error',
+                        message=f'{description} failed for: {", ".join(failed_tasks)}')
@@ -0,0 +1,219 @@
+import io
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from common.utilities import log_message
+
+_STOP_WORKER: object = object()
+
+
+class BufferPool:
+    """
+    A pool of reusable bytearrays of a fixed size, typically the file part size. Buffers are allocated on first use,
+    up to buffer_count, and are then reused so that large transfers do not allocate a new payload for every part.
+    Requests larger than the buffer size, or made while every pooled buffer is in use, get a one-off buffer.
+    """
+
+    def __init__(self, buffer_size: int, buffer_count: int):
+        self.buffer_size: int = buffer_size
+        self.buffer_count: int = max(1, buffer_count)
+        self.allocated_count: int = 0
+        self.idle_buffers: list[bytearray] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def acquire(self, size: int) -> bytearray:
+        """
+        Returns a buffer of at least the requested size.
+
+        :param size: The number of bytes that will be written to the buffer
+        """
+        if size <= self.buffer_size:
+            with self.lock:
+                if self.idle_buffers:
+                    return self.idle_buffers.pop()
+                if self.allocated_count < self.buffer_count:
+                    self.allocated_count += 1
+                    return bytearray(self.buffer_size)
+        return bytearray(size)
+
+    def release(self, buffer: bytearray | memoryview):
+        """
+        Returns a buffer to the pool. Buffers that did not come from the pool are left to the garbage collector.
+
+        :param buffer: The buffer, or a memoryview over it, returned by acquire()
+        """
+        if isinstance(buffer, memoryview):
+            buffer = buffer.obj
+        if isinstance(buffer, bytearray) and len(buffer) == self.buffer_size:
+            with self.lock:
+                if len(self.idle_buffers) < self.allocated_count:
+                    self.idle_buffers.append(buffer)
+
+
+class BufferReader(io.RawIOBase):
+    """
+    A seekable, read-only file object over a bytes-like buffer. Unlike io.BytesIO, wrapping a memoryview or bytearray
+    does not copy the payload, so a downloaded buffer can be passed to the upload APIs as-is.
+    """
+
+    def __init__(self, buffer: bytes | bytearray | memoryview):
+        super().__init__()
+        self.buffer: memoryview = memoryview(buffer).cast('B')
+        self.position: int = 0
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        size: int = min(len(target), len(self.buffer) - self.position)
+        target[:size] = self.buffer[self.position:self.position + size]
+        self.position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = len(self.buffer) + offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+class ByteBudgetQueue:
+    """
+    A FIFO queue that limits the number of payload bytes in flight rather than the number of items. Producers block
+    in put() while the queued and in-progress payloads exceed the byte budget, which applies backpressure to the
+    downloads feeding the queue.
+    """
+
+    def __init__(self, max_in_flight_bytes: int):
+        self.max_in_flight_bytes: int = max_in_flight_bytes
+        self.in_flight_bytes: int = 0
+        self.items: list = []
+        self.condition: threading.Condition = threading.Condition()
+
+    def put(self, item: Any, size: int = 0):
+        """
+        Adds an item to the queue, blocking while the byte budget is exhausted. An item larger than the whole budget
+        is admitted once nothing else is in flight, so it can never deadlock the queue.
+
+        :param item: The item to be queued
+        :param size: The number of payload bytes the item holds in memory
+        """
+        with self.condition:
+            while self.in_flight_bytes > 0 and self.in_flight_bytes + size > self.max_in_flight_bytes:
+                self.condition.wait()
+            self.in_flight_bytes += size
+            self.items.append((item, size))
+            self.condition.notify_all()
+
+    def get(self) -> tuple[Any, int]:
+        """
+        Removes and returns the next item and its size, blocking until one is available.
+        The item's bytes stay counted against the budget until release() is called.
+        """
+        with self.condition:
+            while not self.items:
+                self.condition.wait()
+            return self.items.pop(0)
+
+    def release(self, size: int):
+        """
+        Returns the bytes of a fully processed item to the budget and wakes any blocked producers.
+
+        :param size: The size that was passed to put() for the item
+        """
+        with self.condition:
+            self.in_flight_bytes -= size
+            self.condition.notify_all()
+
+
+class TransferPipeline:
+    """
+    A producer/consumer pipeline between Vault downloads and Object Storage uploads. The producer submits each
+    downloaded payload with its size, and a fixed number of worker threads perform the uploads. Memory use is bounded
+    by max_in_flight_bytes regardless of the number of workers.
+    """
+
+    def __init__(self, max_in_flight_bytes: int, worker_count: int = 4, buffer_pool: BufferPool | None = None):
+        self.queue: ByteBudgetQueue = ByteBudgetQueue(max_in_flight_bytes=max_in_flight_bytes)
+        self.buffer_pool: BufferPool | None = buffer_pool
+        self.futures: list[Future] = []
+        self.workers: list[threading.Thread] = [
+            threading.Thread(target=self._consume, name=f'transfer-worker-{i}', daemon=True)
+            for i in range(max(1, worker_count))
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, payload_size: int, transfer_function: Callable, payload_buffer: memoryview | None = None,
+               **kwargs) -> Future:
+        """
+        Queues a transfer, blocking while the in-flight byte budget is exhausted.
+
+        :param payload_size: The number of bytes the transfer holds in memory until it completes
+        :param transfer_function: The function that performs the transfer, e.g. ObjectStorageService.upload_object
+        :param payload_buffer: A buffer from the pipeline's buffer pool, returned to the pool once the transfer is done
+        :param kwargs: Keyword arguments passed to the transfer function
+        :return: A Future that resolves to the result of the transfer function
+        """
+        future: Future = Future()
+        self.futures.append(future)
+        self.queue.put(item=(future, transfer_function, payload_buffer, kwargs), size=payload_size)
+        return future
+
+    def _consume(self):
+        while True:
+            item, size = self.queue.get()
+            if item is _STOP_WORKER:
+                return
+
+            future, transfer_function, payload_buffer, kwargs = item
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(transfer_function(**kwargs))
+            except Exception as e:
+                log_message(log_level='Error',
+                            message=f'Transfer failed in {threading.current_thread().name}',
+                            exception=e)
+                future.set_exception(e)
+            finally:
+                # Drop the payload reference before returning its bytes to the budget
+                del item, kwargs
+                if payload_buffer is not None and self.buffer_pool is not None:
+                    self.buffer_pool.release(buffer=payload_buffer)
+                payload_buffer = None
+                self.queue.release(size=size)
+
+    def close(self):
+        """
+        Waits for all queued transfers to finish and stops the worker threads.
+        """
+        for _ in self.workers:
+            self.queue.put(item=_STOP_WORKER, size=0)
+        for worker in self.workers:
+            worker.join()
+
+    def results(self) -> list:
+        """
+        Waits for all queued transfers and returns their results in submission order.
+        Raises the first transfer exception, if any.
+        """
+        return [future.result() for future in self.futures]
@@ -11,6 +11,22 @@ import pyarrow as pa
 import pyarrow.parquet as pq
 
 
+# The Parquet type of each Vault metadata type, used when extract files are converted to Parquet. Number columns with
+# decimal values are written as float64 instead.
+PARQUET_COLUMN_TYPES: dict[str, pa.DataType] = {
+    'String': pa.string(),
+    'Number': pa.int64(),
+    'LongText': pa.large_string(),
+    'Date': pa.date32(),
+    'DateTime': pa.timestamp('ms', tz='UTC'),
+    'Relationship': pa.string(),
+    'MultiRelationship': pa.string(),
+    'Picklist': pa.string(),
+    'MultiPicklist': pa.string(),
+    'Boolean': pa.bool_()
+}
+
+
 def log_message(log_level, message, exception=None, context=None):
     """
     Logs a message with the specified log level.